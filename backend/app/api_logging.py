@@ -0,0 +1,174 @@
+# Write-behind API request logging
+import asyncio
+import ipaddress
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import insert
+
+from app.database import APILog, uuid7
+from app.session import AsyncSessionLocal
+
+# Logging configuration
+API_LOG_QUEUE_SIZE = int(os.getenv("API_LOG_QUEUE_SIZE", "10000"))
+API_LOG_BATCH_SIZE = int(os.getenv("API_LOG_BATCH_SIZE", "500"))
+API_LOG_FLUSH_INTERVAL = float(os.getenv("API_LOG_FLUSH_INTERVAL", "1.0"))
+API_LOG_DRAIN_TIMEOUT = float(os.getenv("API_LOG_DRAIN_TIMEOUT", "10.0"))
+API_LOG_EXCLUDED_PATHS = {"/health", "/health/live", "/health/ready", "/metrics"}
+
+
+class APILogQueue:
+    """Bounded in-memory buffer of api_logs rows flushed by a background task"""
+
+    def __init__(self, max_size: int = API_LOG_QUEUE_SIZE, batch_size: int = API_LOG_BATCH_SIZE,
+                 flush_interval: float = API_LOG_FLUSH_INTERVAL):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._entries = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def enqueue(self, entry: Dict) -> bool:
+        """Buffer a log row; drop it when the buffer is full instead of blocking"""
+        if len(self._entries) >= self.max_size:
+            self.dropped += 1
+            return False
+        self._entries.append(entry)
+        self.enqueued += 1
+        if len(self._entries) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def start(self):
+        """Start the background flush task"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = API_LOG_DRAIN_TIMEOUT):
+        """Stop the flush loop after draining what is buffered"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            self.dropped += len(self._entries)
+            self._entries.clear()
+            print(f"API log drain timed out after {timeout}s; buffered entries dropped")
+        finally:
+            self._task = None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+        await self.flush()
+
+    async def flush(self):
+        """Write everything currently buffered in batches"""
+        while self._entries:
+            batch = [self._entries.popleft() for _ in range(min(self.batch_size, len(self._entries)))]
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(APILog), batch)
+                    await db.commit()
+                self.flushed += len(batch)
+                self.flushes += 1
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"API log flush failed: {e}. Dropped {len(batch)} entries.")
+
+    def stats(self) -> Dict:
+        return {
+            "buffered": len(self._entries),
+            "max_size": self.max_size,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
+
+
+api_log_queue = APILogQueue()
+
+
+def annotate_request(request, user_id=None, request_data: Optional[Dict] = None):
+    """Attach a user id or request summary to the log entry for this request"""
+    if user_id is not None:
+        request.state.api_log_user_id = user_id
+    if request_data is not None:
+        request.state.api_log_request_data = request_data
+
+
+def _client_ip(scope) -> Optional[str]:
+    client = scope.get("client")
+    if not client:
+        return None
+    try:
+        return str(ipaddress.ip_address(client[0]))
+    except ValueError:
+        return None
+
+
+class APILoggingMiddleware:
+    """ASGI middleware that times every request and buffers an api_logs row"""
+
+    def __init__(self, app, queue: APILogQueue = api_log_queue, excluded_paths=None):
+        self.app = app
+        self.queue = queue
+        self.excluded_paths = API_LOG_EXCLUDED_PATHS if excluded_paths is None else excluded_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        status = {"code": 500}
+        error_message = None
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            error_message = str(e)
+            raise
+        finally:
+            route = scope.get("route")
+            state = scope.get("state") or {}
+            self.queue.enqueue({
+                "id": uuid7(),
+                "endpoint": getattr(route, "path", scope["path"])[:255],
+                "method": scope["method"],
+                "user_id": state.get("api_log_user_id"),
+                "request_data": state.get("api_log_request_data"),
+                "response_status": status["code"],
+                "response_time_ms": int((time.perf_counter() - start) * 1000),
+                "ip_address": _client_ip(scope),
+                "error_message": error_message,
+                "created_at": started_at,
+            })
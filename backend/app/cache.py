@@ -0,0 +1,246 @@
+# Read-through cache for user and consent record lookups
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.pagination import _json_default
+
+# Cache configuration. CACHE_BACKEND=shared keeps entries in a SQLite file that
+# every worker process on the host reads and invalidates.
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# Responses of consent submissions, replayed to clients retrying the same session
+SUBMISSION_CACHE_TTL_SECONDS = float(os.getenv("SUBMISSION_CACHE_TTL_SECONDS", "600"))
+CACHE_SHARED_PATH = os.getenv(
+    "CACHE_SHARED_PATH",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "consent-cache.sqlite3"),
+)
+
+_MISSING = object()
+
+
+def row_to_dict(instance) -> Dict:
+    """JSON-safe column values of an ORM instance, as the API returns them"""
+    values = {column.key: getattr(instance, column.key) for column in instance.__mapper__.column_attrs}
+    return json.loads(json.dumps(values, default=_json_default))
+
+
+class LocalBackend:
+    """Per-process LRU dict with absolute expiry times"""
+
+    blocking = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING, False
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return _MISSING, True
+            self._entries.move_to_end(key)
+            return value, False
+
+    def set(self, key: str, value, ttl: float) -> int:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class SharedBackend:
+    """SQLite-file LRU shared by every worker process on the host"""
+
+    # Calls can wait up to the busy timeout on another worker's write lock,
+    # so ReadThroughCache makes them off the event loop
+    blocking = True
+
+    # Hits only refresh the LRU position this often, so hot keys do not turn
+    # every read into a write
+    TOUCH_INTERVAL_SECONDS = 1.0
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections are not carried across fork
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed_at ON cache_entries (accessed_at)")
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value, expires_at, accessed_at FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return _MISSING, False
+            value, expires_at, accessed_at = row
+            if expires_at <= now:
+                connection.execute("DELETE FROM cache_entries WHERE key = ? AND expires_at <= ?", (key, now))
+                return _MISSING, True
+            if now - accessed_at > self.TOUCH_INTERVAL_SECONDS:
+                connection.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value), False
+
+    def set(self, key: str, value, ttl: float) -> int:
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=_json_default), now + ttl, now),
+            )
+            cursor = connection.execute(
+                "DELETE FROM cache_entries WHERE key IN ("
+                "SELECT key FROM cache_entries ORDER BY accessed_at "
+                "LIMIT MAX(0, (SELECT COUNT(*) FROM cache_entries) - ?))",
+                (self.max_entries,),
+            )
+            return cursor.rowcount
+
+    def delete(self, key: str):
+        with self._lock:
+            self._connect().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM cache_entries")
+
+    def size(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+
+class ReadThroughCache:
+    """TTL + LRU cache in front of primary-key lookups, with hit-ratio counters"""
+
+    def __init__(self, backend=None, ttl: float = CACHE_TTL_SECONDS, enabled: bool = CACHE_ENABLED):
+        if backend is None:
+            backend = (
+                SharedBackend(CACHE_SHARED_PATH, CACHE_MAX_ENTRIES) if CACHE_BACKEND == "shared"
+                else LocalBackend(CACHE_MAX_ENTRIES)
+            )
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, namespace: str, counter: str, amount: int = 1):
+        counters = self._counters.setdefault(
+            namespace, {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0, "errors": 0}
+        )
+        counters[counter] += amount
+
+    async def _backend_call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def get_or_load(self, namespace: str, key, loader: Callable[[], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        """Return the cached value or load, cache and return it; None is never cached"""
+        if not self.enabled:
+            return await loader()
+        cache_key = f"{namespace}:{key}"
+        try:
+            value, expired = await self._backend_call(self.backend.get, cache_key)
+        except sqlite3.Error as e:
+            # A broken shared cache must never fail the request
+            print(f"Cache read failed: {e}")
+            self._count(namespace, "errors")
+            return await loader()
+        if value is not _MISSING:
+            self._count(namespace, "hits")
+            return value
+        self._count(namespace, "misses")
+        if expired:
+            self._count(namespace, "expired")
+        value = await loader()
+        if value is not None:
+            try:
+                evicted = await self._backend_call(self.backend.set, cache_key, value, self.ttl)
+                self._count(namespace, "evictions", evicted)
+            except sqlite3.Error as e:
+                print(f"Cache write failed: {e}")
+                self._count(namespace, "errors")
+        return value
+
+    async def invalidate(self, namespace: str, key):
+        """Drop one entry after the row behind it was written"""
+        if not self.enabled:
+            return
+        try:
+            await self._backend_call(self.backend.delete, f"{namespace}:{key}")
+            self._count(namespace, "invalidations")
+        except sqlite3.Error as e:
+            print(f"Cache invalidation failed: {e}")
+            self._count(namespace, "errors")
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> Dict:
+        namespaces = {}
+        for namespace, counters in self._counters.items():
+            lookups = counters["hits"] + counters["misses"]
+            namespaces[namespace] = {**counters, "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else 0.0}
+        try:
+            size = self.backend.size()
+        except sqlite3.Error:
+            size = None
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "ttl_seconds": self.ttl,
+            "max_entries": self.backend.max_entries,
+            "size": size,
+            "namespaces": namespaces,
+        }
+
+
+lookup_cache = ReadThroughCache()
+submission_cache = ReadThroughCache(ttl=SUBMISSION_CACHE_TTL_SECONDS)
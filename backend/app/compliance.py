@@ -0,0 +1,241 @@
+# Incremental DPDPA compliance checking of consent records
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import Integer, Text, bindparam, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.database import ComplianceWatermark, uuid7
+from app.queries import consent_records
+from app.session import AsyncSessionLocal
+
+# Checker configuration
+COMPLIANCE_BATCH_SIZE = int(os.getenv("COMPLIANCE_BATCH_SIZE", "5000"))
+COMPLIANCE_CHECK_INTERVAL = float(os.getenv("COMPLIANCE_CHECK_INTERVAL", "300"))
+# Records updated within the lag are left for the next run, so a transaction
+# that commits late with an older updated_at is not skipped by the watermark
+COMPLIANCE_WATERMARK_LAG_SECONDS = float(os.getenv("COMPLIANCE_WATERMARK_LAG_SECONDS", "60"))
+
+CHECK_TYPE = "dpdpa_consent"
+COMPLIANCE_STANDARD = "DPDPA 2023"
+CHECKED_BY = "compliance_checker"
+
+# Server-side port of checkDPDPACompliance in frontend/src/utils/crypto.ts:
+# (issue reported when the rule fails, remediation, SQL expression that holds
+# when the record passes). Empty strings fail like they do in the browser.
+DPDPA_RULES = (
+    ("Missing timestamp", "Record when the consent was given",
+     consent_records.c.consent_timestamp.isnot(None)),
+    ("Missing explicit user consent", "Obtain explicit consent from the user",
+     func.coalesce(consent_records.c.user_consent, False)),
+    ("Missing data usage purpose", "State the purpose the data will be used for",
+     func.coalesce(consent_records.c.data_usage_purpose, "") != ""),
+    ("Missing data retention period", "State how long the data will be retained",
+     func.coalesce(consent_records.c.data_retention_period, "") != ""),
+    ("Missing right to withdraw", "Inform the user of their right to withdraw consent",
+     func.coalesce(consent_records.c.right_to_withdraw, False)),
+)
+
+# Failed rules of a record packed into one integer, bit i for DPDPA_RULES[i]
+_RULE_BITS = 1 << np.arange(len(DPDPA_RULES))
+_ISSUES_BY_CODE = [
+    json.dumps([issue for bit, (issue, _, _) in enumerate(DPDPA_RULES) if code >> bit & 1])
+    for code in range(1 << len(DPDPA_RULES))
+]
+_REMEDIATION_BY_CODE = [
+    "; ".join(remediation for bit, (_, remediation, _) in enumerate(DPDPA_RULES) if code >> bit & 1) or None
+    for code in range(1 << len(DPDPA_RULES))
+]
+
+# The batch goes in as three arrays rather than one parameter set per row;
+# issue lists and remediation text are looked up by failure code server-side
+_INSERT_RESULTS = text("""
+    INSERT INTO compliance_checks (id, consent_record_id, check_type, compliance_standard, check_result,
+                                   issues_found, remediation_steps, check_timestamp, checked_by)
+    SELECT result.id, result.consent_record_id, :check_type, :compliance_standard, result.code = 0,
+           (:issues)[result.code + 1]::json, (:remediations)[result.code + 1], :check_timestamp, :checked_by
+    FROM unnest(:ids, :consent_record_ids, :codes) AS result(id, consent_record_id, code)
+""").bindparams(
+    bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("consent_record_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("codes", type_=ARRAY(Integer)),
+    bindparam("issues", type_=ARRAY(Text)),
+    bindparam("remediations", type_=ARRAY(Text)),
+)
+
+
+def evaluate_rules(passed: np.ndarray) -> np.ndarray:
+    """Failure codes for an (records x rules) boolean matrix of passed rules"""
+    return (~passed).astype(np.int64) @ _RULE_BITS
+
+
+def _batch_query(watermark: ComplianceWatermark, changed_before: datetime, batch_size: int):
+    key = tuple_(consent_records.c.updated_at, consent_records.c.id)
+    stmt = (
+        select(
+            consent_records.c.id, consent_records.c.updated_at,
+            *(rule.label(f"rule_{index}") for index, (_, _, rule) in enumerate(DPDPA_RULES)),
+        )
+        .where(consent_records.c.updated_at < changed_before)
+        .order_by(consent_records.c.updated_at, consent_records.c.id)
+        .limit(batch_size)
+    )
+    if watermark.last_updated_at is not None:
+        stmt = stmt.where(key > tuple_(watermark.last_updated_at, watermark.last_record_id))
+    return stmt
+
+
+async def check_batch(check_type: str = CHECK_TYPE, batch_size: int = COMPLIANCE_BATCH_SIZE) -> Dict:
+    """Check the next batch of changed consent records past the watermark.
+
+    The rule predicates are evaluated by PostgreSQL column-wise and come back
+    as booleans; numpy folds them into one failure code per record, so no
+    per-record Python rule logic runs. Results and the advanced watermark
+    commit together, and the watermark row lock keeps concurrent checkers
+    from checking the same batch twice.
+    """
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            await db.execute(
+                pg_insert(ComplianceWatermark).values(check_type=check_type, records_checked=0)
+                .on_conflict_do_nothing(index_elements=["check_type"])
+            )
+            watermark = (await db.execute(
+                select(ComplianceWatermark).where(ComplianceWatermark.check_type == check_type).with_for_update()
+            )).scalar_one()
+            changed_before = datetime.utcnow() - timedelta(seconds=COMPLIANCE_WATERMARK_LAG_SECONDS)
+            rows = (await db.execute(_batch_query(watermark, changed_before, batch_size))).all()
+            if not rows:
+                return {"checked": 0, "failed": 0}
+
+            passed = np.array([row[2:] for row in rows], dtype=bool)
+            codes = evaluate_rules(passed)
+            now = datetime.utcnow()
+            await db.execute(_INSERT_RESULTS, {
+                "ids": [uuid7() for _ in rows],
+                "consent_record_ids": [row[0] for row in rows],
+                "codes": codes.tolist(),
+                "issues": _ISSUES_BY_CODE,
+                "remediations": _REMEDIATION_BY_CODE,
+                "check_type": check_type,
+                "compliance_standard": COMPLIANCE_STANDARD,
+                "check_timestamp": now,
+                "checked_by": CHECKED_BY,
+            })
+            watermark.last_updated_at, watermark.last_record_id = rows[-1][1], rows[-1][0]
+            watermark.records_checked += len(rows)
+    return {"checked": len(rows), "failed": int(np.count_nonzero(codes))}
+
+
+async def reset_watermark(check_type: str = CHECK_TYPE):
+    """Start the next run from the first record, e.g. after the rules changed"""
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            await db.execute(
+                ComplianceWatermark.__table__.delete().where(ComplianceWatermark.check_type == check_type)
+            )
+
+
+async def read_watermark(check_type: str = CHECK_TYPE) -> Optional[Dict]:
+    async with AsyncSessionLocal() as db:
+        watermark = await db.get(ComplianceWatermark, check_type)
+        if watermark is None:
+            return None
+        return {
+            "last_updated_at": watermark.last_updated_at.isoformat() if watermark.last_updated_at else None,
+            "last_record_id": str(watermark.last_record_id) if watermark.last_record_id else None,
+            "records_checked": watermark.records_checked,
+        }
+
+
+class ComplianceChecker:
+    """Background task checking changed consent records every interval"""
+
+    def __init__(self, interval: float = COMPLIANCE_CHECK_INTERVAL, batch_size: int = COMPLIANCE_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = asyncio.Event()
+        self.checked = 0
+        self.failed = 0
+        self.runs = 0
+        self.last_run_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        if self._task is None:
+            self._stopped.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopped.set()
+        await self._task
+        self._task = None
+
+    async def run_once(self) -> Dict:
+        """Check batches until the watermark catches up"""
+        started = time.perf_counter()
+        summary = {"checked": 0, "failed": 0}
+        while not self._stopped.is_set():
+            result = await check_batch(batch_size=self.batch_size)
+            summary["checked"] += result["checked"]
+            summary["failed"] += result["failed"]
+            if result["checked"] < self.batch_size:
+                break
+        self.checked += summary["checked"]
+        self.failed += summary["failed"]
+        self.runs += 1
+        self.last_run_seconds = time.perf_counter() - started
+        return {**summary, "seconds": round(self.last_run_seconds, 3)}
+
+    async def _run(self):
+        while not self._stopped.is_set():
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Compliance check failed: {e}")
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stats(self) -> Dict:
+        return {
+            "check_type": CHECK_TYPE,
+            "running": self._task is not None,
+            "checked": self.checked,
+            "failed": self.failed,
+            "runs": self.runs,
+            "last_run_seconds": self.last_run_seconds,
+            "last_error": self.last_error,
+            "watermark": await read_watermark(),
+        }
+
+
+compliance_checker = ComplianceChecker()
+
+
+async def _main(full: bool, batch_size: int):
+    if full:
+        await reset_watermark()
+    checker = ComplianceChecker(batch_size=batch_size)
+    print(await checker.run_once())
+
+
+if __name__ == "__main__":
+    # One-off run, e.g. from cron or after changing the rules (--full)
+    parser = argparse.ArgumentParser(description="Check consent records against the DPDPA rules")
+    parser.add_argument("--full", action="store_true", help="re-check every record from the start")
+    parser.add_argument("--batch-size", type=int, default=COMPLIANCE_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(_main(args.full, args.batch_size))
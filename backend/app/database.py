@@ -1,21 +1,54 @@
 # SQLAlchemy ORM Models for PostgreSQL Database
-from sqlalchemy import create_engine, Column, String, Integer, Float, Boolean, DateTime, JSON, Text, ForeignKey, Index, DECIMAL
+from sqlalchemy import create_engine, text, Column, String, Integer, BigInteger, SmallInteger, Float, Boolean, DateTime, JSON, Text, ForeignKey, Index, DECIMAL
 from sqlalchemy.dialects.postgresql import UUID, INET
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, Session
 from datetime import datetime
+import os
+import threading
+import time
 import uuid
 from typing import Optional
 
+from app.landmarks import LandmarkArray
+
 # Database configuration
 Base = declarative_base()
 
+_uuid7_lock = threading.Lock()
+_uuid7_last = (0, 0)
+
+
+def uuid7() -> uuid.UUID:
+    """Time-ordered UUID (RFC 9562 version 7) used as the default primary key.
+
+    48 bits of Unix milliseconds, then a 12-bit counter so ids from one process
+    keep increasing within a millisecond, then 62 random bits. New keys land at
+    the right edge of the B-tree instead of on random leaf pages.
+    """
+    global _uuid7_last
+    with _uuid7_lock:
+        millis = time.time_ns() // 1_000_000
+        last_millis, counter = _uuid7_last
+        if millis <= last_millis:
+            # Same millisecond or the clock stepped back: keep counting upward
+            millis, counter = last_millis, counter + 1
+            if counter > 0xFFF:
+                millis, counter = last_millis + 1, 0
+        else:
+            counter = 0
+        _uuid7_last = (millis, counter)
+    random_bits = int.from_bytes(os.urandom(8), "big") & 0x3FFF_FFFF_FFFF_FFFF
+    return uuid.UUID(int=millis << 80 | 0x7 << 76 | counter << 64 | 0x2 << 62 | random_bits)
+
+
 # SQLAlchemy Models
 class User(Base):
     __tablename__ = "users"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    email = Column(String(255), unique=True, nullable=False, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    # The unique constraint's index serves email lookups
+    email = Column(String(255), unique=True, nullable=False)
     full_name = Column(String(255), nullable=True)
     phone_number = Column(String(20), nullable=True)
     date_of_birth = Column(String, nullable=True)
@@ -31,15 +64,18 @@ class User(Base):
 class ConsentRecord(Base):
     __tablename__ = "consent_records"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     document_type = Column(String(100), nullable=False)
     document_hash = Column(String(64), nullable=True)
+    # Capture session of the submitting client; retried submissions share it
+    session_id = Column(String(255), nullable=True)
     detected_emotion = Column(String(50), nullable=True)
     emotion_confidence = Column(DECIMAL(3, 2), nullable=True)
+    emotion_summary = Column(JSON, nullable=True)
     voice_sentiment = Column(String(50), nullable=True)
     voice_confidence = Column(DECIMAL(3, 2), nullable=True)
-    facial_landmarks = Column(JSON, nullable=True)
+    facial_landmarks = Column(LandmarkArray, nullable=True)
     user_consent = Column(Boolean, nullable=False)
     consent_timestamp = Column(DateTime, nullable=False)
     consent_duration_seconds = Column(Integer, nullable=True)
@@ -52,6 +88,9 @@ class ConsentRecord(Base):
     browser_user_agent = Column(Text, nullable=True)
     encrypted_data = Column(Text, nullable=True)
     encryption_key_id = Column(String(36), nullable=True)
+    # Payload digest and key as signed, kept once a key rotation re-encrypts it
+    signed_data_hash = Column(String(64), nullable=True)
+    signing_key_id = Column(String(36), nullable=True)
     digital_signature = Column(String(256), nullable=True)
     signature_algorithm = Column(String(50), nullable=True)
     verification_status = Column(String(50), default="pending")
@@ -65,19 +104,33 @@ class ConsentRecord(Base):
     compliance_checks = relationship("ComplianceCheck", back_populates="consent_record", cascade="all, delete-orphan")
     withdrawal_records = relationship("WithdrawalRecord", back_populates="consent_record", cascade="all, delete-orphan")
     
-    # Indices
+    # Indices, one per listing shape in app/queries.py. Each ends in
+    # (created_at, id) so keyset pages come back in index order.
     __table_args__ = (
-        Index("idx_consent_records_user_id", "user_id"),
-        Index("idx_consent_records_created_at", "created_at"),
-        Index("idx_consent_records_verification_status", "verification_status"),
-        Index("idx_consent_records_jurisdiction", "jurisdiction"),
+        Index("idx_consent_records_created_at_id", "created_at", "id"),
+        Index("idx_consent_records_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("idx_consent_records_jurisdiction_created_at_id", "jurisdiction", "created_at", "id"),
+        Index("idx_consent_records_status_created_at_id", "verification_status", "created_at", "id"),
+        # Change feed for the incremental compliance checker in app/compliance.py
+        Index("idx_consent_records_updated_at_id", "updated_at", "id"),
+        # One record per capture session, so retried submissions are idempotent;
+        # session_id leads so the planner keeps the user listing index above
+        Index("idx_consent_records_session_id_user_id", "session_id", "user_id", unique=True),
+        # Chunks of one key's records for the key rotation in app/rotation.py
+        Index("idx_consent_records_encryption_key_id_id", "encryption_key_id", "id"),
+        # Covers CONSENT_SUMMARY_COLUMNS for index-only scans
+        Index(
+            "idx_consent_records_jurisdiction_status_created_at_id",
+            "jurisdiction", "verification_status", "created_at", "id",
+            postgresql_include=["user_id", "document_type", "user_consent"],
+        ),
     )
 
 
 class ConsentAuditLog(Base):
     __tablename__ = "consent_audit_log"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     consent_record_id = Column(UUID(as_uuid=True), ForeignKey("consent_records.id"), nullable=False)
     action = Column(String(50), nullable=False)
     changed_fields = Column(JSON, nullable=True)
@@ -85,7 +138,8 @@ class ConsentAuditLog(Base):
     new_values = Column(JSON, nullable=True)
     changed_by = Column(String(255), nullable=True)
     change_reason = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Partition key, so it is part of the primary key (see app/partitions.py)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
     
     # Relationships
     consent_record = relationship("ConsentRecord", back_populates="audit_logs")
@@ -93,13 +147,14 @@ class ConsentAuditLog(Base):
     # Indices
     __table_args__ = (
         Index("idx_consent_audit_log_consent_record_id", "consent_record_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 
 class ComplianceCheck(Base):
     __tablename__ = "compliance_checks"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     consent_record_id = Column(UUID(as_uuid=True), ForeignKey("consent_records.id"), nullable=False)
     check_type = Column(String(100), nullable=False)
     compliance_standard = Column(String(100), nullable=True)
@@ -121,7 +176,7 @@ class ComplianceCheck(Base):
 class WithdrawalRecord(Base):
     __tablename__ = "withdrawal_records"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     consent_record_id = Column(UUID(as_uuid=True), ForeignKey("consent_records.id"), nullable=False)
     withdrawal_timestamp = Column(DateTime, default=datetime.utcnow)
     withdrawal_reason = Column(Text, nullable=True)
@@ -137,6 +192,11 @@ class WithdrawalRecord(Base):
     # Indices
     __table_args__ = (
         Index("idx_withdrawal_records_consent_record_id", "consent_record_id"),
+        # Queue of withdrawals the deletion worker still has to process, see app/withdrawals.py
+        Index(
+            "idx_withdrawal_records_pending", "withdrawal_timestamp",
+            postgresql_where=text("data_deletion_status = 'pending'"),
+        ),
     )
 
 
@@ -155,10 +215,30 @@ class EncryptionKey(Base):
     created_by = Column(String(255), nullable=True)
 
 
+class KeyRotation(Base):
+    __tablename__ = "key_rotations"
+    
+    # Checkpoint of a re-encryption from one key version to the next, see app/rotation.py
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    old_key_id = Column(String(36), nullable=False)
+    new_key_id = Column(String(36), nullable=False)
+    status = Column(String(20), nullable=False, default="running")
+    passes = Column(Integer, nullable=False, default=1)
+    last_record_id = Column(UUID(as_uuid=True), nullable=True)
+    records_total = Column(BigInteger, nullable=False, default=0)
+    records_rotated = Column(BigInteger, nullable=False, default=0)
+    records_failed = Column(BigInteger, nullable=False, default=0)
+    records_remaining = Column(BigInteger, nullable=True)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
 class APILog(Base):
     __tablename__ = "api_logs"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     endpoint = Column(String(255), nullable=False)
     method = Column(String(10), nullable=False)
     user_id = Column(UUID(as_uuid=True), nullable=True)
@@ -167,19 +247,23 @@ class APILog(Base):
     response_time_ms = Column(Integer, nullable=True)
     ip_address = Column(INET, nullable=True)
     error_message = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Partition key, so it is part of the primary key (see app/partitions.py)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
     
     # Indices
     __table_args__ = (
-        Index("idx_api_logs_created_at", "created_at"),
-        Index("idx_api_logs_endpoint", "endpoint"),
+        Index("idx_api_logs_created_at_id", "created_at", "id"),
+        Index("idx_api_logs_endpoint_created_at_id", "endpoint", "created_at", "id"),
+        # Failed requests only; matches API_LOG_ERROR_STATUS in app/queries.py
+        Index("idx_api_logs_errors_created_at_id", "created_at", "id", postgresql_where=text("response_status >= 400")),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 
 class ConsentForm(Base):
     __tablename__ = "consent_forms"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     form_name = Column(String(255), nullable=False)
     jurisdiction = Column(String(50), nullable=False)
     form_version = Column(String(20), nullable=False)
@@ -194,3 +278,25 @@ class ConsentForm(Base):
     __table_args__ = (
         Index("idx_consent_forms_jurisdiction", "jurisdiction"),
     )
+
+
+class ComplianceWatermark(Base):
+    __tablename__ = "compliance_watermarks"
+    
+    # Last consent record checked, in (updated_at, id) order, see app/compliance.py
+    check_type = Column(String(100), primary_key=True)
+    last_updated_at = Column(DateTime, nullable=True)
+    last_record_id = Column(UUID(as_uuid=True), nullable=True)
+    records_checked = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class StatisticsCounter(Base):
+    __tablename__ = "statistics_counters"
+    
+    # Maintained by statement-level triggers, see app/statistics.py. Each
+    # counter is split over slot rows that reads add up.
+    metric = Column(String(100), primary_key=True)
+    dimension_value = Column(String(255), primary_key=True, default="")
+    slot = Column(SmallInteger, primary_key=True, default=0)
+    count = Column(BigInteger, nullable=False, default=0)
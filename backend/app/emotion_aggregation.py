@@ -0,0 +1,117 @@
+# Vectorized aggregation of per-frame emotion analysis samples
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.models import EmotionAnalysis
+
+# Aggregation configuration
+DEFAULT_FRAME_INTERVAL = 1 / 30
+MAX_FRAME_GAP_SECONDS = 1.0
+SPIKE_WINDOW_SECONDS = 1.0
+SPIKE_THRESHOLD = 0.5
+MAX_DISTRESS_WINDOWS = 50
+DISTRESS_EMOTIONS = ("angry", "anger", "fearful", "fear", "sad", "disgusted", "disgust")
+
+
+def _to_seconds(stamps: Sequence[str]) -> np.ndarray:
+    """Convert epoch (s or ms) or ISO-8601 timestamps to float seconds"""
+    try:
+        values = np.asarray(stamps, dtype=np.float64)
+        if not np.isnan(values).any():
+            return values / 1000.0 if np.median(values) > 1e11 else values
+    except ValueError:
+        pass
+    try:
+        values = np.asarray([_iso_seconds(stamp) for stamp in stamps], dtype=np.float64)
+        return values - values[0]
+    except (TypeError, ValueError):
+        # Unparseable clocks: fall back to the capture frame rate
+        return np.arange(len(stamps), dtype=np.float64) * DEFAULT_FRAME_INTERVAL
+
+
+def _iso_seconds(stamp: str) -> float:
+    """Epoch seconds of an ISO-8601 timestamp; one without an offset is UTC"""
+    if stamp.endswith("Z"):
+        stamp = stamp[:-1] + "+00:00"
+    parsed = datetime.fromisoformat(stamp)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _spike_windows(score: np.ndarray, offsets: np.ndarray, durations: np.ndarray,
+                   window: int, threshold: float) -> List[Dict]:
+    """Contiguous runs where the rolling distress score reaches the threshold"""
+    rolling = np.convolve(score, np.ones(window) / window, mode="same")
+    edges = np.diff(np.concatenate(([0], (rolling >= threshold).astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return [
+        {
+            "start_seconds": round(float(offsets[start]), 3),
+            "end_seconds": round(float(offsets[end - 1] + durations[end - 1]), 3),
+            "peak_score": round(float(rolling[start:end].max()), 3),
+        }
+        for start, end in zip(starts[:MAX_DISTRESS_WINDOWS], ends[:MAX_DISTRESS_WINDOWS])
+    ]
+
+
+def aggregate_emotions(frames: List[EmotionAnalysis],
+                       window_seconds: float = SPIKE_WINDOW_SECONDS,
+                       threshold: float = SPIKE_THRESHOLD) -> Optional[Dict]:
+    """Summarize a capture's emotion frames into a JSON-serializable dict
+
+    The dominant emotion is the one with the largest summed confidence over
+    frames where a face was detected. Dwell time credits each frame with the
+    gap to the next one, capped so capture pauses do not inflate it.
+    """
+    if not frames:
+        return None
+
+    # Labels are coded through a dict; sorting a string array costs more
+    label_codes = {}
+    codes = np.asarray(
+        [label_codes.setdefault(frame.emotion, len(label_codes)) for frame in frames], dtype=np.intp
+    )
+    names = np.asarray(list(label_codes))
+    times = _to_seconds([frame.timestamp for frame in frames])
+    confidence = np.clip(np.asarray([frame.confidence for frame in frames], dtype=np.float64), 0.0, 1.0)
+    face = np.asarray([frame.face_detected for frame in frames], dtype=bool)
+
+    gaps = np.diff(times)
+    if (gaps < 0).any():
+        order = np.argsort(times, kind="stable")
+        times, confidence, face, codes = times[order], confidence[order], face[order], codes[order]
+        gaps = np.diff(times)
+
+    positive_gaps = gaps[gaps > 0]
+    interval = float(np.median(positive_gaps)) if positive_gaps.size else DEFAULT_FRAME_INTERVAL
+    durations = np.clip(np.append(gaps, interval), 0.0, MAX_FRAME_GAP_SECONDS)
+
+    # Frames without a face carry no reliable label unless nothing else exists
+    counted = face if face.any() else np.ones_like(face)
+    scores = np.bincount(codes, weights=confidence * counted, minlength=names.size)
+    dwell = np.bincount(codes, weights=durations * counted, minlength=names.size)
+    dominant = int(np.argmax(scores))
+    dominant_mask = (codes == dominant) & counted
+    dominant_confidence = float(confidence[dominant_mask].mean()) if dominant_mask.any() else 0.0
+
+    distress = np.isin(names, DISTRESS_EMOTIONS)[codes] & counted
+    # A window longer than the capture would make the rolling mean longer too
+    window = min(max(1, int(round(window_seconds / interval))), times.size)
+    counted_time = float(durations[counted].sum())
+
+    return {
+        "frame_count": int(times.size),
+        "duration_seconds": round(float(times[-1] - times[0] + interval), 3),
+        "dominant_emotion": str(names[dominant]),
+        "dominant_confidence": round(dominant_confidence, 4),
+        "face_detected_ratio": round(float(face.mean()), 4),
+        "dwell_seconds": {str(name): round(float(seconds), 3) for name, seconds in zip(names, dwell)},
+        "distress_ratio": round(float(durations[distress].sum()) / counted_time, 4) if counted_time else 0.0,
+        "distress_windows": _spike_windows(
+            confidence * distress, times - times[0], durations, window, threshold
+        ),
+    }
@@ -0,0 +1,53 @@
+# AES-GCM consent payloads in the format of frontend/src/utils/crypto.ts
+import hashlib
+import json
+import os
+import secrets
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+IV_BYTES = 12
+
+
+class DecryptionError(ValueError):
+    """Raised when a payload is malformed or fails authentication"""
+
+
+def key_bytes(key_data: str) -> bytes:
+    """AES-256 key for a key row's key_data, derived like encryptConsent does"""
+    return key_data.ljust(32, "0")[:32].encode()
+
+
+def generate_key_data() -> str:
+    """Random key_data for a new key version; 32 characters, so 256 key bits"""
+    return secrets.token_urlsafe(24)
+
+
+def payload_digest(encrypted_data: str) -> str:
+    """Hex SHA-256 of a stored payload, as generateHash computes it"""
+    return hashlib.sha256(encrypted_data.encode()).hexdigest()
+
+
+def encrypt_payload(plaintext: bytes, key: bytes) -> str:
+    iv = os.urandom(IV_BYTES)
+    encrypted = AESGCM(key).encrypt(iv, plaintext, None)
+    # JSON.stringify output, byte arrays as lists of numbers
+    return json.dumps({"encrypted": list(encrypted), "iv": list(iv)}, separators=(",", ":"))
+
+
+def decrypt_payload(encrypted_data: str, key: bytes) -> bytes:
+    try:
+        payload = json.loads(encrypted_data)
+        encrypted, iv = bytes(payload["encrypted"]), bytes(payload["iv"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise DecryptionError(f"Malformed payload: {e}") from e
+    try:
+        return AESGCM(key).decrypt(iv, encrypted, None)
+    except (InvalidTag, ValueError) as e:
+        raise DecryptionError("Payload failed authentication") from e
+
+
+def reencrypt_payload(encrypted_data: str, old_key: bytes, new_key: bytes) -> str:
+    """Decrypt under the old key and encrypt under the new one with a fresh IV"""
+    return encrypt_payload(decrypt_payload(encrypted_data, old_key), new_key)
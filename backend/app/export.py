@@ -0,0 +1,326 @@
+# Streaming export of consent records with their audit and compliance rows
+import asyncio
+import base64
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Boolean, DateTime, Integer, Numeric, tuple_
+
+from app.database import uuid7
+from app.pagination import _json_default, decode_cursor, encode_cursor
+from app.queries import (
+    AUDIT_EXPORT_COLUMNS, COMPLIANCE_EXPORT_COLUMNS, EXPORT_COLUMNS,
+    audit_entries, compliance_entries, consent_export, consent_records,
+)
+from app.session import AsyncSessionLocal
+
+# Export configuration
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "100000"))
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "consent-exports"))
+EXPORT_MAX_RUNNING_JOBS = int(os.getenv("EXPORT_MAX_RUNNING_JOBS", "2"))
+EXPORT_JOB_RETENTION_SECONDS = float(os.getenv("EXPORT_JOB_RETENTION_SECONDS", "86400"))
+
+# Format name -> (media type, file extension)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+EXPORT_FILTERS = ("jurisdiction", "verification_status", "created_after", "created_before")
+NESTED_COLUMNS = {"audit_log": AUDIT_EXPORT_COLUMNS, "compliance_checks": COMPLIANCE_EXPORT_COLUMNS}
+CSV_HEADER = [column.name for column in EXPORT_COLUMNS] + list(NESTED_COLUMNS)
+
+
+def check_format(format: str):
+    """Raise ValueError for formats this process cannot write"""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {format}")
+    if format == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ValueError("The arrow export format needs pyarrow installed") from e
+
+
+def encode_token(filters: Dict, cursor: str) -> str:
+    """Opaque continuation token: the export's filters plus the last row sent"""
+    raw = json.dumps({**filters, "cursor": cursor}, default=_json_default).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Tuple[Dict, str]:
+    """Inverse of encode_token; raises ValueError for malformed tokens"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded))
+        filters = {name: state.get(name) for name in EXPORT_FILTERS}
+        for name in ("created_after", "created_before"):
+            if filters[name] is not None:
+                filters[name] = datetime.fromisoformat(filters[name])
+        cursor = state["cursor"]
+        decode_cursor(cursor)
+        return filters, cursor
+    except (TypeError, ValueError, KeyError, AttributeError) as e:
+        raise ValueError(f"Invalid export token: {token}") from e
+
+
+async def export_chunk(filters: Dict, cursor: Optional[str], chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Statement for the next chunk of an export and the token for the chunk after it"""
+    stmt = consent_export(**filters, cursor=cursor)
+    key = tuple_(consent_records.c.created_at, consent_records.c.id)
+    # Index-only probe for the last key of this chunk and whether anything follows it
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            stmt.with_only_columns(consent_records.c.created_at, consent_records.c.id)
+            .offset(chunk_rows - 1).limit(2)
+        )
+        boundary = result.all()
+    if len(boundary) < 2:
+        return stmt, None
+    # Bound by key rather than LIMIT so rows committed meanwhile cannot shift the chunk
+    last_created_at, last_id = boundary[0]
+    stmt = stmt.where(key >= tuple_(last_created_at, last_id))
+    return stmt, encode_token(filters, encode_cursor(last_created_at, last_id))
+
+
+async def _grouped(db, stmt) -> Dict[UUID, List[Dict]]:
+    grouped: Dict[UUID, List[Dict]] = {}
+    for row in (await db.execute(stmt)).mappings():
+        row = dict(row)
+        grouped.setdefault(row.pop("consent_record_id"), []).append(row)
+    return grouped
+
+
+async def export_batches(stmt, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[Dict]]:
+    """Consent records from a server-side cursor, batch_size at a time, with
+    their audit_log and compliance_checks rows attached"""
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=batch_size))
+        async for partition in result.mappings().partitions():
+            records = [dict(row) for row in partition]
+            ids = [record["id"] for record in records]
+            # Two queries per batch instead of two per record
+            audit = await _grouped(db, audit_entries(ids))
+            checks = await _grouped(db, compliance_entries(ids))
+            for record in records:
+                record["audit_log"] = audit.get(record["id"], [])
+                record["compliance_checks"] = checks.get(record["id"], [])
+            yield records
+
+
+async def _write_ndjson(batches) -> AsyncIterator[bytes]:
+    async for records in batches:
+        yield "".join(json.dumps(record, default=_json_default) + "\n" for record in records).encode()
+
+
+def _csv_value(value):
+    # Nested rows and JSON columns become JSON text in a single cell
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return _json_default(value)
+
+
+async def _write_csv(batches) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    async for records in batches:
+        writer.writerows([_csv_value(record[name]) for name in CSV_HEADER] for record in records)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _arrow_type(pa, column):
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Numeric):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    # UUID, INET, text and JSON (as JSON text)
+    return pa.string()
+
+
+def _arrow_schema(pa):
+    fields = [pa.field(column.name, _arrow_type(pa, column)) for column in EXPORT_COLUMNS]
+    for name, columns in NESTED_COLUMNS.items():
+        row_type = pa.struct([pa.field(column.name, _arrow_type(pa, column)) for column in columns])
+        fields.append(pa.field(name, pa.list_(row_type)))
+    return pa.schema(fields)
+
+
+def _arrow_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, Decimal):
+        return float(value)
+    if value is None or isinstance(value, (bool, int, float, str, datetime)):
+        return value
+    return str(value)
+
+
+def _arrow_row(record: Dict) -> Dict:
+    row = {column.name: _arrow_value(record[column.name]) for column in EXPORT_COLUMNS}
+    for name in NESTED_COLUMNS:
+        row[name] = [{key: _arrow_value(value) for key, value in entry.items()} for entry in record[name]]
+    return row
+
+
+async def _write_arrow(batches) -> AsyncIterator[bytes]:
+    # Arrow IPC stream: one record batch per database batch, readable
+    # incrementally by pyarrow, pandas, polars or DuckDB
+    import pyarrow as pa
+
+    schema = _arrow_schema(pa)
+    sink = io.BytesIO()
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    writer = pa.ipc.new_stream(sink, schema)
+    async for records in batches:
+        writer.write_batch(pa.RecordBatch.from_pylist([_arrow_row(record) for record in records], schema=schema))
+        yield drain()
+    writer.close()
+    yield drain()
+
+
+EXPORT_WRITERS = {"ndjson": _write_ndjson, "csv": _write_csv, "arrow": _write_arrow}
+
+
+def stream_export(batches, format: str) -> AsyncIterator[bytes]:
+    """Encode batches from export_batches as they arrive from the cursor"""
+    return EXPORT_WRITERS[format](batches)
+
+
+class ExportJob:
+    def __init__(self, job_id: str, filters: Dict, format: str, path: str):
+        self.id = job_id
+        self.filters = filters
+        self.format = format
+        self.path = path
+        self.status = "queued"
+        self.rows = 0
+        self.bytes = 0
+        self.error = None
+        self.task: Optional[asyncio.Task] = None
+        self.submitted_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "format": self.format,
+            "filters": json.loads(json.dumps(self.filters, default=_json_default)),
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "error": self.error,
+            "submitted_at": self.submitted_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class ExportJobManager:
+    """Runs exports too large for one response into files under EXPORT_DIR"""
+
+    def __init__(self, directory: str = EXPORT_DIR, max_running: int = EXPORT_MAX_RUNNING_JOBS):
+        self.directory = directory
+        self.max_running = max_running
+        self._jobs: Dict[str, ExportJob] = {}
+
+    def submit(self, filters: Dict, format: str) -> ExportJob:
+        """Start an export in the background and return it immediately"""
+        self._purge()
+        running = sum(1 for job in self._jobs.values() if job.finished_at is None)
+        if running >= self.max_running:
+            raise OverflowError("Too many export jobs running")
+        job_id = str(uuid7())
+        path = os.path.join(self.directory, f"{job_id}.{EXPORT_FORMATS[format][1]}")
+        job = ExportJob(job_id, filters, format, path)
+        self._jobs[job_id] = job
+        job.task = asyncio.ensure_future(self._run(job))
+        return job
+
+    async def _counted(self, job: ExportJob, batches):
+        async for records in batches:
+            job.rows += len(records)
+            yield records
+
+    async def _run(self, job: ExportJob):
+        partial = job.path + ".partial"
+        job.status = "running"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stmt = consent_export(**job.filters)
+            with open(partial, "wb") as file:
+                async for data in stream_export(self._counted(job, export_batches(stmt)), job.format):
+                    await asyncio.to_thread(file.write, data)
+                    job.bytes += len(data)
+            os.replace(partial, job.path)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            job.finished_at = datetime.utcnow()
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[ExportJob]:
+        """Stop a running export and discard its partial file"""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished_at is not None:
+            return job
+        job.task.cancel()
+        if job.status == "queued":
+            # A task cancelled before its first step never enters _run
+            job.status = "cancelled"
+            job.finished_at = datetime.utcnow()
+        return job
+
+    def _purge(self):
+        now = datetime.utcnow()
+        expired = [
+            job for job in self._jobs.values()
+            if job.finished_at is not None
+            and (now - job.finished_at).total_seconds() > EXPORT_JOB_RETENTION_SECONDS
+        ]
+        for job in expired:
+            if os.path.exists(job.path):
+                os.remove(job.path)
+            del self._jobs[job.id]
+
+    async def shutdown(self):
+        tasks = [job.task for job in self._jobs.values() if job.finished_at is None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+export_jobs = ExportJobManager()
@@ -0,0 +1,256 @@
+# Batch ingestion of consent reports with multi-row inserts
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import User, ConsentRecord, ConsentAuditLog, uuid7
+from app.models import ConsentReport
+from app.emotion_aggregation import aggregate_emotions
+from app.signatures import signature_verifier
+
+# Reports are written in chunks so one upload never becomes one giant transaction
+BATCH_CHUNK_SIZE = 1000
+MAX_BATCH_ITEMS = 50000
+
+
+def consent_record_values(report: ConsentReport, user_id: UUID) -> Dict:
+    """Column values for the consent record created from a report"""
+    summary = aggregate_emotions(report.emotions)
+    return {
+        "user_id": user_id,
+        "session_id": report.session_id,
+        "document_type": report.document_type,
+        "detected_emotion": summary["dominant_emotion"] if summary else None,
+        "emotion_confidence": round(summary["dominant_confidence"], 2) if summary else 0.0,
+        "emotion_summary": summary,
+        "voice_sentiment": None,
+        "facial_landmarks": report.facial_landmarks,
+        "user_consent": report.consent_status.lower() == "accepted",
+        "consent_timestamp": datetime.utcnow(),
+        "consent_duration_seconds": int(round(summary["duration_seconds"])) if summary else None,
+        "encrypted_data": report.encrypted_data,
+        "encryption_key_id": report.encryption_key_id,
+        "digital_signature": report.signature,
+        "signature_algorithm": report.signature_algorithm,
+        "jurisdiction": report.jurisdiction,
+        # Set by the signature verifier before the record is written
+        "verification_status": "pending",
+    }
+
+
+# Retries of a session leave the first record alone
+_insert_once = pg_insert(ConsentRecord).on_conflict_do_nothing(index_elements=["session_id", "user_id"])
+
+SUBMISSION_COLUMNS = (
+    ConsentRecord.id, ConsentRecord.verification_status, ConsentRecord.detected_emotion,
+    ConsentRecord.emotion_confidence, ConsentRecord.created_at,
+)
+
+
+def submission_response(row) -> Dict:
+    """Response of POST /consent/submit; built from the stored record so a
+    replay is identical to the original"""
+    return {
+        "status": "success",
+        "consent_id": str(row.id),
+        "message": f"Consent report submitted, signature {row.verification_status}",
+        "verification_status": row.verification_status,
+        "emotion": row.detected_emotion,
+        "confidence": float(row.emotion_confidence) if row.emotion_confidence is not None else None,
+        "timestamp": row.created_at.isoformat(),
+    }
+
+
+def _submission_query(user_id: UUID, session_id: str):
+    return select(*SUBMISSION_COLUMNS).where(ConsentRecord.session_id == session_id, ConsentRecord.user_id == user_id)
+
+
+async def _submitted(db: AsyncSession, user_id: UUID, session_id: str):
+    return (await db.execute(_submission_query(user_id, session_id))).first()
+
+
+async def submit_report(db: AsyncSession, report: ConsentReport, user_id: UUID) -> Tuple[Dict, bool]:
+    """Write the consent record and audit row of a report once per
+    (user_id, session_id). Returns the response and whether it replays an
+    earlier submission of the session."""
+    existing = await _submitted(db, user_id, report.session_id)
+    if existing is not None:
+        return submission_response(existing), True
+
+    values = consent_record_values(report, user_id)
+    values["verification_status"] = (await signature_verifier.verify_records(db, [values]))[0]
+    row = (await db.execute(_insert_once.values(**values).returning(*SUBMISSION_COLUMNS))).first()
+    if row is None:
+        # A concurrent retry of the session committed first
+        await db.rollback()
+        return submission_response(await _submitted(db, user_id, report.session_id)), True
+    db.add(ConsentAuditLog(
+        consent_record_id=row.id,
+        action="created",
+        changed_by="system",
+        change_reason="Consent report submitted",
+    ))
+    await db.commit()
+    return submission_response(row), False
+
+
+def parse_json_array(body: bytes) -> List[Tuple[int, Optional[ConsentReport], Optional[str]]]:
+    """Return (index, report, error) for every element of a JSON array body"""
+    try:
+        items = json.loads(body)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON body: {e}")
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of consent reports")
+    return [_parse_item(index, item) for index, item in enumerate(items)]
+
+
+async def parse_ndjson(chunks) -> AsyncIterator[Tuple[int, Optional[ConsentReport], Optional[str]]]:
+    """Yield (index, report, error) per line of an NDJSON byte stream"""
+    buffer = b""
+    index = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(index, line)
+                index += 1
+    if buffer.strip():
+        yield _parse_line(index, buffer)
+
+
+def _parse_item(index: int, item):
+    try:
+        return index, ConsentReport.model_validate(item), None
+    except ValidationError as e:
+        return index, None, _validation_message(e)
+
+
+def _parse_line(index: int, line: bytes):
+    try:
+        return index, ConsentReport.model_validate_json(line), None
+    except ValidationError as e:
+        return index, None, _validation_message(e)
+
+
+def _validation_message(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+async def ingest_chunk(db: AsyncSession, parsed: List[Tuple[int, Optional[ConsentReport], Optional[str]]]) -> List[Dict]:
+    """Validate users with one query and bulk insert records plus audit rows"""
+    results = []
+    candidates = []
+    for index, report, error in parsed:
+        if error:
+            results.append({"index": index, "status": "error", "error": error})
+            continue
+        try:
+            candidates.append((index, report, UUID(report.user_id)))
+        except ValueError:
+            results.append({"index": index, "status": "error", "error": "Invalid user_id"})
+
+    if candidates:
+        requested_ids = {user_id for _, _, user_id in candidates}
+        found = await db.execute(select(User.id).where(User.id.in_(requested_ids)))
+        known_ids = set(found.scalars().all())
+
+        record_rows = []
+        indexes = []
+        for index, report, user_id in candidates:
+            if user_id not in known_ids:
+                results.append({"index": index, "status": "error", "error": "User not found"})
+                continue
+            record_rows.append({"id": uuid7(), **consent_record_values(report, user_id)})
+            indexes.append(index)
+
+        if record_rows:
+            statuses = await signature_verifier.verify_records(db, record_rows)
+            for row, status in zip(record_rows, statuses):
+                row["verification_status"] = status
+            inserted = set((await db.execute(_insert_once.returning(ConsentRecord.id), record_rows)).scalars())
+            # Sessions submitted before, or twice in this chunk, report the first record
+            duplicates = [row for row in record_rows if row["id"] not in inserted]
+            existing = {}
+            if duplicates:
+                keys = {(row["user_id"], row["session_id"]) for row in duplicates}
+                found = await db.execute(
+                    select(ConsentRecord.user_id, ConsentRecord.session_id, ConsentRecord.id)
+                    .where(tuple_(ConsentRecord.user_id, ConsentRecord.session_id).in_(keys))
+                )
+                existing = {(user_id, session_id): record_id for user_id, session_id, record_id in found}
+            if inserted:
+                await db.execute(insert(ConsentAuditLog), [
+                    {
+                        "id": uuid7(),
+                        "consent_record_id": row["id"],
+                        "action": "created",
+                        "changed_by": "system",
+                        "change_reason": "Consent report submitted in batch",
+                    }
+                    for row in record_rows if row["id"] in inserted
+                ])
+            await db.commit()
+            for index, row in zip(indexes, record_rows):
+                if row["id"] in inserted:
+                    results.append({"index": index, "status": "created", "consent_id": str(row["id"])})
+                else:
+                    record_id = existing.get((row["user_id"], row["session_id"]))
+                    results.append({
+                        "index": index, "status": "duplicate",
+                        "consent_id": str(record_id) if record_id else None,
+                    })
+
+    return results
+
+
+async def ingest_reports(db: AsyncSession, parsed) -> List[Dict]:
+    """Ingest parsed reports chunk by chunk and return per-item results"""
+    results = []
+    chunk = []
+
+    async def flush(pending):
+        try:
+            results.extend(await ingest_chunk(db, pending))
+        except Exception as e:
+            await db.rollback()
+            results.extend(
+                {"index": index, "status": "error", "error": str(e)}
+                for index, _, _ in pending
+            )
+
+    async for item in _aiter(parsed):
+        if item[0] >= MAX_BATCH_ITEMS:
+            results.append({
+                "index": item[0],
+                "status": "error",
+                "error": f"Batch limit of {MAX_BATCH_ITEMS} items exceeded; remaining items not processed",
+            })
+            break
+        chunk.append(item)
+        if len(chunk) >= BATCH_CHUNK_SIZE:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+
+    results.sort(key=lambda result: result["index"])
+    return results
+
+
+async def _aiter(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
@@ -20,7 +20,8 @@ from uuid import uuid4
 # Add backend to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from app.database import Base, User, ConsentRecord, ConsentForm
+from app.database import User, ConsentRecord, ConsentForm
+from app.startup import run_migrations
 
 def init_database():
     """Initialize the database with tables and sample data"""
@@ -42,10 +43,11 @@ def init_database():
             connection.execute(text("SELECT 1"))
             print("✅ Database connection successful")
         
-        # Create all tables
-        print("📊 Creating database tables...")
-        Base.metadata.create_all(bind=engine)
-        print("✅ Tables created successfully")
+        # Create all tables through the migrations, as a deploy does
+        print("📊 Migrating database tables...")
+        os.environ["DATABASE_URL"] = DATABASE_URL
+        run_migrations()
+        print("✅ Database at the latest migration")
         
         # Create session
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -0,0 +1,132 @@
+# In-process cache of EncryptionKey rows
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import EncryptionKey
+
+KEY_CACHE_TTL_SECONDS = float(os.getenv("KEY_CACHE_TTL_SECONDS", "300"))
+
+encryption_keys = EncryptionKey.__table__
+
+
+class KeyCache:
+    """Key rows by id, loaded in one query per batch of misses, plus the
+    current version of each key type.
+
+    Entries live for the TTL but never past the key's expires_at, so an
+    expiring key is re-read (and the next version found) as soon as it
+    expires. Key material stays in this process's memory; unlike the
+    lookup cache there is no shared backend for it.
+    """
+
+    def __init__(self, ttl: float = KEY_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, Dict]] = {}
+        # key_type -> (deadline, newest active key row)
+        self._active: Dict[str, Tuple[float, Optional[Dict]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def _deadline(self, now: float, key: Optional[Dict]) -> float:
+        deadline = now + self.ttl
+        expires_at = key and key.get("expires_at")
+        if expires_at is not None:
+            remaining = (expires_at - datetime.utcnow()).total_seconds()
+            # Already expired keys still decrypt old records; cache them normally
+            if remaining > 0:
+                deadline = min(deadline, now + remaining)
+        return deadline
+
+    def _store(self, now: float, key: Dict):
+        self._entries[key["id"]] = (self._deadline(now, key), key)
+        # A newer version loaded by id means the cached active key was rotated
+        active = self._active.get(key["key_type"])
+        if active is not None and active[1] is not None and (key["key_version"] or 1) > (active[1]["key_version"] or 1):
+            del self._active[key["key_type"]]
+
+    async def get_many(self, db: AsyncSession, key_ids: Iterable[Optional[str]]) -> Dict[str, Dict]:
+        """Key rows for the given ids; unknown ids are left out"""
+        now = time.monotonic()
+        found: Dict[str, Dict] = {}
+        missing = []
+        for key_id in {key_id for key_id in key_ids if key_id}:
+            entry = self._entries.get(key_id)
+            if entry is not None and entry[0] > now:
+                found[key_id] = entry[1]
+                self.hits += 1
+            else:
+                missing.append(key_id)
+                self.misses += 1
+        if missing:
+            self.loads += 1
+            result = await db.execute(select(encryption_keys).where(encryption_keys.c.id.in_(missing)))
+            for row in result.mappings():
+                key = dict(row)
+                self._store(now, key)
+                found[key["id"]] = key
+        return found
+
+    async def get(self, db: AsyncSession, key_id: str) -> Optional[Dict]:
+        return (await self.get_many(db, [key_id])).get(key_id)
+
+    async def active_key(self, db: AsyncSession, key_type: str) -> Optional[Dict]:
+        """Highest active, unexpired version of a key type, or None"""
+        now = time.monotonic()
+        entry = self._active.get(key_type)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        self.loads += 1
+        result = await db.execute(
+            select(encryption_keys)
+            .where(
+                encryption_keys.c.key_type == key_type,
+                encryption_keys.c.is_active.is_(True),
+                or_(encryption_keys.c.expires_at.is_(None), encryption_keys.c.expires_at > datetime.utcnow()),
+            )
+            .order_by(encryption_keys.c.key_version.desc())
+            .limit(1)
+        )
+        row = result.mappings().first()
+        key = dict(row) if row is not None else None
+        if key is not None:
+            self._store(now, key)
+        self._active[key_type] = (self._deadline(now, key), key)
+        return key
+
+    def invalidate(self, key_id: Optional[str] = None):
+        """Forget one key, or every key when key_id is None"""
+        if key_id is None:
+            self._entries.clear()
+            self._active.clear()
+            return
+        self._entries.pop(key_id, None)
+        for key_type, (_, key) in list(self._active.items()):
+            if key is not None and key["id"] == key_id:
+                del self._active[key_type]
+
+    def invalidate_type(self, key_type: str):
+        """Forget the cached current version of a key type"""
+        self._active.pop(key_type, None)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "key_types": len(self._active),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+key_cache = KeyCache()
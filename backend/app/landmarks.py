@@ -0,0 +1,89 @@
+# Packed binary storage for facial landmark arrays
+import os
+import struct
+from typing import Dict
+
+import numpy as np
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+# Blob layout: 16-byte little-endian header followed by the raw array
+#   magic "FLM1" | dtype code (u8) | coordinates per point (u8) | reserved (u16)
+#   | points per frame (u32) | frame count (u32)
+# The header keeps the payload 16-byte aligned for np.frombuffer.
+LANDMARK_MAGIC = b"FLM1"
+LANDMARK_HEADER = struct.Struct("<4sBBHII")
+LANDMARK_DTYPES: Dict[int, np.dtype] = {1: np.dtype("<f2"), 2: np.dtype("<f4")}
+LANDMARK_DTYPE_CODES = {dtype: code for code, dtype in LANDMARK_DTYPES.items()}
+
+# float16 keeps ~3 significant digits, well under a pixel for normalised
+# FaceMesh coordinates; set float32 to store landmarks losslessly
+FACIAL_LANDMARK_DTYPE = np.dtype(os.getenv("FACIAL_LANDMARK_DTYPE", "float16")).newbyteorder("<")
+if FACIAL_LANDMARK_DTYPE not in LANDMARK_DTYPE_CODES:
+    raise ValueError(f"FACIAL_LANDMARK_DTYPE must be float16 or float32, not {FACIAL_LANDMARK_DTYPE}")
+
+
+def landmarks_array(value) -> np.ndarray:
+    """Coerce landmarks to a (frames, points, coordinates) float array.
+
+    Accepts one frame or a list of frames, with points given as [x, y(, z)]
+    lists or {"x": .., "y": .., "z": ..} dicts as FaceMesh emits them.
+    """
+    if not isinstance(value, np.ndarray):
+        value = _point_lists(value)
+    array = np.asarray(value, dtype=np.float32)
+    if array.ndim == 2:
+        array = array[np.newaxis]
+    if array.ndim != 3 or array.shape[2] not in (2, 3):
+        raise ValueError("Landmarks must be points of 2 or 3 coordinates, per frame")
+    return array
+
+
+def _point_lists(value):
+    if isinstance(value, dict):
+        if "x" not in value or "y" not in value:
+            raise ValueError("Landmark points need x and y coordinates")
+        return [value["x"], value["y"], value["z"]] if "z" in value else [value["x"], value["y"]]
+    if isinstance(value, (list, tuple)):
+        return [_point_lists(item) for item in value]
+    return value
+
+
+def encode_landmarks(value, dtype: np.dtype = FACIAL_LANDMARK_DTYPE) -> bytes:
+    """Pack landmarks into a header-prefixed blob"""
+    array = landmarks_array(value)
+    frames, points, coordinates = array.shape
+    header = LANDMARK_HEADER.pack(LANDMARK_MAGIC, LANDMARK_DTYPE_CODES[dtype], coordinates, 0, points, frames)
+    return header + array.astype(dtype, copy=False).tobytes()
+
+
+def decode_landmarks(blob) -> np.ndarray:
+    """Read-only (frames, points, coordinates) view over the blob; no copy is made"""
+    if len(blob) < LANDMARK_HEADER.size:
+        raise ValueError("Not a facial landmark blob")
+    magic, dtype_code, coordinates, _, points, frames = LANDMARK_HEADER.unpack_from(blob)
+    if magic != LANDMARK_MAGIC or dtype_code not in LANDMARK_DTYPES or coordinates not in (2, 3):
+        raise ValueError("Not a facial landmark blob")
+    dtype = LANDMARK_DTYPES[dtype_code]
+    count = frames * points * coordinates
+    if len(blob) != LANDMARK_HEADER.size + count * dtype.itemsize:
+        raise ValueError(f"Facial landmark blob payload does not hold {frames}x{points}x{coordinates} values")
+    array = np.frombuffer(blob, dtype=dtype, offset=LANDMARK_HEADER.size, count=count)
+    return array.reshape(frames, points, coordinates)
+
+
+class LandmarkArray(TypeDecorator):
+    """BYTEA column that takes landmark lists or arrays and returns NumPy arrays"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, (bytes, bytearray, memoryview)):
+            return value
+        return encode_landmarks(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decode_landmarks(value)
@@ -0,0 +1,379 @@
+# Prometheus metrics for requests, the connection pool and SQL statements
+import bisect
+import contextvars
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Metrics configuration
+METRICS_SLOW_QUERY_SECONDS = float(os.getenv("METRICS_SLOW_QUERY_SECONDS", "0.1"))
+METRICS_SLOW_QUERY_SAMPLE_RATE = float(os.getenv("METRICS_SLOW_QUERY_SAMPLE_RATE", "1.0"))
+METRICS_SLOW_QUERY_SAMPLES = int(os.getenv("METRICS_SLOW_QUERY_SAMPLES", "200"))
+# Distinct normalized statements tracked; later ones are counted as "other"
+METRICS_MAX_QUERIES = int(os.getenv("METRICS_MAX_QUERIES", "200"))
+
+# PlainTextResponse appends the charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, labels)} {_number(value)}" for labels, value in values]
+
+
+class Gauge(Metric):
+    """Gauge read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], Optional[float]]):
+        super().__init__(name, help)
+        self.read = read
+
+    def samples(self) -> List[str]:
+        value = self.read()
+        return [] if value is None else [f"{self.name} {_number(value)}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = REQUEST_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        lines = []
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: "OrderedDict[str, Metric]" = OrderedDict()
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status",
+    labels=("method", "route", "status"),
+))
+http_requests_in_progress = 0
+registry.register(Gauge(
+    "http_requests_in_progress", "HTTP requests being served", lambda: http_requests_in_progress,
+))
+pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time to check a connection out of the pool, including connect and pre-ping",
+    buckets=DB_BUCKETS,
+))
+pool_checkout_timeouts = registry.register(Counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up because the pool and its overflow were exhausted",
+))
+statement_duration = registry.register(Histogram(
+    "db_statement_duration_seconds", "SQL statement execution time by statement type",
+    labels=("operation",), buckets=DB_BUCKETS,
+))
+statement_errors = registry.register(Counter(
+    "db_statement_errors_total", "SQL statements that raised, by statement type", labels=("operation",),
+))
+query_seconds = registry.register(Counter(
+    "db_query_duration_seconds_total", "Time spent in each normalized statement, see /metrics/queries",
+    labels=("query_id",),
+))
+query_calls = registry.register(Counter(
+    "db_query_calls_total", "Executions of each normalized statement, see /metrics/queries", labels=("query_id",),
+))
+slow_queries = registry.register(Counter(
+    "db_slow_queries_total", f"Statements slower than METRICS_SLOW_QUERY_SECONDS ({METRICS_SLOW_QUERY_SECONDS}s)",
+))
+
+# ASGI scope of the request being served, for attributing slow statements
+_current_request: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("current_request", default=None)
+
+
+def current_route() -> Optional[str]:
+    """Method and route template of the request being served, if any"""
+    scope = _current_request.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f'{scope["method"]} {getattr(route, "path", None) or "<unmatched>"}'
+
+
+class MetricsMiddleware:
+    """ASGI middleware observing request latency per route template and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global http_requests_in_progress
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+        token = _current_request.set(scope)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_requests_in_progress += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_progress -= 1
+            route = scope.get("route")
+            # Raw paths of unmatched requests would make a series per URL
+            template = getattr(route, "path", None) or "<unmatched>"
+            http_request_duration.observe(time.perf_counter() - start, scope["method"], template, str(status["code"]))
+            _current_request.reset(token)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Pool that times every checkout, so waiting for a free connection shows"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_checkout_timeouts.inc()
+            raise
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - started)
+
+
+# Literals and bind parameters become ?, lists of them collapse (an IN list
+# of one included), so every execution of the same statement shape maps to
+# one entry
+_NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\$\d+|%\(\w+\)s|%s"), "?"),
+    (re.compile(r"\?::\w+(?: WITH(?:OUT)? TIME ZONE)?(?:\[\])?"), "?"),
+    (re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\b(IN)\s*\(\s*\?\s*\)", re.IGNORECASE), r"\1 (?, ...)"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?, ...)"),
+    (re.compile(r"(\((?:\?|\?, \.\.\.)\))(?:\s*,\s*\((?:\?|\?, \.\.\.)\))+"), r"\1, ..."),
+    (re.compile(r"\s+"), " "),
+)
+_normalized: "OrderedDict[str, Tuple[str, str, str]]" = OrderedDict()
+_NORMALIZED_CACHE_SIZE = 1000
+
+
+def normalize_sql(statement: str) -> str:
+    for pattern, replacement in _NORMALIZE:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def _fingerprint(statement: str) -> Tuple[str, str, str]:
+    """(query id, normalized SQL, operation) of a statement, memoized per statement text"""
+    cached = _normalized.get(statement)
+    if cached is not None:
+        _normalized.move_to_end(statement)
+        return cached
+    sql = normalize_sql(statement)
+    words = sql.split(" ", 2)
+    operation = words[0].upper() if words else "OTHER"
+    if operation == "WITH" and len(words) > 1:
+        operation = "SELECT"
+    if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+        operation = "OTHER"
+    fingerprint = (hashlib.sha1(sql.encode()).hexdigest()[:12], sql, operation)
+    _normalized[statement] = fingerprint
+    if len(_normalized) > _NORMALIZED_CACHE_SIZE:
+        _normalized.popitem(last=False)
+    return fingerprint
+
+
+class QueryStats:
+    """Per normalized statement totals and a sample of slow executions"""
+
+    def __init__(self, max_queries: int = METRICS_MAX_QUERIES, slow_seconds: float = METRICS_SLOW_QUERY_SECONDS,
+                 sample_rate: float = METRICS_SLOW_QUERY_SAMPLE_RATE, max_samples: int = METRICS_SLOW_QUERY_SAMPLES):
+        self.max_queries = max_queries
+        self.slow_seconds = slow_seconds
+        self.sample_rate = sample_rate
+        self._queries: Dict[str, Dict] = {}
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float, rows: int, executemany: bool):
+        query_id, sql, operation = _fingerprint(statement)
+        statement_duration.observe(seconds, operation)
+        with self._lock:
+            entry = self._queries.get(query_id)
+            if entry is None and len(self._queries) >= self.max_queries:
+                query_id = "other"
+                entry = self._queries.get(query_id)
+            if entry is None:
+                entry = self._queries[query_id] = {
+                    "query_id": query_id, "sql": sql if query_id != "other" else None, "operation": operation,
+                    "calls": 0, "seconds": 0.0, "max_seconds": 0.0, "rows": 0,
+                }
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["rows"] += max(rows, 0)
+        query_seconds.inc(query_id, amount=seconds)
+        query_calls.inc(query_id)
+        if seconds >= self.slow_seconds:
+            slow_queries.inc()
+            if self.sample_rate >= 1 or random.random() < self.sample_rate:
+                self._samples.append({
+                    "query_id": query_id,
+                    "sql": sql,
+                    "seconds": round(seconds, 6),
+                    "rows": rows,
+                    "executemany": executemany,
+                    "route": current_route(),
+                    "at": datetime.utcnow().isoformat(),
+                })
+
+    def report(self, limit: int = 50) -> Dict:
+        """Statements by total time spent, most expensive first, and the slow samples"""
+        with self._lock:
+            queries = sorted((dict(entry) for entry in self._queries.values()), key=lambda e: e["seconds"], reverse=True)
+        for entry in queries:
+            entry["mean_seconds"] = entry["seconds"] / entry["calls"]
+        return {
+            "slow_query_seconds": self.slow_seconds,
+            "tracked_queries": len(queries),
+            "queries": queries[:limit],
+            "slow_samples": list(reversed(self._samples)),
+        }
+
+
+query_stats = QueryStats()
+
+
+def instrument_engine(engine):
+    """Time every statement of an (async) engine and export its pool's state"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool = sync_engine.pool
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_started"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("metrics_started", None)
+        if started is not None:
+            query_stats.record(statement, time.perf_counter() - started, getattr(cursor, "rowcount", -1), executemany)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None:
+            connection.info.pop("metrics_started", None)
+        if exception_context.statement:
+            statement_errors.inc(_fingerprint(exception_context.statement)[2])
+
+    # The pool is read at scrape time; a disposed engine gets a new one
+    def current():
+        return sync_engine.pool
+
+    capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+    registry.register(Gauge("db_pool_size", "Connections the pool keeps open", lambda: current().size()))
+    registry.register(Gauge("db_pool_max_connections", "Pool size plus max_overflow", lambda: capacity))
+    registry.register(Gauge("db_pool_checked_out", "Connections in use", lambda: current().checkedout()))
+    registry.register(Gauge("db_pool_idle", "Open connections waiting in the pool", lambda: current().checkedin()))
+    registry.register(Gauge(
+        "db_pool_overflow", "Connections open beyond pool_size (negative while the pool is still filling)",
+        lambda: current().overflow(),
+    ))
+    registry.register(Gauge(
+        "db_pool_utilization", "Share of max connections in use", lambda: current().checkedout() / capacity,
+    ))
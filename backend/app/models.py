@@ -1,8 +1,10 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, List
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, Optional, Dict, List
 from datetime import datetime
 from uuid import UUID
 
+from app.landmarks import landmarks_array
+
 # Request/Response Models for API
 
 class ConsentRecordCreate(BaseModel):
@@ -13,7 +15,7 @@ class ConsentRecordCreate(BaseModel):
     emotion_confidence: float = Field(ge=0, le=1)
     voice_sentiment: Optional[str] = None
     voice_confidence: Optional[float] = Field(None, ge=0, le=1)
-    facial_landmarks: Optional[Dict] = None
+    facial_landmarks: Optional[List[Any]] = None
     user_consent: bool
     consent_timestamp: datetime
     consent_duration_seconds: Optional[int] = None
@@ -64,6 +66,46 @@ class ConsentRecordResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class EmotionAnalysis(BaseModel):
+    timestamp: str
+    emotion: str
+    confidence: float
+    face_detected: bool
+
+class ConsentReport(BaseModel):
+    # Idempotency key: resubmitting a session returns the original result
+    session_id: str = Field(min_length=1, max_length=255)
+    user_id: str
+    document_type: str
+    emotions: List[EmotionAnalysis]
+    audio_sentiment: Optional[float] = None
+    consent_status: str
+    signature: str
+    # Signed payload and the encryption_keys row to verify the signature with
+    encrypted_data: Optional[str] = None
+    encryption_key_id: Optional[str] = None
+    signature_algorithm: str = "SHA-256"
+    jurisdiction: str = "India"
+    # One frame or a list of frames of [x, y(, z)] points; stored packed
+    facial_landmarks: Optional[List[Any]] = None
+
+    @field_validator("facial_landmarks")
+    @classmethod
+    def validate_facial_landmarks(cls, value):
+        return None if value is None else landmarks_array(value)
+
+class NLPAnalyzeRequest(BaseModel):
+    text: str = Field(min_length=1)
+    language: Optional[str] = None
+    stop_confidence: Optional[float] = Field(None, ge=0, le=1)
+
+class ConsentExportRequest(BaseModel):
+    jurisdiction: Optional[str] = None
+    verification_status: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    format: str = Field("ndjson", pattern="^(ndjson|csv|arrow)$")
+
 class ConsentVerificationResponse(BaseModel):
     consent_id: UUID
     is_valid: bool
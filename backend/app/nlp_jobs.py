@@ -0,0 +1,282 @@
+# Process-pool execution of NLP pipeline requests
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Pool configuration
+NLP_POOL_SIZE = int(os.getenv("NLP_POOL_SIZE", str(max(1, (os.cpu_count() or 2) - 1))))
+NLP_POOL_START_METHOD = os.getenv("NLP_POOL_START_METHOD", "spawn")
+NLP_SYNC_MAX_CHARS = int(os.getenv("NLP_SYNC_MAX_CHARS", "1000"))
+NLP_SYNC_TIMEOUT_SECONDS = float(os.getenv("NLP_SYNC_TIMEOUT_SECONDS", "30"))
+# Most short texts sent to one worker together; its MicroBatcher splits them by model
+NLP_BATCH_MAX_SIZE = int(os.getenv("NLP_BATCH_MAX_SIZE", "16"))
+NLP_JOB_TIMEOUT_SECONDS = float(os.getenv("NLP_JOB_TIMEOUT_SECONDS", "600"))
+NLP_JOB_RETENTION_SECONDS = float(os.getenv("NLP_JOB_RETENTION_SECONDS", "3600"))
+NLP_MAX_JOBS = int(os.getenv("NLP_MAX_JOBS", "1000"))
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job was cancelled while running"""
+
+
+# Worker-process functions. nlp_pipeline is imported here so the API process
+# never loads transformers itself.
+
+# The worker's MicroBatcher, created by _init_worker
+_batcher = None
+
+
+def _init_worker():
+    global _batcher
+    import nlp_pipeline
+    from nlp_batching import MicroBatcher
+    nlp_pipeline.preload_models()
+    _batcher = MicroBatcher()
+
+
+def _run_texts(items: List[Tuple[str, Optional[str], float]]) -> List:
+    """Analyze (text, language, deadline) items through the worker's
+    MicroBatcher; each entry of the result is {"language", "result"} or the
+    exception it raised. A text still queued at its deadline is withdrawn from
+    the batcher, so a timed-out request does not keep the worker busy."""
+    import nlp_pipeline
+    submitted = []
+    for text, language, deadline in items:
+        if time.time() > deadline:
+            submitted.append((language, None, deadline))
+            continue
+        language = language or nlp_pipeline.detect_language(text)
+        submitted.append((language, _batcher.submit(text, language), deadline))
+    results = []
+    for language, future, deadline in submitted:
+        if future is None:
+            results.append(TimeoutError("NLP analysis timed out before it started"))
+            continue
+        try:
+            results.append({"language": language, "result": future.result(max(0.0, deadline - time.time()))})
+        except FutureTimeoutError:
+            # Only a batch already running on the model is left to finish
+            future.cancel()
+            results.append(TimeoutError("NLP analysis timed out"))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _run_document(job_id: str, text: str, language: Optional[str],
+                  stop_confidence: Optional[float], deadline: float, cancelled):
+    import nlp_pipeline
+    chunks = []
+    summary = None
+    if time.time() > deadline:
+        raise TimeoutError("Job timed out before it started")
+    for chunk in nlp_pipeline.nlp_pipeline_stream(text, language=language, stop_confidence=stop_confidence):
+        chunks.append({"chunk_index": chunk["chunk_index"], "result": chunk["result"]})
+        summary = chunk["aggregate"]
+        # Cancellation and timeouts are honoured between windows
+        if job_id in cancelled:
+            raise JobCancelled("Job cancelled")
+        if time.time() > deadline:
+            raise TimeoutError("Job timed out")
+    return {"aggregate": summary, "chunks": chunks}
+
+
+class NLPJob:
+    def __init__(self, job_id: str, chars: int, future):
+        self.id = job_id
+        self.chars = chars
+        self.future = future
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.submitted_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+
+    def current_status(self) -> str:
+        if self.status == "queued" and self.future.running():
+            return "running"
+        return self.status
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.current_status(),
+            "chars": self.chars,
+            "error": self.error,
+            "submitted_at": self.submitted_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class NLPJobManager:
+    """Owns the worker pool and tracks submitted document jobs"""
+
+    def __init__(self, pool_size: int = NLP_POOL_SIZE, start_method: str = NLP_POOL_START_METHOD):
+        self.pool_size = pool_size
+        self.start_method = start_method
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._cancelled = None
+        self._jobs: Dict[str, NLPJob] = {}
+        self._watchers = set()
+        # Short texts waiting for a free worker, as (text, language, deadline, future)
+        self._pending: List[Tuple[str, Optional[str], float, asyncio.Future]] = []
+        self._in_flight = 0
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        # Workers start on first use so API workers that never serve NLP stay light
+        if self._pool is None:
+            context = multiprocessing.get_context(self.start_method)
+            self._manager = context.Manager()
+            self._cancelled = self._manager.dict()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.pool_size, mp_context=context, initializer=_init_worker
+            )
+        return self._pool
+
+    async def analyze(self, text: str, language: Optional[str] = None,
+                      timeout: float = NLP_SYNC_TIMEOUT_SECONDS):
+        """Run a short text on the pool and wait for its result. Texts that
+        arrive while every worker is busy go to the next free one together."""
+        if len(text) > NLP_SYNC_MAX_CHARS:
+            raise ValueError(f"Text longer than {NLP_SYNC_MAX_CHARS} characters; submit it as a job")
+        self._ensure_pool()
+        future = asyncio.get_running_loop().create_future()
+        # The worker checks the same deadline, wall clock as it spans processes
+        self._pending.append((text, language, time.time() + timeout, future))
+        self._dispatch()
+        # Timing out cancels the future, so a text still pending is never sent
+        return await asyncio.wait_for(future, timeout)
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self._pending and self._in_flight < self.pool_size:
+            batch = [item for item in self._pending[:NLP_BATCH_MAX_SIZE] if not item[3].done()]
+            del self._pending[:NLP_BATCH_MAX_SIZE]
+            if not batch:
+                continue
+            self._in_flight += 1
+            task = self._pool.submit(_run_texts, [item[:3] for item in batch])
+            task.add_done_callback(lambda task, batch=batch: self._finished(loop, batch, task))
+
+    def _finished(self, loop, batch, task):
+        # Runs on the pool's result thread
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._finish, batch, task)
+
+    def _finish(self, batch, task):
+        self._in_flight = max(0, self._in_flight - 1)
+        if task.cancelled():
+            # The pool shut down before the worker took the texts
+            results = [None] * len(batch)
+        else:
+            try:
+                results = task.result()
+            except Exception as e:
+                results = [e] * len(batch)
+        for (*_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if result is None:
+                future.cancel()
+            elif isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        if self._pool is not None:
+            self._dispatch()
+
+    def submit(self, text: str, language: Optional[str] = None,
+               stop_confidence: Optional[float] = None,
+               timeout: float = NLP_JOB_TIMEOUT_SECONDS) -> NLPJob:
+        """Queue a document job and return it immediately"""
+        self._purge()
+        if len(self._jobs) >= NLP_MAX_JOBS:
+            raise OverflowError("Too many NLP jobs in flight")
+        job_id = str(uuid.uuid4())
+        pool = self._ensure_pool()
+        future = pool.submit(
+            _run_document, job_id, text, language, stop_confidence,
+            time.time() + timeout, self._cancelled
+        )
+        job = NLPJob(job_id, len(text), future)
+        self._jobs[job_id] = job
+        watcher = asyncio.ensure_future(self._watch(job))
+        self._watchers.add(watcher)
+        watcher.add_done_callback(self._watchers.discard)
+        return job
+
+    async def _watch(self, job: NLPJob):
+        try:
+            job.result = await asyncio.wrap_future(job.future)
+            job.status = "completed"
+        except (JobCancelled, asyncio.CancelledError):
+            job.status = "cancelled"
+        except TimeoutError as e:
+            job.status = "timed_out"
+            job.error = str(e)
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            job.finished_at = datetime.utcnow()
+            if self._cancelled is not None:
+                self._cancelled.pop(job.id, None)
+
+    def get(self, job_id: str) -> Optional[NLPJob]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[NLPJob]:
+        """Cancel a queued job outright or flag a running one to stop"""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished_at is not None:
+            return job
+        if not job.future.cancel():
+            self._cancelled[job_id] = True
+        return job
+
+    def _purge(self):
+        now = datetime.utcnow()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None
+            and (now - job.finished_at).total_seconds() > NLP_JOB_RETENTION_SECONDS
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> Dict:
+        statuses: Dict[str, int] = {}
+        for job in self._jobs.values():
+            status = job.current_status()
+            statuses[status] = statuses.get(status, 0) + 1
+        return {
+            "pool_size": self.pool_size,
+            "pool_started": self._pool is not None,
+            "sync_max_chars": NLP_SYNC_MAX_CHARS,
+            "sync_in_flight": self._in_flight,
+            "sync_pending": len(self._pending),
+            "jobs": statuses,
+        }
+
+    def shutdown(self):
+        for *_, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._in_flight = 0
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+            self._cancelled = None
+
+
+nlp_jobs = NLPJobManager()
@@ -0,0 +1,80 @@
+# Keyset pagination and NDJSON streaming for listing endpoints
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.session import AsyncSessionLocal
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    """Opaque cursor for the (created_at, id) position of a row"""
+    raw = json.dumps([created_at.isoformat(), str(row_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_query(stmt, table, cursor: Optional[str]):
+    """Order newest first on (created_at, id) and resume after a cursor"""
+    stmt = stmt.order_by(table.c.created_at.desc(), table.c.id.desc())
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(table.c.created_at, table.c.id) < tuple_(created_at, row_id))
+    return stmt
+
+
+async def fetch_page(db: AsyncSession, stmt, table, limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """Fetch one page of plain row dicts plus the cursor for the next page"""
+    result = await db.execute(stmt.limit(limit + 1))
+    rows = [_plain_row(row) for row in result.mappings()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return rows, next_cursor
+
+
+def _plain_row(row) -> Dict:
+    # Landmark arrays become nested lists the JSON encoder understands
+    return {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in row.items()}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+async def stream_ndjson(stmt, batch_size: int = STREAM_BATCH_SIZE):
+    """Yield rows as NDJSON from a server-side cursor, batch_size rows at a time"""
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=batch_size))
+        async for partition in result.mappings().partitions():
+            yield "".join(json.dumps(dict(row), default=_json_default) + "\n" for row in partition)
@@ -0,0 +1,197 @@
+# Monthly range partitions and retention for the append-only log tables
+import asyncio
+import os
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, text
+
+from app.database import Base
+from app.session import get_engine
+
+# Partition configuration. A retention of 0 months keeps partitions forever.
+PARTITION_PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", "3"))
+PARTITION_RETENTION_ACTION = os.getenv("PARTITION_RETENTION_ACTION", "detach")
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "21600"))
+PARTITIONED_TABLES = {
+    "api_logs": int(os.getenv("API_LOG_RETENTION_MONTHS", "6")),
+    "consent_audit_log": int(os.getenv("AUDIT_LOG_RETENTION_MONTHS", "84")),
+}
+
+# Any fixed key works; it only has to be shared by every worker
+_MAINTENANCE_LOCK_KEY = 726_001_013
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table_name: str, month: date) -> str:
+    return f"{table_name}_p{month.year:04d}_{month.month:02d}"
+
+
+def _partition_month(table_name: str, name: str) -> Optional[date]:
+    match = re.fullmatch(rf"{re.escape(table_name)}_p(\d{{4}})_(\d{{2}})", name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def attached_partitions(connection, table_name: str) -> List[str]:
+    result = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:table_name) ORDER BY child.relname"
+    ), {"table_name": table_name})
+    return [name for (name,) in result]
+
+
+def ensure_partitions(connection, table_name: str, start=None, end=None, today=None) -> List[str]:
+    """Create the monthly partitions from start (default: this month) through
+    PARTITION_PREMAKE_MONTHS ahead, or through end if that is later"""
+    current = month_start(today or datetime.utcnow())
+    month = month_start(start) if start else current
+    last = add_months(current, PARTITION_PREMAKE_MONTHS)
+    if end and month_start(end) > last:
+        last = month_start(end)
+    existing = set(attached_partitions(connection, table_name))
+    created = []
+    while month <= last:
+        name = partition_name(table_name, month)
+        if name not in existing:
+            connection.exec_driver_sql(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table_name} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            )
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def expire_partitions(connection, table_name: str, retention_months: int,
+                      action: str = PARTITION_RETENTION_ACTION, today=None) -> List[str]:
+    """Detach or drop partitions whose whole month is older than the retention window.
+    Detached partitions stay behind as plain tables for archiving."""
+    if retention_months <= 0:
+        return []
+    if action not in ("detach", "drop"):
+        raise ValueError(f"Unknown partition retention action: {action}")
+    cutoff = add_months(month_start(today or datetime.utcnow()), -retention_months)
+    expired = []
+    for name in attached_partitions(connection, table_name):
+        month = _partition_month(table_name, name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+        if action == "drop":
+            connection.exec_driver_sql(f"DROP TABLE {name}")
+        else:
+            connection.exec_driver_sql(f"ALTER TABLE {table_name} DETACH PARTITION {name}")
+        expired.append(name)
+    return expired
+
+
+def migrate_unpartitioned(connection, table_name: str) -> bool:
+    """Rebuild a table created before partitioning as a partitioned table.
+    Runs in the caller's transaction, so a failure leaves the old table intact."""
+    relkind = connection.execute(
+        text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:table_name)"), {"table_name": table_name}
+    ).scalar()
+    if relkind != "r":
+        return False
+    legacy = f"{table_name}_unpartitioned"
+    print(f"Migrating {table_name} to monthly partitions...")
+    connection.exec_driver_sql(f"ALTER TABLE {table_name} RENAME TO {legacy}")
+    # Index names are schema-wide, so move the old ones out of the way
+    indexes = connection.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :legacy"), {"legacy": legacy}
+    ).scalars().all()
+    for index in indexes:
+        connection.exec_driver_sql(f'ALTER INDEX "{index}" RENAME TO "{index}_unpartitioned"')
+
+    table = Base.metadata.tables[table_name]
+    table.create(connection)
+    first, last = connection.execute(text(f"SELECT MIN(created_at), MAX(created_at) FROM {legacy}")).one()
+    ensure_partitions(connection, table_name, start=first, end=last)
+
+    columns = ", ".join(column.name for column in table.columns)
+    values = ", ".join(
+        "COALESCE(created_at, CURRENT_TIMESTAMP)" if column.name == "created_at" else column.name
+        for column in table.columns
+    )
+    connection.exec_driver_sql(f"INSERT INTO {table_name} ({columns}) SELECT {values} FROM {legacy}")
+    connection.exec_driver_sql(f"DROP TABLE {legacy}")
+    return True
+
+
+def maintain_partitions(connection, today=None) -> Dict[str, List[str]]:
+    """Create upcoming partitions and expire old ones for every partitioned table"""
+    # Serialise workers; the lock is released when the transaction ends
+    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK_KEY})
+    summary = {"created": [], "expired": []}
+    for table_name, retention_months in PARTITIONED_TABLES.items():
+        summary["created"] += ensure_partitions(connection, table_name, today=today)
+        summary["expired"] += expire_partitions(connection, table_name, retention_months, today=today)
+    return summary
+
+
+@event.listens_for(Base.metadata, "after_create")
+def install_partitions(target, connection, **kw):
+    """Convert legacy tables and create partitions whenever create_all runs against Postgres"""
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK_KEY})
+    for table_name in PARTITIONED_TABLES:
+        migrate_unpartitioned(connection, table_name)
+        ensure_partitions(connection, table_name)
+
+
+class PartitionMaintainer:
+    """Background task that keeps future partitions ahead and applies retention"""
+
+    def __init__(self, interval: float = PARTITION_MAINTENANCE_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = asyncio.Event()
+
+    def start(self):
+        if self._task is None:
+            self._stopped.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopped.set()
+        await self._task
+        self._task = None
+
+    async def run_once(self) -> Dict[str, List[str]]:
+        async with get_engine().begin() as connection:
+            summary = await connection.run_sync(maintain_partitions)
+        if summary["created"] or summary["expired"]:
+            print(f"Partition maintenance: created {summary['created']}, "
+                  f"expired ({PARTITION_RETENTION_ACTION}) {summary['expired']}")
+        return summary
+
+    async def _run(self):
+        while not self._stopped.is_set():
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Partition maintenance failed: {e}")
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+partition_maintainer = PartitionMaintainer()
+
+
+if __name__ == "__main__":
+    # One-off run, e.g. from cron when the API's background task is disabled
+    print(asyncio.run(partition_maintainer.run_once()))
@@ -0,0 +1,121 @@
+# Statement builders for the API's lookup and listing queries. The query-plan
+# suite in tests/test_query_plans.py runs EXPLAIN on these exact statements.
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import any_, bindparam, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+
+from app.database import APILog, ComplianceCheck, ConsentAuditLog, ConsentRecord, User
+from app.pagination import keyset_query
+
+consent_records = ConsentRecord.__table__
+api_logs = APILog.__table__
+consent_audit_log = ConsentAuditLog.__table__
+compliance_checks = ComplianceCheck.__table__
+
+# Columns of the cross-user consent listing. All of them are key or INCLUDE
+# columns of idx_consent_records_jurisdiction_status_created_at, so pages
+# filtered on jurisdiction and status are served by index-only scans.
+CONSENT_SUMMARY_COLUMNS = (
+    consent_records.c.id,
+    consent_records.c.user_id,
+    consent_records.c.document_type,
+    consent_records.c.jurisdiction,
+    consent_records.c.verification_status,
+    consent_records.c.user_consent,
+    consent_records.c.created_at,
+)
+
+# Columns of the regulator export. Landmark blobs are biometric data and
+# encrypted_data is ciphertext, so neither leaves the database.
+EXPORT_COLUMNS = tuple(
+    column for column in consent_records.c if column.name not in ("facial_landmarks", "encrypted_data")
+)
+AUDIT_EXPORT_COLUMNS = tuple(column for column in consent_audit_log.c if column.name != "consent_record_id")
+COMPLIANCE_EXPORT_COLUMNS = tuple(column for column in compliance_checks.c if column.name != "consent_record_id")
+
+# Rendered as a literal rather than a bind parameter so that generic plans
+# of prepared statements still match the partial index predicate
+API_LOG_ERROR_STATUS = literal_column("400")
+
+
+def user_by_email(email: str):
+    return select(User).where(User.email == email)
+
+
+def user_consents(user_id: UUID, cursor: Optional[str] = None):
+    """A user's consent records, newest first"""
+    stmt = select(consent_records).where(consent_records.c.user_id == user_id)
+    return keyset_query(stmt, consent_records, cursor)
+
+
+def _filter_consents(stmt, jurisdiction, verification_status, created_after, created_before):
+    if jurisdiction is not None:
+        stmt = stmt.where(consent_records.c.jurisdiction == jurisdiction)
+    if verification_status is not None:
+        stmt = stmt.where(consent_records.c.verification_status == verification_status)
+    if created_after is not None:
+        stmt = stmt.where(consent_records.c.created_at >= created_after)
+    if created_before is not None:
+        stmt = stmt.where(consent_records.c.created_at < created_before)
+    return stmt
+
+
+def consent_summaries(jurisdiction: Optional[str] = None, verification_status: Optional[str] = None,
+                      created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+                      cursor: Optional[str] = None):
+    """Consent records across users filtered by jurisdiction, status and creation time, newest first"""
+    stmt = _filter_consents(
+        select(*CONSENT_SUMMARY_COLUMNS), jurisdiction, verification_status, created_after, created_before
+    )
+    return keyset_query(stmt, consent_records, cursor)
+
+
+def consent_export(jurisdiction: Optional[str] = None, verification_status: Optional[str] = None,
+                   created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+                   cursor: Optional[str] = None):
+    """Full consent records for the regulator export, in the same order and filters as consent_summaries"""
+    stmt = _filter_consents(
+        select(*EXPORT_COLUMNS), jurisdiction, verification_status, created_after, created_before
+    )
+    return keyset_query(stmt, consent_records, cursor)
+
+
+def uuid_array(name: str, ids: List[UUID]):
+    """Bind a list of ids as one uuid[] parameter for column == any_(...).
+    Unlike an IN list, every batch size reuses one prepared statement."""
+    return bindparam(name, ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+
+
+def _for_consent_records(table, columns, order_column, consent_record_ids: List[UUID]):
+    return (
+        select(table.c.consent_record_id, *columns)
+        .where(table.c.consent_record_id == any_(uuid_array("consent_record_ids", consent_record_ids)))
+        .order_by(table.c.consent_record_id, order_column)
+    )
+
+
+def audit_entries(consent_record_ids: List[UUID]):
+    """Audit log rows of a batch of consent records, oldest first per record"""
+    return _for_consent_records(
+        consent_audit_log, AUDIT_EXPORT_COLUMNS, consent_audit_log.c.created_at, consent_record_ids
+    )
+
+
+def compliance_entries(consent_record_ids: List[UUID]):
+    """Compliance check rows of a batch of consent records, oldest first per record"""
+    return _for_consent_records(
+        compliance_checks, COMPLIANCE_EXPORT_COLUMNS, compliance_checks.c.check_timestamp, consent_record_ids
+    )
+
+
+def api_log_entries(endpoint: Optional[str] = None, errors_only: bool = False, cursor: Optional[str] = None):
+    """API log rows, optionally for one route template or only failed requests, newest first"""
+    stmt = select(api_logs)
+    if endpoint is not None:
+        stmt = stmt.where(api_logs.c.endpoint == endpoint)
+    if errors_only:
+        stmt = stmt.where(api_logs.c.response_status >= API_LOG_ERROR_STATUS)
+    return keyset_query(stmt, api_logs, cursor)
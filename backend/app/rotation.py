@@ -0,0 +1,385 @@
+# Key rotation: re-encrypting consent records under the next key version
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Text, bindparam, func, select, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+
+from app.cache import lookup_cache
+from app.database import EncryptionKey, KeyRotation, uuid7
+from app.encryption import DecryptionError, generate_key_data, key_bytes, payload_digest, reencrypt_payload
+from app.keys import key_cache
+from app.queries import consent_records
+from app.session import AsyncSessionLocal
+
+# Rotation configuration
+ROTATION_BATCH_SIZE = int(os.getenv("ROTATION_BATCH_SIZE", "500"))
+ROTATION_THREADS = int(os.getenv("ROTATION_THREADS", str(os.cpu_count() or 1)))
+ROTATION_CHUNK_SIZE = int(os.getenv("ROTATION_CHUNK_SIZE", "128"))
+# Passes over the table; later passes pick up records that changed or were
+# written under the old key while an earlier pass ran
+ROTATION_MAX_PASSES = int(os.getenv("ROTATION_MAX_PASSES", "3"))
+
+RUNNING = "running"
+PAUSED = "paused"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# The batch is read without row locks and re-encrypted outside the database;
+# only rows still holding the payload that was read are rewritten, so a
+# concurrent withdrawal or resubmission wins and consent rows stay locked
+# just for this statement.
+_UPDATE_PAYLOADS = text("""
+    UPDATE consent_records
+    SET encrypted_data = change.encrypted_data,
+        encryption_key_id = :new_key_id,
+        signed_data_hash = COALESCE(consent_records.signed_data_hash, change.old_digest),
+        signing_key_id = COALESCE(consent_records.signing_key_id, :old_key_id)
+    FROM unnest(:ids, :payloads, :old_digests) AS change(id, encrypted_data, old_digest)
+    WHERE consent_records.id = change.id
+      AND consent_records.encryption_key_id = :old_key_id
+      AND encode(sha256(convert_to(consent_records.encrypted_data, 'UTF8')), 'hex')
+          IS NOT DISTINCT FROM change.old_digest
+    RETURNING consent_records.id
+""").bindparams(
+    bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("payloads", type_=ARRAY(Text)),
+    bindparam("old_digests", type_=ARRAY(Text)),
+)
+
+# (new payload, digest of the old one) per record; None when it failed to decrypt
+Reencrypted = Optional[Tuple[Optional[str], Optional[str]]]
+
+
+def _reencrypt_chunk(payloads: List[Optional[str]], old_key: bytes, new_key: bytes) -> List[Reencrypted]:
+    results: List[Reencrypted] = []
+    for payload in payloads:
+        if payload is None:
+            results.append((None, None))
+            continue
+        try:
+            results.append((reencrypt_payload(payload, old_key, new_key), payload_digest(payload)))
+        except DecryptionError:
+            results.append(None)
+    return results
+
+
+def _chunk_query(old_key_id: str, last_record_id: Optional[UUID], batch_size: int):
+    stmt = (
+        select(consent_records.c.id, consent_records.c.encrypted_data)
+        .where(consent_records.c.encryption_key_id == old_key_id)
+        .order_by(consent_records.c.id)
+        .limit(batch_size)
+    )
+    if last_record_id is not None:
+        stmt = stmt.where(consent_records.c.id > last_record_id)
+    return stmt
+
+
+class RotationNotFound(LookupError):
+    """Raised for unknown keys and rotations"""
+
+
+async def start_rotation(old_key_id: str, created_by: str = "key_rotation") -> UUID:
+    """Create the next version of a key and the rotation that moves its records.
+
+    The old key is deactivated at once, so it is only used to decrypt from
+    here on. Raises RotationNotFound, or ValueError for a key that was
+    already rotated.
+    """
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            old = (await db.execute(
+                select(EncryptionKey).where(EncryptionKey.id == old_key_id).with_for_update()
+            )).scalar_one_or_none()
+            if old is None:
+                raise RotationNotFound("Encryption key not found")
+            if not old.is_active:
+                raise ValueError(f"Encryption key {old_key_id} was already rotated")
+            now = datetime.utcnow()
+            expires_at = None
+            if old.expires_at is not None and old.created_at is not None:
+                # The new version gets the same lifetime
+                expires_at = now + (old.expires_at - old.created_at)
+            new = EncryptionKey(
+                id=str(uuid7()),
+                key_type=old.key_type,
+                algorithm=old.algorithm,
+                key_data=generate_key_data(),
+                key_version=(old.key_version or 1) + 1,
+                is_active=True,
+                created_at=now,
+                expires_at=expires_at,
+                created_by=created_by,
+            )
+            old.is_active = False
+            old.rotated_at = now
+            total = (await db.execute(
+                select(func.count()).select_from(consent_records)
+                .where(consent_records.c.encryption_key_id == old_key_id)
+            )).scalar_one()
+            rotation = KeyRotation(
+                id=uuid7(), old_key_id=old_key_id, new_key_id=new.id,
+                status=RUNNING, records_total=total, started_at=now,
+            )
+            db.add_all([new, rotation])
+    key_cache.invalidate(old_key_id)
+    key_cache.invalidate_type(old.key_type)
+    return rotation.id
+
+
+class KeyRotator:
+    """Runs rotations as background tasks, one committed chunk at a time.
+
+    Each chunk commits its re-encrypted records together with the
+    rotation's checkpoint, so a rotation stopped by a crash, a deploy or
+    pause() continues from its last chunk. The checkpoint row lock
+    serialises runners in several processes on the same rotation.
+    """
+
+    def __init__(self, batch_size: int = ROTATION_BATCH_SIZE, threads: int = ROTATION_THREADS,
+                 chunk_size: int = ROTATION_CHUNK_SIZE):
+        self.batch_size = batch_size
+        self.threads = threads
+        self.chunk_size = chunk_size
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._tasks: Dict[UUID, asyncio.Task] = {}
+        self.chunks = 0
+        self.rotated = 0
+        self.failed = 0
+
+    def _ensure_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="key-rotation")
+        return self._pool
+
+    async def reencrypt(self, payloads: List[Optional[str]], old_key: bytes, new_key: bytes) -> List[Reencrypted]:
+        """Re-encrypt payloads on the pool; AES-GCM runs in OpenSSL without the GIL"""
+        loop = asyncio.get_running_loop()
+        pool = self._ensure_pool()
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(pool, _reencrypt_chunk, payloads[start:start + self.chunk_size], old_key, new_key)
+            for start in range(0, len(payloads), self.chunk_size)
+        ))
+        return [result for chunk in chunks for result in chunk]
+
+    async def rotate_chunk(self, rotation_id: UUID) -> Optional[str]:
+        """Re-encrypt the next chunk past the checkpoint; returns the rotation's status"""
+        updated: List[UUID] = []
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                rotation = (await db.execute(
+                    select(KeyRotation).where(KeyRotation.id == rotation_id).with_for_update()
+                )).scalar_one_or_none()
+                if rotation is None or rotation.status != RUNNING:
+                    return rotation.status if rotation is not None else None
+                keys = await key_cache.get_many(db, [rotation.old_key_id, rotation.new_key_id])
+                if rotation.old_key_id not in keys or rotation.new_key_id not in keys:
+                    raise RotationNotFound("Encryption key of the rotation not found")
+
+                rows = (await db.execute(
+                    _chunk_query(rotation.old_key_id, rotation.last_record_id, self.batch_size)
+                )).all()
+
+                if rows:
+                    results = await self.reencrypt(
+                        [row.encrypted_data for row in rows],
+                        key_bytes(keys[rotation.old_key_id]["key_data"]),
+                        key_bytes(keys[rotation.new_key_id]["key_data"]),
+                    )
+                    changes = [(row.id, result) for row, result in zip(rows, results) if result is not None]
+                    if changes:
+                        updated = (await db.execute(_UPDATE_PAYLOADS, {
+                            "ids": [record_id for record_id, _ in changes],
+                            "payloads": [payload for _, (payload, _) in changes],
+                            "old_digests": [digest for _, (_, digest) in changes],
+                            "new_key_id": rotation.new_key_id,
+                            "old_key_id": rotation.old_key_id,
+                        })).scalars().all()
+                    failed = len(rows) - len(changes)
+                    rotation.last_record_id = rows[-1].id
+                    rotation.records_rotated += len(updated)
+                    rotation.records_failed += failed
+                    self.chunks += 1
+                    self.rotated += len(updated)
+                    self.failed += failed
+
+                if len(rows) < self.batch_size:
+                    await self._finish_pass(db, rotation)
+                status = rotation.status
+        for record_id in updated:
+            await lookup_cache.invalidate("consent_records", record_id)
+        return status
+
+    async def _finish_pass(self, db, rotation: KeyRotation):
+        # Records that failed to decrypt are left on the old key; anything
+        # else still there was skipped by this pass and gets another one
+        remaining = (await db.execute(
+            select(func.count()).select_from(consent_records)
+            .where(consent_records.c.encryption_key_id == rotation.old_key_id)
+        )).scalar_one()
+        if remaining > rotation.records_failed and rotation.passes < ROTATION_MAX_PASSES:
+            rotation.passes += 1
+            rotation.last_record_id = None
+            rotation.records_failed = 0
+            return
+        rotation.status = COMPLETED
+        rotation.records_remaining = remaining
+        rotation.finished_at = datetime.utcnow()
+
+    async def run(self, rotation_id: UUID) -> Optional[str]:
+        """Rotate chunk by chunk until the rotation completes or is paused"""
+        try:
+            while True:
+                status = await self.rotate_chunk(rotation_id)
+                if status != RUNNING:
+                    return status
+        except asyncio.CancelledError:
+            # Left running in the database; resume() picks it up again
+            raise
+        except Exception as e:
+            print(f"Key rotation {rotation_id} failed: {e}")
+            await _set_status(rotation_id, FAILED, error=f"{type(e).__name__}: {e}")
+            return FAILED
+
+    def _spawn(self, rotation_id: UUID):
+        task = self._tasks.get(rotation_id)
+        if task is None or task.done():
+            self._tasks[rotation_id] = asyncio.create_task(self.run(rotation_id))
+
+    async def start(self, old_key_id: str) -> UUID:
+        rotation_id = await start_rotation(old_key_id)
+        self._spawn(rotation_id)
+        return rotation_id
+
+    async def resume(self, rotation_id: Optional[UUID] = None) -> List[UUID]:
+        """Continue one paused or failed rotation, or every running one when no id is given"""
+        if rotation_id is not None:
+            if not await _set_status(rotation_id, RUNNING, allowed=(RUNNING, PAUSED, FAILED)):
+                raise ValueError("Only paused or failed rotations can be resumed")
+            rotation_ids = [rotation_id]
+        else:
+            async with AsyncSessionLocal() as db:
+                rotation_ids = (await db.execute(
+                    select(KeyRotation.id).where(KeyRotation.status == RUNNING)
+                )).scalars().all()
+        for pending_id in rotation_ids:
+            self._spawn(pending_id)
+        return list(rotation_ids)
+
+    async def pause(self, rotation_id: UUID):
+        """Stop after the chunk in flight; the checkpoint keeps the progress"""
+        if not await _set_status(rotation_id, PAUSED, allowed=(RUNNING,)):
+            raise ValueError("Only running rotations can be paused")
+
+    async def shutdown(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict:
+        return {
+            "running": sorted(str(rotation_id) for rotation_id, task in self._tasks.items() if not task.done()),
+            "batch_size": self.batch_size,
+            "threads": self.threads,
+            "chunks": self.chunks,
+            "rotated": self.rotated,
+            "failed": self.failed,
+            "key_cache": key_cache.stats(),
+        }
+
+
+async def _set_status(rotation_id: UUID, status: str, allowed: Tuple[str, ...] = (), error: Optional[str] = None) -> bool:
+    """Change a rotation's status; False when it is not in one of the allowed states.
+    Raises RotationNotFound."""
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            # Waits for the chunk in flight, which holds this row lock
+            rotation = (await db.execute(
+                select(KeyRotation).where(KeyRotation.id == rotation_id).with_for_update()
+            )).scalar_one_or_none()
+            if rotation is None:
+                raise RotationNotFound("Key rotation not found")
+            if allowed and rotation.status not in allowed:
+                return False
+            rotation.status = status
+            rotation.error = error
+    return True
+
+
+async def read_rotation(rotation_id: UUID) -> Dict:
+    """Progress of a rotation; raises RotationNotFound"""
+    async with AsyncSessionLocal() as db:
+        rotation = await db.get(KeyRotation, rotation_id)
+    if rotation is None:
+        raise RotationNotFound("Key rotation not found")
+    elapsed = ((rotation.finished_at or datetime.utcnow()) - rotation.started_at).total_seconds()
+    return {
+        "id": str(rotation.id),
+        "old_key_id": rotation.old_key_id,
+        "new_key_id": rotation.new_key_id,
+        "status": rotation.status,
+        "passes": rotation.passes,
+        "records_total": rotation.records_total,
+        "records_rotated": rotation.records_rotated,
+        "records_failed": rotation.records_failed,
+        "records_remaining": rotation.records_remaining,
+        "percent": round(100 * rotation.records_rotated / rotation.records_total, 1) if rotation.records_total else None,
+        "records_per_second": round(rotation.records_rotated / elapsed) if elapsed > 0 else None,
+        "last_record_id": str(rotation.last_record_id) if rotation.last_record_id else None,
+        "error": rotation.error,
+        "started_at": rotation.started_at.isoformat(),
+        "finished_at": rotation.finished_at.isoformat() if rotation.finished_at else None,
+    }
+
+
+key_rotator = KeyRotator()
+
+
+async def _main(key_id: Optional[str], key_type: Optional[str], resume: Optional[str], batch_size: int):
+    rotator = KeyRotator(batch_size=batch_size)
+    if resume:
+        rotation_id = UUID(resume)
+        await _set_status(rotation_id, RUNNING, allowed=(RUNNING, PAUSED, FAILED))
+    else:
+        if key_type:
+            async with AsyncSessionLocal() as db:
+                key = await key_cache.active_key(db, key_type)
+            if key is None:
+                raise SystemExit(f"No active {key_type} key")
+            key_id = key["id"]
+        rotation_id = await start_rotation(key_id)
+        print(f"Rotation {rotation_id}")
+    started = time.perf_counter()
+    task = asyncio.create_task(rotator.run(rotation_id))
+    while not task.done():
+        await asyncio.wait([task], timeout=5)
+        progress = await read_rotation(rotation_id)
+        print(f"pass {progress['passes']}: {progress['records_rotated']}/{progress['records_total']} records, "
+              f"{progress['records_failed']} failed")
+    print(f"{task.result()} in {time.perf_counter() - started:.1f}s")
+    print(await read_rotation(rotation_id))
+    await rotator.shutdown()
+
+
+if __name__ == "__main__":
+    # Rotation outside the API, e.g. from a maintenance job; interrupt and
+    # continue it with --resume
+    parser = argparse.ArgumentParser(description="Rotate an encryption key and re-encrypt its consent records")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--key-id", help="key to rotate")
+    target.add_argument("--key-type", help="rotate the current version of this key type")
+    target.add_argument("--resume", metavar="ROTATION_ID", help="continue an interrupted rotation")
+    parser.add_argument("--batch-size", type=int, default=ROTATION_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(_main(args.key_id, args.key_type, args.resume, args.batch_size))
@@ -0,0 +1,287 @@
+# Signature verification of consent records on a thread pool
+import asyncio
+import hashlib
+import hmac
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import Text, bindparam, func, select, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import lookup_cache
+from app.keys import key_cache
+from app.pagination import encode_cursor, keyset_query
+from app.queries import consent_records
+from app.session import AsyncSessionLocal
+
+# Verifier configuration
+SIGNATURE_VERIFY_THREADS = int(os.getenv("SIGNATURE_VERIFY_THREADS", str(os.cpu_count() or 1)))
+SIGNATURE_VERIFY_CHUNK_SIZE = int(os.getenv("SIGNATURE_VERIFY_CHUNK_SIZE", "256"))
+SIGNATURE_SWEEP_BATCH_SIZE = int(os.getenv("SIGNATURE_SWEEP_BATCH_SIZE", "2000"))
+
+VERIFIED = "verified"
+REJECTED = "rejected"
+# No signature, payload or known key to check against
+UNVERIFIED = "pending"
+
+
+def signed_message(encrypted_data: str) -> bytes:
+    """What the client signs: the hex SHA-256 of the encrypted payload (ConsentScreen.tsx)"""
+    return hashlib.sha256(encrypted_data.encode()).hexdigest().encode()
+
+
+def signing_key_id(record: Dict) -> Optional[str]:
+    """Key the record was signed with; its encryption key until a rotation"""
+    return record.get("signing_key_id") or record.get("encryption_key_id")
+
+
+def _keyed_sha256(message: bytes, key: bytes) -> str:
+    # signConsent in frontend/src/utils/crypto.ts
+    return "SIGNATURE_" + hashlib.sha256(message + key).hexdigest()[:32]
+
+
+def _hmac_sha256(message: bytes, key: bytes) -> str:
+    return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+
+# signature_algorithm -> function computing the expected signature
+SIGNATURE_ALGORITHMS: Dict[str, Callable[[bytes, bytes], str]] = {
+    "SHA-256": _keyed_sha256,
+    "HMAC-SHA256": _hmac_sha256,
+}
+
+
+def verify_record(record: Dict, keys: Dict[str, Dict]) -> str:
+    """Recompute a record's signature and return its verification status"""
+    signature = record.get("digital_signature")
+    encrypted_data = record.get("encrypted_data")
+    key = keys.get(signing_key_id(record))
+    sign = SIGNATURE_ALGORITHMS.get(record.get("signature_algorithm") or "SHA-256")
+    if not signature or not encrypted_data or key is None or sign is None:
+        return UNVERIFIED
+    # A key rotation re-encrypts the payload the client signed; it checks the
+    # GCM tag first and keeps the signed digest and key (app/rotation.py)
+    signed_data_hash = record.get("signed_data_hash")
+    message = signed_data_hash.encode() if signed_data_hash else signed_message(encrypted_data)
+    expected = sign(message, key["key_data"].encode())
+    return VERIFIED if hmac.compare_digest(expected, signature) else REJECTED
+
+
+def _verify_chunk(records: List[Dict], keys: Dict[str, Dict]) -> List[str]:
+    return [verify_record(record, keys) for record in records]
+
+
+class SignatureVerifier:
+    """Verifies batches of records on a thread pool; hashlib releases the GIL
+    while hashing payloads larger than 2 KiB, so chunks hash in parallel"""
+
+    def __init__(self, threads: int = SIGNATURE_VERIFY_THREADS, chunk_size: int = SIGNATURE_VERIFY_CHUNK_SIZE):
+        self.threads = threads
+        self.chunk_size = chunk_size
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.verified = 0
+        self.rejected = 0
+        self.unverified = 0
+
+    def _ensure_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="signature-verify")
+        return self._pool
+
+    async def verify_records(self, db: AsyncSession, records: List[Dict]) -> List[str]:
+        """Verification status for each record dict, in order"""
+        keys = await key_cache.get_many(db, (signing_key_id(record) for record in records))
+        return await self.verify_batch(records, keys)
+
+    async def verify_batch(self, records: List[Dict], keys: Dict[str, Dict]) -> List[str]:
+        """Verify records against already resolved keys"""
+        if len(records) <= self.chunk_size:
+            # One submit: not worth a hop to the pool
+            statuses = _verify_chunk(records, keys)
+        else:
+            loop = asyncio.get_running_loop()
+            pool = self._ensure_pool()
+            chunks = await asyncio.gather(*(
+                loop.run_in_executor(pool, _verify_chunk, records[start:start + self.chunk_size], keys)
+                for start in range(0, len(records), self.chunk_size)
+            ))
+            statuses = [status for chunk in chunks for status in chunk]
+        self.verified += statuses.count(VERIFIED)
+        self.rejected += statuses.count(REJECTED)
+        self.unverified += statuses.count(UNVERIFIED)
+        return statuses
+
+    def stats(self) -> Dict:
+        return {
+            "threads": self.threads,
+            "chunk_size": self.chunk_size,
+            "verified": self.verified,
+            "rejected": self.rejected,
+            "unverified": self.unverified,
+            "key_cache": key_cache.stats(),
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+signature_verifier = SignatureVerifier()
+
+SWEEP_COLUMNS = (
+    consent_records.c.id,
+    consent_records.c.created_at,
+    consent_records.c.encrypted_data,
+    consent_records.c.encryption_key_id,
+    consent_records.c.signed_data_hash,
+    consent_records.c.signing_key_id,
+    consent_records.c.digital_signature,
+    consent_records.c.signature_algorithm,
+    consent_records.c.verification_status,
+)
+
+# Withdrawn records have had their payload erased and keep their status
+_SWEEP_FILTER = consent_records.c.verification_status.is_distinct_from("withdrawn")
+
+# Only rows whose status is still what the sweep read are changed, so a
+# withdrawal committed meanwhile is not overwritten
+_UPDATE_STATUSES = text("""
+    UPDATE consent_records SET verification_status = change.status
+    FROM unnest(:ids, :old_statuses, :statuses) AS change(id, old_status, status)
+    WHERE consent_records.id = change.id
+      AND consent_records.verification_status IS NOT DISTINCT FROM change.old_status
+""").bindparams(
+    bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("old_statuses", type_=ARRAY(Text)),
+    bindparam("statuses", type_=ARRAY(Text)),
+)
+
+
+class SignatureSweep:
+    """Background re-verification of every stored signature, newest first"""
+
+    def __init__(self, batch_size: int = SIGNATURE_SWEEP_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._reset()
+
+    def _reset(self):
+        self.status = "idle"
+        self.total = 0
+        self.processed = 0
+        self.counts = {VERIFIED: 0, REJECTED: 0, UNVERIFIED: 0}
+        self.changed = 0
+        self.error = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._started = 0.0
+        self._finished: Optional[float] = None
+
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start a sweep; raises RuntimeError while one is running"""
+        if self.running():
+            raise RuntimeError("A signature sweep is already running")
+        self._reset()
+        self.status = "running"
+        self.started_at = datetime.utcnow()
+        self._started = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        try:
+            async with AsyncSessionLocal() as db:
+                self.total = (await db.execute(
+                    select(func.count()).select_from(consent_records).where(_SWEEP_FILTER)
+                )).scalar_one()
+            cursor = None
+            while True:
+                cursor = await self._sweep_batch(cursor)
+                if cursor is None:
+                    break
+            self.status = "completed"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+        except Exception as e:
+            self.status = "failed"
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.finished_at = datetime.utcnow()
+            self._finished = time.perf_counter()
+
+    async def _sweep_batch(self, cursor: Optional[str]) -> Optional[str]:
+        async with AsyncSessionLocal() as db:
+            stmt = keyset_query(select(*SWEEP_COLUMNS).where(_SWEEP_FILTER), consent_records, cursor)
+            rows = [dict(row) for row in (await db.execute(stmt.limit(self.batch_size))).mappings()]
+            if not rows:
+                return None
+            statuses = await signature_verifier.verify_records(db, rows)
+            changed = [(row, status) for row, status in zip(rows, statuses) if status != row["verification_status"]]
+            if changed:
+                await db.execute(_UPDATE_STATUSES, {
+                    "ids": [row["id"] for row, _ in changed],
+                    "old_statuses": [row["verification_status"] for row, _ in changed],
+                    "statuses": [status for _, status in changed],
+                })
+                await db.commit()
+        for row, _ in changed:
+            await lookup_cache.invalidate("consent_records", row["id"])
+        self.processed += len(rows)
+        self.changed += len(changed)
+        for status in statuses:
+            self.counts[status] += 1
+        if len(rows) < self.batch_size:
+            return None
+        return encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+    def cancel(self):
+        if self.running():
+            self._task.cancel()
+
+    async def wait(self):
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def progress(self) -> Dict:
+        elapsed = 0.0
+        if self.started_at:
+            elapsed = (self._finished or time.perf_counter()) - self._started
+        return {
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "percent": round(100 * self.processed / self.total, 1) if self.total else None,
+            **self.counts,
+            "changed": self.changed,
+            "signatures_per_second": round(self.processed / elapsed) if elapsed else None,
+            "error": self.error,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+signature_sweep = SignatureSweep()
+
+
+async def _main():
+    signature_sweep.start()
+    while signature_sweep.running():
+        await asyncio.sleep(1)
+        progress = signature_sweep.progress()
+        print(f"{progress['processed']}/{progress['total']} records, "
+              f"{progress['signatures_per_second']} signatures/s")
+    await signature_sweep.wait()
+    print(signature_sweep.progress())
+    signature_verifier.shutdown()
+
+
+if __name__ == "__main__":
+    # One-off sweep, e.g. from cron after keys were replaced
+    asyncio.run(_main())
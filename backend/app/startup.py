@@ -0,0 +1,156 @@
+# Application startup: migrations, lazy engine, pool prewarm and health probes
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+
+from app.metrics import Gauge, registry
+from app.session import DB_POOL_SIZE, get_engine, prewarm_pool
+
+# Startup configuration. Migrations normally run once per deploy, before the
+# workers start (see the Dockerfile); MIGRATE_ON_STARTUP=true is for development.
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "false").lower() == "true"
+DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", str(DB_POOL_SIZE)))
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    # Keep the application's logging configuration
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def run_migrations():
+    """alembic upgrade head; waits while another process migrates"""
+    command.upgrade(alembic_config(), "head")
+
+
+def head_revision() -> Optional[str]:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+async def current_revision(connection) -> Optional[str]:
+    """Revision the database is at; None before the first migration"""
+    if await connection.scalar(text("SELECT to_regclass('alembic_version')")) is None:
+        return None
+    return await connection.scalar(text("SELECT version_num FROM alembic_version"))
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started, from /proc; None elsewhere"""
+    try:
+        with open("/proc/self/stat") as stat:
+            # Fields after the command name; starttime is field 22 of stat
+            started_ticks = int(stat.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime:
+            return float(uptime.read().split()[0]) - started_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Startup:
+    """Runs the startup phases, times them and answers the health probes"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.finished = False
+        self.seconds: Optional[float] = None
+        self.prewarmed = 0
+        self.revision: Optional[str] = None
+        self.head: Optional[str] = None
+        self.error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - started, 4)
+
+    async def prepare_database(self):
+        """Migrate if configured, create the engine, fill the pool and read the
+        schema revision. A database that is down does not stop the app from
+        starting; it stays unready until the database answers."""
+        self.started_at = datetime.utcnow()
+        age = process_age()
+        if age is not None:
+            # Interpreter start and imports, up to the lifespan hook
+            self.phases["imports"] = round(age, 4)
+        if MIGRATE_ON_STARTUP:
+            with self.phase("migrations"):
+                await asyncio.to_thread(run_migrations)
+        with self.phase("engine"):
+            engine = get_engine()
+        with self.phase("head_revision"):
+            self.head = head_revision()
+        try:
+            with self.phase("pool_prewarm"):
+                self.prewarmed = await prewarm_pool(DB_POOL_PREWARM)
+            with self.phase("schema_check"):
+                async with engine.connect() as connection:
+                    self.revision = await current_revision(connection)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"Database unavailable at startup: {self.error}")
+
+    def finish(self):
+        self.finished = True
+        age = process_age()
+        self.seconds = round(age, 4) if age is not None else round(sum(self.phases.values()), 4)
+        phases = ", ".join(f"{name} {seconds:.3f} s" for name, seconds in self.phases.items())
+        print(f"Started in {self.seconds:.3f} s ({phases}; {self.prewarmed} pooled connections)")
+        if self.revision != self.head:
+            print(f"Database schema is at revision {self.revision}, expected {self.head}: "
+                  f"run alembic upgrade head")
+
+    def liveness(self) -> Dict:
+        """The event loop answers; no I/O, so a slow database cannot fail it"""
+        return {"status": "alive", "timestamp": datetime.utcnow().isoformat()}
+
+    async def readiness(self) -> Dict:
+        """Startup finished, a pooled connection answers and the schema is at head"""
+        result = {"ready": False, "startup": self.report()}
+        if not self.finished:
+            return {**result, "status": "starting"}
+        try:
+            await asyncio.wait_for(self._check_database(), READINESS_TIMEOUT_SECONDS)
+        except Exception as e:
+            return {**result, "status": "database unavailable", "error": f"{type(e).__name__}: {e}"}
+        if self.revision != self.head:
+            return {**result, "status": "schema out of date", "revision": self.revision, "head": self.head}
+        return {**result, "ready": True, "status": "ready", "revision": self.revision}
+
+    async def _check_database(self):
+        # pool_pre_ping checks the pooled connection on checkout
+        async with get_engine().connect() as connection:
+            if self.revision != self.head:
+                # Until it has been seen at head; a deploy may migrate meanwhile
+                self.revision = await current_revision(connection)
+
+    def report(self) -> Dict:
+        return {
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "seconds": self.seconds,
+            "phases": self.phases,
+            "prewarmed_connections": self.prewarmed,
+            "migrate_on_startup": MIGRATE_ON_STARTUP,
+            "error": self.error,
+        }
+
+
+startup = Startup()
+
+registry.register(Gauge("app_startup_seconds", "Seconds from process start until the app was ready",
+                        lambda: startup.seconds))
@@ -0,0 +1,154 @@
+# Trigger-maintained statistics counters served by GET /stats
+from typing import Dict
+
+from sqlalchemy import BigInteger, cast, event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import Base, StatisticsCounter
+
+# Breakdown dimensions kept for consent_records
+CONSENT_DIMENSIONS = ("jurisdiction", "document_type", "verification_status")
+
+# Each counter is spread over this many rows, picked by transaction id, so
+# concurrent writers rarely queue on the same row; reads sum the slots.
+STATISTICS_COUNTER_SLOTS = 16
+_SLOT = f"mod(txid_current(), {STATISTICS_COUNTER_SLOTS})"
+
+_CONSENT_DELTAS = {
+    "INSERT": "SELECT {columns}, 1 AS n FROM new_rows",
+    "DELETE": "SELECT {columns}, -1 AS n FROM old_rows",
+    "UPDATE": "SELECT {columns}, 1 AS n FROM new_rows UNION ALL SELECT {columns}, -1 AS n FROM old_rows",
+}
+
+# Rows are upserted in key order so concurrent writers lock counters consistently
+_CONSENT_APPLY = """
+        WITH delta AS ({source})
+        INSERT INTO statistics_counters AS counter (metric, dimension_value, slot, count)
+        SELECT metric, dimension_value, """ + _SLOT + """, SUM(n) FROM (
+            SELECT 'consent_records' AS metric, '' AS dimension_value, n FROM delta
+{expansions}
+        ) expanded
+        GROUP BY metric, dimension_value
+        HAVING SUM(n) <> 0
+        ORDER BY metric, dimension_value
+        ON CONFLICT (metric, dimension_value, slot) DO UPDATE SET count = counter.count + EXCLUDED.count;"""
+
+
+def _consent_trigger_function() -> str:
+    columns = ", ".join(CONSENT_DIMENSIONS)
+    expansions = "\n".join(
+        f"            UNION ALL SELECT 'consent_records.{column}', COALESCE({column}, ''), n FROM delta"
+        for column in CONSENT_DIMENSIONS
+    )
+    branches = "\n    ELS".join(
+        f"IF TG_OP = '{operation}' THEN"
+        + _CONSENT_APPLY.format(source=source.format(columns=columns), expansions=expansions)
+        for operation, source in _CONSENT_DELTAS.items()
+    )
+    return f"""CREATE OR REPLACE FUNCTION consent_records_statistics()
+RETURNS TRIGGER AS $$
+BEGIN
+    {branches}
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql'"""
+
+
+USERS_TRIGGER_FUNCTION = f"""CREATE OR REPLACE FUNCTION users_statistics()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO statistics_counters AS counter (metric, dimension_value, slot, count)
+        SELECT 'users', '', {_SLOT}, COUNT(*) FROM new_rows HAVING COUNT(*) > 0
+        ON CONFLICT (metric, dimension_value, slot) DO UPDATE SET count = counter.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO statistics_counters AS counter (metric, dimension_value, slot, count)
+        SELECT 'users', '', {_SLOT}, -COUNT(*) FROM old_rows HAVING COUNT(*) > 0
+        ON CONFLICT (metric, dimension_value, slot) DO UPDATE SET count = counter.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql'"""
+
+
+def _statement_triggers(table: str, function: str, operations) -> list:
+    references = {
+        "INSERT": "REFERENCING NEW TABLE AS new_rows",
+        "DELETE": "REFERENCING OLD TABLE AS old_rows",
+        "UPDATE": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    }
+    statements = []
+    for operation in operations:
+        name = f"{table}_statistics_{operation.lower()}"
+        statements.append(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+        statements.append(
+            f"CREATE TRIGGER {name} AFTER {operation} ON {table} "
+            f"{references[operation]} FOR EACH STATEMENT EXECUTE FUNCTION {function}()"
+        )
+    return statements
+
+
+STATISTICS_DDL = [
+    _consent_trigger_function(),
+    USERS_TRIGGER_FUNCTION,
+    *_statement_triggers("consent_records", "consent_records_statistics", ("INSERT", "UPDATE", "DELETE")),
+    *_statement_triggers("users", "users_statistics", ("INSERT", "DELETE")),
+]
+
+RECONCILE_SQL = [
+    # EXCLUSIVE waits out writers that already touched the counters and makes
+    # later triggers wait for us, so the recount cannot double count or miss rows
+    "LOCK TABLE statistics_counters IN EXCLUSIVE MODE",
+    "DELETE FROM statistics_counters",
+    # Recounted totals go to slot 0
+    """INSERT INTO statistics_counters (metric, dimension_value, slot, count)
+        SELECT 'users', '', 0, COUNT(*) FROM users
+        UNION ALL SELECT 'consent_records', '', 0, COUNT(*) FROM consent_records
+""" + "\n".join(
+        f"        UNION ALL SELECT 'consent_records.{column}', COALESCE({column}, ''), 0, COUNT(*) "
+        f"FROM consent_records GROUP BY 2"
+        for column in CONSENT_DIMENSIONS
+    ),
+]
+
+
+@event.listens_for(Base.metadata, "after_create")
+def install_statistics_triggers(target, connection, **kw):
+    """Create the counter triggers whenever create_all runs against Postgres"""
+    if connection.dialect.name != "postgresql":
+        return
+    for statement in STATISTICS_DDL:
+        connection.exec_driver_sql(statement)
+
+
+async def reconcile_statistics(db: AsyncSession):
+    """Recount every counter from the base tables"""
+    for statement in RECONCILE_SQL:
+        await db.execute(text(statement))
+    await db.commit()
+
+
+async def read_statistics(db: AsyncSession) -> Dict:
+    """Totals and per-dimension breakdowns from the counters table, summed over slots"""
+    result = await db.execute(
+        select(StatisticsCounter.metric, StatisticsCounter.dimension_value,
+               cast(func.sum(StatisticsCounter.count), BigInteger))
+        .group_by(StatisticsCounter.metric, StatisticsCounter.dimension_value)
+    )
+    totals: Dict[str, int] = {}
+    breakdowns: Dict[str, Dict[str, int]] = {column: {} for column in CONSENT_DIMENSIONS}
+    for metric, dimension_value, count in result:
+        if "." in metric:
+            if count:
+                breakdowns.setdefault(metric.split(".", 1)[1], {})[dimension_value or "unspecified"] = count
+        else:
+            totals[metric] = count
+    return {
+        "total_users": totals.get("users", 0),
+        "total_consent_records": totals.get("consent_records", 0),
+        "verified_consents": breakdowns["verification_status"].get("verified", 0),
+        "by_jurisdiction": breakdowns["jurisdiction"],
+        "by_document_type": breakdowns["document_type"],
+        "by_verification_status": breakdowns["verification_status"],
+    }
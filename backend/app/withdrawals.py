@@ -0,0 +1,244 @@
+# Consent withdrawals and the worker that deletes withdrawn personal data
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import any_, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import lookup_cache
+from app.database import ConsentAuditLog, ConsentRecord, WithdrawalRecord, uuid7
+from app.queries import consent_records, uuid_array
+from app.session import AsyncSessionLocal
+
+# Worker configuration
+WITHDRAWAL_WORKERS = int(os.getenv("WITHDRAWAL_WORKERS", "1"))
+WITHDRAWAL_BATCH_SIZE = int(os.getenv("WITHDRAWAL_BATCH_SIZE", "500"))
+WITHDRAWAL_POLL_INTERVAL = float(os.getenv("WITHDRAWAL_POLL_INTERVAL", "5.0"))
+
+# Personal data erased from a consent record once its withdrawal is processed.
+# Who consented to which document, when, under which signature, and that the
+# consent was later withdrawn stays behind as the audit trail. Encryption keys
+# are shared between records, so encrypted_data is erased rather than
+# crypto-shredded by destroying its key.
+SCRUBBED_FIELDS = (
+    "detected_emotion",
+    "emotion_confidence",
+    "emotion_summary",
+    "voice_sentiment",
+    "voice_confidence",
+    "facial_landmarks",
+    "ip_address",
+    "device_info",
+    "browser_user_agent",
+    "encrypted_data",
+    "encryption_key_id",
+)
+
+withdrawal_records = WithdrawalRecord.__table__
+
+
+class AlreadyWithdrawn(Exception):
+    """Raised when a consent record already has a withdrawal"""
+
+    def __init__(self, withdrawal: WithdrawalRecord):
+        super().__init__(f"Consent record already withdrawn by {withdrawal.id}")
+        self.withdrawal = withdrawal
+
+
+async def request_withdrawal(db: AsyncSession, consent_record_id: UUID, reason: Optional[str] = None,
+                             method: str = "user_request") -> WithdrawalRecord:
+    """Record a withdrawal and mark the consent withdrawn; the data itself is
+    deleted later by the withdrawal worker. Raises LookupError or AlreadyWithdrawn."""
+    # The row lock serialises concurrent withdrawals of the same record
+    consent = (await db.execute(
+        select(ConsentRecord).where(ConsentRecord.id == consent_record_id).with_for_update()
+    )).scalar_one_or_none()
+    if consent is None:
+        raise LookupError("Consent record not found")
+    existing = (await db.execute(
+        select(WithdrawalRecord).where(WithdrawalRecord.consent_record_id == consent_record_id).limit(1)
+    )).scalar_one_or_none()
+    if existing is not None:
+        raise AlreadyWithdrawn(existing)
+
+    withdrawal = WithdrawalRecord(
+        consent_record_id=consent_record_id,
+        withdrawal_reason=reason,
+        withdrawal_method=method,
+    )
+    db.add(withdrawal)
+    db.add(ConsentAuditLog(
+        consent_record_id=consent_record_id,
+        action="withdrawn",
+        changed_fields=["verification_status"],
+        old_values={"verification_status": consent.verification_status},
+        new_values={"verification_status": "withdrawn"},
+        changed_by=method,
+        change_reason=reason or "Consent withdrawn",
+    ))
+    consent.verification_status = "withdrawn"
+    await db.commit()
+    await lookup_cache.invalidate("consent_records", consent_record_id)
+    withdrawal_worker.notify()
+    return withdrawal
+
+
+async def process_withdrawals(batch_size: int = WITHDRAWAL_BATCH_SIZE) -> int:
+    """Erase the consent data of one chunk of pending withdrawals.
+
+    The chunk is claimed with FOR UPDATE SKIP LOCKED, so concurrent workers
+    take disjoint chunks instead of queueing behind each other, and every
+    statement touches only the claimed rows. A worker that dies mid-chunk
+    rolls back and leaves its withdrawals pending for the next one.
+    Returns the number of withdrawals processed.
+    """
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            claimed = (await db.execute(
+                select(withdrawal_records.c.id, withdrawal_records.c.consent_record_id)
+                .where(withdrawal_records.c.data_deletion_status == "pending")
+                .order_by(withdrawal_records.c.withdrawal_timestamp)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not claimed:
+                return 0
+            withdrawal_ids = [row.id for row in claimed]
+            consent_ids = sorted({row.consent_record_id for row in claimed})
+            now = datetime.utcnow()
+
+            await db.execute(
+                update(consent_records)
+                .where(consent_records.c.id == any_(uuid_array("consent_ids", consent_ids)))
+                .values({**{field: None for field in SCRUBBED_FIELDS}, "updated_at": now})
+            )
+            await db.execute(insert(ConsentAuditLog.__table__), [
+                {
+                    "id": uuid7(),
+                    "consent_record_id": consent_id,
+                    "action": "data_deleted",
+                    "changed_fields": list(SCRUBBED_FIELDS),
+                    "changed_by": "withdrawal_worker",
+                    "change_reason": "Consent withdrawn",
+                    "created_at": now,
+                }
+                for consent_id in consent_ids
+            ])
+            await db.execute(
+                update(withdrawal_records)
+                .where(withdrawal_records.c.id == any_(uuid_array("withdrawal_ids", withdrawal_ids)))
+                .values(data_deletion_status="completed", data_deletion_timestamp=now)
+            )
+    for consent_id in consent_ids:
+        await lookup_cache.invalidate("consent_records", consent_id)
+    return len(claimed)
+
+
+async def pending_withdrawals() -> int:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(func.count()).select_from(withdrawal_records)
+            .where(withdrawal_records.c.data_deletion_status == "pending")
+        )
+        return result.scalar_one()
+
+
+class WithdrawalWorker:
+    """Background tasks draining pending withdrawals chunk by chunk"""
+
+    def __init__(self, workers: int = WITHDRAWAL_WORKERS, batch_size: int = WITHDRAWAL_BATCH_SIZE,
+                 poll_interval: float = WITHDRAWAL_POLL_INTERVAL):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self.processed = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        if not self._tasks:
+            self._stopping = False
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        if not self._tasks:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers after a withdrawal was requested"""
+        self._wakeup.set()
+
+    async def run_once(self) -> int:
+        processed = await process_withdrawals(self.batch_size)
+        if processed:
+            self.processed += processed
+            self.batches += 1
+        return processed
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Withdrawal processing failed: {e}")
+                processed = 0
+            # Keep going while chunks come back full, otherwise wait for work
+            if processed < self.batch_size and not self._stopping:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def stats(self) -> Dict:
+        return {
+            "workers": len(self._tasks),
+            "batch_size": self.batch_size,
+            "processed": self.processed,
+            "batches": self.batches,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+withdrawal_worker = WithdrawalWorker()
+
+
+async def _drain(workers: int, batch_size: int):
+    async def drain_one():
+        processed = 0
+        while True:
+            count = await process_withdrawals(batch_size)
+            processed += count
+            if count < batch_size:
+                return processed
+
+    started = time.perf_counter()
+    processed = sum(await asyncio.gather(*(drain_one() for _ in range(workers))))
+    elapsed = time.perf_counter() - started
+    print(f"Processed {processed} withdrawals with {workers} workers in {elapsed:.2f}s "
+          f"({processed / elapsed if elapsed else 0:.0f}/s)")
+
+
+if __name__ == "__main__":
+    # Extra worker capacity next to the API, e.g. from cron or a job runner
+    parser = argparse.ArgumentParser(description="Process pending consent withdrawals")
+    parser.add_argument("--workers", type=int, default=WITHDRAWAL_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=WITHDRAWAL_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(_drain(args.workers, args.batch_size))
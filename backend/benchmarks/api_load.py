@@ -0,0 +1,349 @@
+"""API Load Benchmark
+
+Drives the consent API with concurrent clients and reports throughput and
+p50/p95/p99 latency for creating users, submitting consent reports with a
+full emotion time series, the consent listings and /stats, then for a mix
+of all of them. Results are written as JSON (--output) and can be checked
+against an earlier run (--compare), so a regression shows up as a number.
+
+By default the app runs in-process behind httpx's ASGI transport with its
+startup and shutdown hooks, so the numbers cover routing, validation, the
+async session pool and PostgreSQL but not the HTTP server. --url sends the
+clients to a running server instead (uvicorn, gunicorn).
+
+PostgreSQL comes from DATABASE_URL. Without it an embedded server is
+started in a temporary directory through the optional pgserver package
+(pip install pgserver) and removed afterwards. The in-process app migrates
+the database to head first. Users and consent records created by the run
+are left behind, so use a scratch database.
+
+Usage:
+    python backend/benchmarks/api_load.py [--concurrency 16] [--requests 1000] [--output results.json]
+    python backend/benchmarks/api_load.py --compare baseline.json [--max-regression 10]
+    python backend/benchmarks/api_load.py --url http://localhost:8000
+
+Environment Variables:
+    DATABASE_URL: Database of the in-process app (default: embedded pgserver)
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+EMOTIONS = ['neutral', 'happy', 'sad', 'angry', 'fearful', 'disgusted', 'surprised']
+JURISDICTIONS = ['India', 'Kerala', 'Karnataka', 'Tamil Nadu', 'Maharashtra']
+DOCUMENT_TYPES = ['Property Sale Deed', 'Gift Deed', 'Power of Attorney', 'Lease Agreement']
+# Share of requests per endpoint in the mixed scenario
+MIX = [('submit', 20), ('user consents', 40), ('consents', 30), ('stats', 10)]
+
+
+def percentile_summary(latencies):
+    values = np.asarray(latencies) * 1000
+    if not len(values):
+        return {'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'mean': round(float(values.mean()), 3),
+        'p50': round(float(p50), 3),
+        'p95': round(float(p95), 3),
+        'p99': round(float(p99), 3),
+        'max': round(float(values.max()), 3),
+    }
+
+
+def consent_report(rng, user_id, frames):
+    """A report like ConsentScreen.tsx submits: one emotion sample per
+    analysed video frame (about 10 per second), 68 facial landmarks and the
+    AES-GCM payload with its signature"""
+    started = datetime.utcnow() - timedelta(seconds=frames / 10)
+    mood = rng.choice(EMOTIONS)
+    emotions = []
+    for index in range(frames):
+        emotion = mood if rng.random() < 0.8 else rng.choice(EMOTIONS)
+        emotions.append({
+            'timestamp': (started + timedelta(milliseconds=100 * index)).isoformat() + 'Z',
+            'emotion': emotion,
+            'confidence': round(rng.uniform(0.4, 0.99), 3),
+            'face_detected': rng.random() < 0.97,
+        })
+    encrypted_data = json.dumps({
+        'encrypted': [rng.randrange(256) for _ in range(700)],
+        'iv': [rng.randrange(256) for _ in range(12)],
+    }, separators=(',', ':'))
+    digest = hashlib.sha256(encrypted_data.encode()).hexdigest()
+    return {
+        'session_id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'user_id': user_id,
+        'document_type': rng.choice(DOCUMENT_TYPES),
+        'emotions': emotions,
+        'audio_sentiment': round(rng.uniform(-1, 1), 3),
+        'consent_status': 'accepted',
+        'signature': 'SIGNATURE_' + hashlib.sha256((digest + 'bench-key').encode()).hexdigest()[:32],
+        'encrypted_data': encrypted_data,
+        'jurisdiction': rng.choice(JURISDICTIONS),
+        'facial_landmarks': [[rng.uniform(0, 640), rng.uniform(0, 480)] for _ in range(68)],
+    }
+
+
+class Scenario:
+    """A named request factory; request(index) returns (method, path, json body)"""
+
+    def __init__(self, name, request):
+        self.name = name
+        self.request = request
+
+
+def build_scenarios(state, args):
+    rng = random.Random(args.seed)
+    run_id = uuid.uuid4().hex[:8]
+    # Report bodies are built up front and reused, so building them is not timed
+    reports = [consent_report(rng, None, args.frames) for _ in range(100)]
+
+    def create_user(index):
+        return 'POST', '/users', {'email': f'load-{run_id}-{index}@example.com', 'full_name': 'Load Test'}
+
+    def submit(index):
+        report = reports[index % len(reports)]
+        # A fresh session per request; a reused one would be an idempotent replay
+        return 'POST', '/consent/submit', {
+            **report,
+            'session_id': f'load-{run_id}-{index}',
+            'user_id': state['users'][index % len(state['users'])],
+        }
+
+    def user_consents(index):
+        return 'GET', f"/consent/user/{state['users'][index % len(state['users'])]}?limit=20", None
+
+    def consents(index):
+        return 'GET', f'/consent?jurisdiction={JURISDICTIONS[index % len(JURISDICTIONS)]}&limit=50', None
+
+    def stats(index):
+        return 'GET', '/stats', None
+
+    requests = {'submit': submit, 'user consents': user_consents, 'consents': consents, 'stats': stats}
+    weighted = [name for name, weight in MIX for _ in range(weight)]
+
+    def mixed(index):
+        return requests[weighted[(index * 37) % len(weighted)]](index)
+
+    return [
+        Scenario('POST /users', create_user),
+        Scenario('POST /consent/submit', submit),
+        Scenario('GET /consent/user/{user_id}', user_consents),
+        Scenario('GET /consent', consents),
+        Scenario('GET /stats', stats),
+        Scenario('mixed', mixed),
+    ]
+
+
+async def run_scenario(client, scenario, total, concurrency, warmup):
+    """Send warmup + total requests from concurrent clients; only the last
+    total are measured"""
+    next_index = 0
+    latencies = []
+    errors = {}
+
+    async def worker(limit, record):
+        nonlocal next_index
+        while next_index < limit:
+            index = next_index
+            next_index += 1
+            method, path, body = scenario.request(index)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                response, status = None, type(e).__name__
+            elapsed = time.perf_counter() - started
+            if not record:
+                continue
+            latencies.append(elapsed)
+            if response is None or response.status_code >= 400:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    if warmup:
+        await asyncio.gather(*(worker(warmup, False) for _ in range(concurrency)))
+    next_index = warmup
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(warmup + total, True) for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors.values()),
+        'error_statuses': errors,
+        'seconds': round(seconds, 3),
+        'throughput_rps': round(len(latencies) / seconds, 1) if seconds else None,
+        'latency_ms': percentile_summary(latencies),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(__file__), check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextlib.contextmanager
+def database():
+    """DATABASE_URL, or an embedded PostgreSQL for the duration of the run"""
+    if os.getenv('DATABASE_URL'):
+        yield os.environ['DATABASE_URL']
+        return
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit('Set DATABASE_URL or install pgserver for an embedded PostgreSQL')
+    with tempfile.TemporaryDirectory(prefix='consent-bench-') as pgdata:
+        server = pgserver.get_server(pgdata, cleanup_mode='stop')
+        try:
+            server.psql('CREATE DATABASE consent_bench;')
+            yield server.get_uri('consent_bench')
+        finally:
+            server.cleanup()
+
+
+@contextlib.asynccontextmanager
+async def api_client(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+            yield client
+        return
+    # Imported only now: the app's engine binds to DATABASE_URL at import
+    from app.main import app
+    from app.startup import run_migrations
+    run_migrations()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=60) as client:
+            yield client
+
+
+async def create_users(client, count, concurrency):
+    """Users the other scenarios submit and list for; not measured"""
+    run_id = uuid.uuid4().hex[:8]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create(index):
+        async with semaphore:
+            response = await client.post('/users', json={'email': f'load-{run_id}-user{index}@example.com'})
+            response.raise_for_status()
+            return response.json()['id']
+
+    return await asyncio.gather(*(create(index) for index in range(count)))
+
+
+async def run(args):
+    results = {}
+    async with api_client(args) as client:
+        health = (await client.get('/health')).json()
+        if health.get('database') != 'connected':
+            sys.exit(f'API database is not connected: {health}')
+        state = {'users': await create_users(client, args.users, args.concurrency)}
+        for scenario in build_scenarios(state, args):
+            if args.scenario and scenario.name not in args.scenario:
+                continue
+            result = await run_scenario(client, scenario, args.requests, args.concurrency, args.warmup)
+            results[scenario.name] = result
+            latency = result['latency_ms']
+            print(f"{scenario.name:<30}{result['throughput_rps']:>9} req/s  p50 {latency['p50']:>8} ms  "
+                  f"p95 {latency['p95']:>8} ms  p99 {latency['p99']:>8} ms  errors {result['errors']}")
+    return results
+
+
+def compare(baseline, results, max_regression):
+    """Print changes against a baseline run; returns the regressions beyond max_regression percent"""
+    regressions = []
+    print(f"\nvs {baseline.get('git_commit') or 'baseline'} ({baseline.get('started_at')})")
+    print(f"{'scenario':<30}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, result in results.items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        changes = {'throughput': _change(before['throughput_rps'], result['throughput_rps'])}
+        changes.update((p, _change(before['latency_ms'][p], result['latency_ms'][p])) for p in ('p50', 'p95', 'p99'))
+        print(f'{name:<30}' + ''.join(f'{change:>+8.1f}%' for change in changes.values()))
+        if max_regression is not None:
+            # Worse means lower throughput or higher latency
+            worse = {'throughput': -changes['throughput'], 'p95': changes['p95'], 'p99': changes['p99']}
+            regressions += [f'{name} {metric} {changes[metric]:+.1f}%'
+                            for metric, change in worse.items() if change > max_regression]
+    return regressions
+
+
+def _change(before, after):
+    if not before or after is None:
+        return 0.0
+    return 100 * (after - before) / before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='running API to load instead of the in-process app')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=50, help='unmeasured requests per scenario')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--frames', type=int, default=300, help='emotion samples per consent report')
+    parser.add_argument('--scenario', action='append', help='run only these scenarios (repeatable)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='JSON results of an earlier run')
+    parser.add_argument('--max-regression', type=float,
+                        help='exit 1 when throughput, p95 or p99 is worse than --compare by this percent')
+    args = parser.parse_args()
+
+    started_at = datetime.utcnow()
+    if args.url:
+        results = asyncio.run(run(args))
+    else:
+        with database() as database_url:
+            os.environ['DATABASE_URL'] = database_url
+            results = asyncio.run(run(args))
+
+    report = {
+        'benchmark': 'api_load',
+        'started_at': started_at.isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'target': args.url or 'in-process',
+        'config': {key: getattr(args, key) for key in ('concurrency', 'requests', 'warmup', 'users', 'frames', 'seed')},
+        'scenarios': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+        print(f'Results written to {args.output}')
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(json.load(baseline_file), results, args.max_regression)
+        if regressions:
+            print('Regressions: ' + ', '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Cold Start Benchmark
+
+Starts the API under uvicorn again and again and measures how long each
+process takes until /health/live and /health/ready answer, the startup
+phases the app reports on /health/ready (imports, migrations, engine, pool
+prewarm, schema check, background workers) and the latency of a burst of
+concurrent requests sent as soon as it is ready, which is where an empty
+pool shows. Results are written as JSON (--output) and can be checked
+against an earlier run (--compare).
+
+The database is migrated to head once before the runs, as a deploy does;
+--migrate-on-startup times the development path where every process runs
+the (then empty) upgrade itself. --prewarm sets DB_POOL_PREWARM, so
+--prewarm 0 shows what the burst costs without a prewarmed pool.
+
+PostgreSQL comes from DATABASE_URL. Without it an embedded server is
+started in a temporary directory through the optional pgserver package
+(pip install pgserver) and removed afterwards.
+
+Usage:
+    python backend/benchmarks/cold_start.py [--runs 10] [--prewarm 10] [--output results.json]
+    python backend/benchmarks/cold_start.py --prewarm 0 --compare results.json
+
+Environment Variables:
+    DATABASE_URL: Database of the app (default: embedded pgserver)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+# Add backend to path
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+from api_load import database, git_commit  # noqa: E402
+
+POLL_INTERVAL = 0.005
+STARTUP_TIMEOUT = 60
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, started, status=200):
+    """Seconds from started until url answers with status"""
+    while time.perf_counter() - started < STARTUP_TIMEOUT:
+        try:
+            if httpx.get(url, timeout=1).status_code == status:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(POLL_INTERVAL)
+    raise TimeoutError(f'{url} did not answer {status} within {STARTUP_TIMEOUT} s')
+
+
+async def burst(base_url, size):
+    """Latency in ms of size concurrent listing requests"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        async def timed():
+            started = time.perf_counter()
+            response = await client.get('/consent?limit=20')
+            response.raise_for_status()
+            return 1000 * (time.perf_counter() - started)
+        return await asyncio.gather(*(timed() for _ in range(size)))
+
+
+def start_once(args, env):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        live = wait_for(f'{base_url}/health/live', started)
+        ready = wait_for(f'{base_url}/health/ready', started)
+        report = httpx.get(f'{base_url}/health/ready').json()['startup']
+        latencies = asyncio.run(burst(base_url, args.burst))
+    except Exception:
+        process.kill()
+        sys.exit(f'Startup failed:\n{process.communicate()[1]}')
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return {
+        'live_s': live,
+        'ready_s': ready,
+        'reported_s': report['seconds'],
+        'phases': report['phases'],
+        'prewarmed_connections': report['prewarmed_connections'],
+        'burst_max_ms': max(latencies),
+        'burst_mean_ms': float(np.mean(latencies)),
+    }
+
+
+def summarize(runs):
+    def median(values):
+        values = [value for value in values if value is not None]
+        return round(float(np.median(values)), 4) if values else None
+
+    phases = sorted({name for run in runs for name in run['phases']})
+    return {
+        'live_s': median(run['live_s'] for run in runs),
+        'ready_s': median(run['ready_s'] for run in runs),
+        'reported_s': median(run['reported_s'] for run in runs),
+        'phases_s': {name: median(run['phases'].get(name) for run in runs) for name in phases},
+        'prewarmed_connections': median(run['prewarmed_connections'] for run in runs),
+        'burst_max_ms': median(run['burst_max_ms'] for run in runs),
+        'burst_mean_ms': median(run['burst_mean_ms'] for run in runs),
+    }
+
+
+def run(args, database_url):
+    env = {
+        **os.environ,
+        'DATABASE_URL': database_url,
+        'DB_POOL_PREWARM': str(args.prewarm),
+        'MIGRATE_ON_STARTUP': 'true' if args.migrate_on_startup else 'false',
+    }
+    if not args.migrate_on_startup:
+        os.environ['DATABASE_URL'] = database_url
+        from app.startup import run_migrations
+        run_migrations()
+    runs = []
+    for index in range(args.runs):
+        result = start_once(args, env)
+        runs.append(result)
+        print(f"run {index + 1:>2}: live {result['live_s']:.3f} s  ready {result['ready_s']:.3f} s  "
+              f"burst max {result['burst_max_ms']:.1f} ms  " +
+              ', '.join(f'{name} {seconds:.3f}' for name, seconds in result['phases'].items()))
+    return runs
+
+
+def compare(baseline, summary):
+    print(f"\nvs {baseline.get('git_commit') or 'baseline'} ({baseline.get('started_at')})")
+    for key in ('live_s', 'ready_s', 'burst_max_ms', 'burst_mean_ms'):
+        before, after = baseline['summary'].get(key), summary[key]
+        if before and after is not None:
+            print(f'{key:<16}{before:>10.4f} -> {after:<10.4f}{100 * (after - before) / before:+.1f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--prewarm', type=int, default=10, help='DB_POOL_PREWARM of the app')
+    parser.add_argument('--burst', type=int, default=10, help='concurrent requests sent once ready')
+    parser.add_argument('--migrate-on-startup', action='store_true', help='let every process run alembic upgrade')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='JSON results of an earlier run')
+    args = parser.parse_args()
+
+    started_at = datetime.utcnow()
+    with database() as database_url:
+        runs = run(args, database_url)
+    summary = summarize(runs)
+    print('\nmedian: ' + json.dumps(summary))
+
+    report = {
+        'benchmark': 'cold_start',
+        'started_at': started_at.isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'config': {key: getattr(args, key) for key in ('runs', 'prewarm', 'burst', 'migrate_on_startup')},
+        'summary': summary,
+        'runs': runs,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+        print(f'Results written to {args.output}')
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(json.load(baseline_file), summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Facial Landmark Storage Benchmark
+
+Compares the JSON representation previously stored in
+consent_records.facial_landmarks with the packed float16/float32 blobs from
+app/landmarks.py, for FaceMesh-sized frames (468 points x 3 coordinates):
+bytes per record, encode and decode throughput, and the worst coordinate
+error introduced by each packed dtype.
+
+Usage:
+    python backend/benchmarks/facial_landmarks.py [--frames 30] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.landmarks import decode_landmarks, encode_landmarks
+
+FACE_MESH_POINTS = 468
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    landmarks = rng.random((args.frames, FACE_MESH_POINTS, 3), dtype=np.float32)
+    landmarks[..., 2] = (landmarks[..., 2] - 0.5) * 0.1
+    as_lists = landmarks.tolist()
+    points = args.frames * FACE_MESH_POINTS
+
+    rows = []
+    encode_s, text = best_of(lambda: json.dumps(as_lists), args.repeat)
+    decode_s, _ = best_of(lambda: np.asarray(json.loads(text), dtype=np.float32), args.repeat)
+    rows.append(('json', len(text.encode()), encode_s, decode_s, 0.0))
+    for dtype in (np.dtype('<f4'), np.dtype('<f2')):
+        encode_s, blob = best_of(lambda: encode_landmarks(landmarks, dtype), args.repeat)
+        decode_s, decoded = best_of(lambda: decode_landmarks(blob), args.repeat)
+        error = float(np.abs(decoded.astype(np.float32) - landmarks).max())
+        rows.append((f'blob {dtype.name}', len(blob), encode_s, decode_s, error))
+    # Same blob through the list-of-lists path the API takes on submit
+    api_s, _ = best_of(lambda: encode_landmarks(as_lists), args.repeat)
+
+    json_bytes = rows[0][1]
+    print(f"\n{args.frames} frames x {FACE_MESH_POINTS} points x 3 coordinates")
+    print(f"{'format':<14}{'bytes':>11}{'vs json':>9}{'encode Mpts/s':>15}{'decode Mpts/s':>15}{'max error':>12}")
+    print('=' * 76)
+    for name, size, encode_s, decode_s, error in rows:
+        print(f'{name:<14}{size:>11}{json_bytes / size:>8.1f}x'
+              f'{points / encode_s / 1e6:>15.2f}{points / decode_s / 1e6:>15.2f}{error:>12.2e}')
+    print(f"\nencode from request lists (API path): {points / api_s / 1e6:.2f} Mpts/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Language Detection Benchmark for the NLP Pipeline
+
+Compares per-document detection cost of the script-based detector in
+nlp_pipeline.py against calling langdetect on the full text, using
+synthetic ~1MB documents in each supported script.
+
+Usage:
+    python backend/benchmarks/language_detection.py [--size-mb 1] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from langdetect import detect
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from nlp_pipeline import LanguageDetector
+
+SAMPLES = {
+    'hi': 'यह विक्रय विलेख संपत्ति को खरीदार को हस्तांतरित करता है। ',
+    'ta': 'இந்த விற்பனை பத்திரம் சொத்தை வாங்குபவருக்கு மாற்றுகிறது. ',
+    'te': 'ఈ అమ్మకపు దస్తావేజు ఆస్తిని కొనుగోలుదారునికి బదిలీ చేస్తుంది. ',
+    'kn': 'ಈ ಮಾರಾಟ ಪತ್ರವು ಆಸ್ತಿಯನ್ನು ಖರೀದಿದಾರರಿಗೆ ವರ್ಗಾಯಿಸುತ್ತದೆ. ',
+    'en': 'This sale deed transfers the property to the buyer. ',
+    'mixed': 'Sale deed विक्रय विलेख property संपत्ति buyer खरीदार. ',
+}
+
+
+def build_document(sentence, size_bytes):
+    repeats = max(1, size_bytes // len(sentence.encode('utf-8')))
+    return sentence * repeats
+
+
+def time_call(func, text, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000.0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    size_bytes = int(args.size_mb * 1024 * 1024)
+
+    print(f"\n{'script':<8}{'langdetect ms':>16}{'script ms':>12}{'cached ms':>12}  result")
+    print('=' * 64)
+    for name, sentence in SAMPLES.items():
+        document = build_document(sentence, size_bytes)
+        baseline_ms, baseline = time_call(detect, document, args.repeat)
+
+        detector = LanguageDetector(cache_size=0)
+        fast_ms, fast = time_call(detector, document, args.repeat)
+
+        cached = LanguageDetector()
+        cached(document)
+        cached_ms, _ = time_call(cached, document, args.repeat)
+
+        print(f"{name:<8}{baseline_ms:>16.2f}{fast_ms:>12.3f}{cached_ms:>12.3f}  {baseline} -> {fast}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Signature Verification Benchmark
+
+Measures how many consent signatures app/signatures.py verifies per second
+as the verifier's thread pool grows, and per core used. Records carry
+encrypted payloads shaped like the ones ConsentScreen.tsx produces (a JSON
+array of AES-GCM ciphertext bytes), so the hashing cost matches production.
+hashlib only releases the GIL for inputs over 2 KiB, which --payload-bytes
+lets you explore.
+
+Usage:
+    python backend/benchmarks/signatures.py [--records 20000] [--payload-bytes 600] [--max-threads 8]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.signatures import SIGNATURE_ALGORITHMS, VERIFIED, SignatureVerifier, signed_message
+
+
+def make_records(count, payload_bytes, algorithm, keys):
+    rng = random.Random(0)
+    records = []
+    for _ in range(count):
+        key_id = rng.choice(list(keys))
+        encrypted_data = json.dumps({
+            "encrypted": [rng.randrange(256) for _ in range(payload_bytes)],
+            "iv": [rng.randrange(256) for _ in range(12)],
+        })
+        signature = SIGNATURE_ALGORITHMS[algorithm](signed_message(encrypted_data), keys[key_id]["key_data"].encode())
+        records.append({
+            "encrypted_data": encrypted_data,
+            "encryption_key_id": key_id,
+            "digital_signature": signature,
+            "signature_algorithm": algorithm,
+        })
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--payload-bytes', type=int, default=600)
+    parser.add_argument('--max-threads', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--algorithm', choices=sorted(SIGNATURE_ALGORITHMS), default='SHA-256')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    keys = {f"key-{index}": {"id": f"key-{index}", "key_data": os.urandom(32).hex()} for index in range(4)}
+    records = make_records(args.records, args.payload_bytes, args.algorithm, keys)
+    average = sum(len(record["encrypted_data"]) for record in records) / len(records)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+
+    print(f"\n{args.records} records, {args.algorithm}, payload {average:.0f} bytes, {cores} cores available")
+    print(f"{'threads':>8}{'signatures/s':>15}{'per core':>12}{'speedup':>10}")
+    print('=' * 45)
+    baseline = None
+    threads = 1
+    while threads <= args.max_threads:
+        verifier = SignatureVerifier(threads=threads)
+        best = float('inf')
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            statuses = asyncio.run(verifier.verify_batch(records, keys))
+            best = min(best, time.perf_counter() - started)
+        verifier.shutdown()
+        assert statuses.count(VERIFIED) == len(records)
+        rate = len(records) / best
+        baseline = baseline or rate
+        print(f"{threads:>8}{rate:>15,.0f}{rate / min(threads, cores):>12,.0f}{rate / baseline:>9.2f}x")
+        threads *= 2
+
+
+if __name__ == '__main__':
+    main()
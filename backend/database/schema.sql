@@ -1,12 +1,23 @@
 -- PostgreSQL Schema for Voluntary Consent Detector
 -- DPDPA 2023 Compliant Consent Management System
 
--- Enable UUID extension
-CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+-- Time-ordered UUIDs (version 7) for primary keys, matching app.database.uuid7:
+-- 48 bits of Unix milliseconds followed by random bits. Pass a timestamp to
+-- key historical rows by when they were created.
+CREATE OR REPLACE FUNCTION uuid_generate_v7(ts TIMESTAMP WITH TIME ZONE DEFAULT clock_timestamp())
+RETURNS UUID AS $$
+DECLARE
+    bytes BYTEA := uuid_send(gen_random_uuid());
+BEGIN
+    bytes := overlay(bytes PLACING substring(int8send(floor(extract(epoch FROM ts) * 1000)::BIGINT) FROM 3) FROM 1 FOR 6);
+    bytes := set_byte(bytes, 6, (get_byte(bytes, 6) & 15) | 112);
+    RETURN encode(bytes, 'hex')::UUID;
+END;
+$$ language 'plpgsql' VOLATILE;
 
 -- Create users table
 CREATE TABLE IF NOT EXISTS users (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7(),
     email VARCHAR(255) UNIQUE NOT NULL,
     full_name VARCHAR(255),
     phone_number VARCHAR(20),
@@ -19,15 +30,17 @@ CREATE TABLE IF NOT EXISTS users (
 
 -- Create consent_records table
 CREATE TABLE IF NOT EXISTS consent_records (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7(),
     user_id UUID NOT NULL,
     document_type VARCHAR(100) NOT NULL,
     document_hash VARCHAR(64),
+    session_id VARCHAR(255), -- capture session; retried submissions share it
     detected_emotion VARCHAR(50),
     emotion_confidence DECIMAL(3, 2),
+    emotion_summary JSON,
     voice_sentiment VARCHAR(50),
     voice_confidence DECIMAL(3, 2),
-    facial_landmarks JSON,
+    facial_landmarks BYTEA, -- packed float16/float32 array, see app/landmarks.py
     user_consent BOOLEAN NOT NULL,
     consent_timestamp TIMESTAMP NOT NULL,
     consent_duration_seconds INTEGER,
@@ -40,6 +53,8 @@ CREATE TABLE IF NOT EXISTS consent_records (
     browser_user_agent TEXT,
     encrypted_data TEXT,
     encryption_key_id VARCHAR(36),
+    signed_data_hash VARCHAR(64), -- payload digest and key as signed, kept across key rotations
+    signing_key_id VARCHAR(36),
     digital_signature VARCHAR(256),
     signature_algorithm VARCHAR(50),
     verification_status VARCHAR(50) DEFAULT 'pending',
@@ -49,9 +64,15 @@ CREATE TABLE IF NOT EXISTS consent_records (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
--- Create consent_audit_log table for tracking changes
+-- Columns added after the initial release
+ALTER TABLE consent_records ADD COLUMN IF NOT EXISTS emotion_summary JSON;
+ALTER TABLE consent_records ADD COLUMN IF NOT EXISTS signed_data_hash VARCHAR(64);
+ALTER TABLE consent_records ADD COLUMN IF NOT EXISTS signing_key_id VARCHAR(36);
+ALTER TABLE consent_records ADD COLUMN IF NOT EXISTS session_id VARCHAR(255);
+
+-- Create consent_audit_log table for tracking changes, partitioned by month
 CREATE TABLE IF NOT EXISTS consent_audit_log (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v7(),
     consent_record_id UUID NOT NULL,
     action VARCHAR(50) NOT NULL,
     changed_fields JSON,
@@ -59,13 +80,14 @@ CREATE TABLE IF NOT EXISTS consent_audit_log (
     new_values JSON,
     changed_by VARCHAR(255),
     change_reason TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at),
     FOREIGN KEY (consent_record_id) REFERENCES consent_records(id) ON DELETE CASCADE
-);
+) PARTITION BY RANGE (created_at);
 
 -- Create compliance_checks table
 CREATE TABLE IF NOT EXISTS compliance_checks (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7(),
     consent_record_id UUID NOT NULL,
     check_type VARCHAR(100) NOT NULL,
     compliance_standard VARCHAR(100),
@@ -79,7 +101,7 @@ CREATE TABLE IF NOT EXISTS compliance_checks (
 
 -- Create withdrawal_records table for tracking consent withdrawals
 CREATE TABLE IF NOT EXISTS withdrawal_records (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7(),
     consent_record_id UUID NOT NULL,
     withdrawal_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     withdrawal_reason TEXT,
@@ -105,9 +127,28 @@ CREATE TABLE IF NOT EXISTS encryption_keys (
     created_by VARCHAR(255)
 );
 
--- Create api_logs table for audit trail
+-- Create key_rotations table: checkpoints of the re-encryption job in
+-- app/rotation.py, one row per rotation from a key to its next version
+CREATE TABLE IF NOT EXISTS key_rotations (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7(),
+    old_key_id VARCHAR(36) NOT NULL,
+    new_key_id VARCHAR(36) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    passes INTEGER NOT NULL DEFAULT 1,
+    last_record_id UUID,
+    records_total BIGINT NOT NULL DEFAULT 0,
+    records_rotated BIGINT NOT NULL DEFAULT 0,
+    records_failed BIGINT NOT NULL DEFAULT 0,
+    records_remaining BIGINT,
+    error TEXT,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Create api_logs table for audit trail, partitioned by month
 CREATE TABLE IF NOT EXISTS api_logs (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v7(),
     endpoint VARCHAR(255) NOT NULL,
     method VARCHAR(10) NOT NULL,
     user_id UUID,
@@ -116,12 +157,32 @@ CREATE TABLE IF NOT EXISTS api_logs (
     response_time_ms INTEGER,
     ip_address INET,
     error_message TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Monthly partitions for this month and the next three. The API creates
+-- later ones and applies retention (app/partitions.py), or run
+-- python -m app.partitions from cron.
+DO $$
+DECLARE
+    parent TEXT;
+    month DATE;
+BEGIN
+    FOREACH parent IN ARRAY ARRAY['api_logs', 'consent_audit_log'] LOOP
+        FOR offset_months IN 0..3 LOOP
+            month := date_trunc('month', CURRENT_DATE)::date + make_interval(months => offset_months);
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                parent || '_p' || to_char(month, 'YYYY_MM'), parent, month, (month + interval '1 month')::date
+            );
+        END LOOP;
+    END LOOP;
+END $$;
 
 -- Create consent_forms table for jurisdiction-specific forms
 CREATE TABLE IF NOT EXISTS consent_forms (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7(),
     form_name VARCHAR(255) NOT NULL,
     jurisdiction VARCHAR(50) NOT NULL,
     form_version VARCHAR(20) NOT NULL,
@@ -134,17 +195,37 @@ CREATE TABLE IF NOT EXISTS consent_forms (
     UNIQUE(form_name, jurisdiction, form_version)
 );
 
+-- Create compliance_watermarks table: progress of the incremental
+-- compliance checker (app/compliance.py) through consent_records
+CREATE TABLE IF NOT EXISTS compliance_watermarks (
+    check_type VARCHAR(100) PRIMARY KEY,
+    last_updated_at TIMESTAMP,
+    last_record_id UUID,
+    records_checked BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Create indices for performance
-CREATE INDEX idx_users_email ON users(email);
-CREATE INDEX idx_consent_records_user_id ON consent_records(user_id);
-CREATE INDEX idx_consent_records_created_at ON consent_records(created_at);
-CREATE INDEX idx_consent_records_verification_status ON consent_records(verification_status);
-CREATE INDEX idx_consent_records_jurisdiction ON consent_records(jurisdiction);
+-- users.email is served by the index behind its UNIQUE constraint.
+-- consent_records and api_logs get one index per listing query in
+-- app/queries.py, each ending in (created_at, id) for keyset pagination;
+-- tests/test_query_plans.py asserts the API's plans use them.
+CREATE INDEX idx_consent_records_created_at_id ON consent_records(created_at, id);
+CREATE INDEX idx_consent_records_user_id_created_at_id ON consent_records(user_id, created_at, id);
+CREATE INDEX idx_consent_records_jurisdiction_created_at_id ON consent_records(jurisdiction, created_at, id);
+CREATE INDEX idx_consent_records_status_created_at_id ON consent_records(verification_status, created_at, id);
+CREATE INDEX idx_consent_records_updated_at_id ON consent_records(updated_at, id);
+CREATE UNIQUE INDEX idx_consent_records_session_id_user_id ON consent_records(session_id, user_id);
+CREATE INDEX idx_consent_records_encryption_key_id_id ON consent_records(encryption_key_id, id);
+CREATE INDEX idx_consent_records_jurisdiction_status_created_at_id ON consent_records(jurisdiction, verification_status, created_at, id)
+    INCLUDE (user_id, document_type, user_consent);
 CREATE INDEX idx_consent_audit_log_consent_record_id ON consent_audit_log(consent_record_id);
 CREATE INDEX idx_compliance_checks_consent_record_id ON compliance_checks(consent_record_id);
 CREATE INDEX idx_withdrawal_records_consent_record_id ON withdrawal_records(consent_record_id);
-CREATE INDEX idx_api_logs_created_at ON api_logs(created_at);
-CREATE INDEX idx_api_logs_endpoint ON api_logs(endpoint);
+CREATE INDEX idx_withdrawal_records_pending ON withdrawal_records(withdrawal_timestamp) WHERE data_deletion_status = 'pending';
+CREATE INDEX idx_api_logs_created_at_id ON api_logs(created_at, id);
+CREATE INDEX idx_api_logs_endpoint_created_at_id ON api_logs(endpoint, created_at, id);
+CREATE INDEX idx_api_logs_errors_created_at_id ON api_logs(created_at, id) WHERE response_status >= 400;
 CREATE INDEX idx_consent_forms_jurisdiction ON consent_forms(jurisdiction);
 
 -- Create function to update updated_at timestamp
@@ -166,5 +247,99 @@ CREATE TRIGGER update_consent_records_updated_at BEFORE UPDATE ON consent_record
 CREATE TRIGGER update_consent_forms_updated_at BEFORE UPDATE ON consent_forms
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Create statistics_counters table, maintained by statement-level triggers.
+-- Each counter is split over up to 16 slot rows, picked by transaction id so
+-- concurrent writers rarely wait on each other; readers sum the slots.
+CREATE TABLE IF NOT EXISTS statistics_counters (
+    metric VARCHAR(100) NOT NULL,
+    dimension_value VARCHAR(255) NOT NULL DEFAULT '',
+    slot SMALLINT NOT NULL DEFAULT 0,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, dimension_value, slot)
+);
+
+CREATE OR REPLACE FUNCTION consent_records_statistics()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        WITH delta AS (SELECT jurisdiction, document_type, verification_status, 1 AS n FROM new_rows)
+        INSERT INTO statistics_counters AS counter (metric, dimension_value, slot, count)
+        SELECT metric, dimension_value, mod(txid_current(), 16), SUM(n) FROM (
+            SELECT 'consent_records' AS metric, '' AS dimension_value, n FROM delta
+            UNION ALL SELECT 'consent_records.jurisdiction', COALESCE(jurisdiction, ''), n FROM delta
+            UNION ALL SELECT 'consent_records.document_type', COALESCE(document_type, ''), n FROM delta
+            UNION ALL SELECT 'consent_records.verification_status', COALESCE(verification_status, ''), n FROM delta
+        ) expanded
+        GROUP BY metric, dimension_value
+        HAVING SUM(n) <> 0
+        ORDER BY metric, dimension_value
+        ON CONFLICT (metric, dimension_value, slot) DO UPDATE SET count = counter.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        WITH delta AS (SELECT jurisdiction, document_type, verification_status, -1 AS n FROM old_rows)
+        INSERT INTO statistics_counters AS counter (metric, dimension_value, slot, count)
+        SELECT metric, dimension_value, mod(txid_current(), 16), SUM(n) FROM (
+            SELECT 'consent_records' AS metric, '' AS dimension_value, n FROM delta
+            UNION ALL SELECT 'consent_records.jurisdiction', COALESCE(jurisdiction, ''), n FROM delta
+            UNION ALL SELECT 'consent_records.document_type', COALESCE(document_type, ''), n FROM delta
+            UNION ALL SELECT 'consent_records.verification_status', COALESCE(verification_status, ''), n FROM delta
+        ) expanded
+        GROUP BY metric, dimension_value
+        HAVING SUM(n) <> 0
+        ORDER BY metric, dimension_value
+        ON CONFLICT (metric, dimension_value, slot) DO UPDATE SET count = counter.count + EXCLUDED.count;
+    ELSIF TG_OP = 'UPDATE' THEN
+        WITH delta AS (SELECT jurisdiction, document_type, verification_status, 1 AS n FROM new_rows UNION ALL SELECT jurisdiction, document_type, verification_status, -1 AS n FROM old_rows)
+        INSERT INTO statistics_counters AS counter (metric, dimension_value, slot, count)
+        SELECT metric, dimension_value, mod(txid_current(), 16), SUM(n) FROM (
+            SELECT 'consent_records' AS metric, '' AS dimension_value, n FROM delta
+            UNION ALL SELECT 'consent_records.jurisdiction', COALESCE(jurisdiction, ''), n FROM delta
+            UNION ALL SELECT 'consent_records.document_type', COALESCE(document_type, ''), n FROM delta
+            UNION ALL SELECT 'consent_records.verification_status', COALESCE(verification_status, ''), n FROM delta
+        ) expanded
+        GROUP BY metric, dimension_value
+        HAVING SUM(n) <> 0
+        ORDER BY metric, dimension_value
+        ON CONFLICT (metric, dimension_value, slot) DO UPDATE SET count = counter.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION users_statistics()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO statistics_counters AS counter (metric, dimension_value, slot, count)
+        SELECT 'users', '', mod(txid_current(), 16), COUNT(*) FROM new_rows HAVING COUNT(*) > 0
+        ON CONFLICT (metric, dimension_value, slot) DO UPDATE SET count = counter.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO statistics_counters AS counter (metric, dimension_value, slot, count)
+        SELECT 'users', '', mod(txid_current(), 16), -COUNT(*) FROM old_rows HAVING COUNT(*) > 0
+        ON CONFLICT (metric, dimension_value, slot) DO UPDATE SET count = counter.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS consent_records_statistics_insert ON consent_records;
+
+CREATE TRIGGER consent_records_statistics_insert AFTER INSERT ON consent_records REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION consent_records_statistics();
+
+DROP TRIGGER IF EXISTS consent_records_statistics_update ON consent_records;
+
+CREATE TRIGGER consent_records_statistics_update AFTER UPDATE ON consent_records REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION consent_records_statistics();
+
+DROP TRIGGER IF EXISTS consent_records_statistics_delete ON consent_records;
+
+CREATE TRIGGER consent_records_statistics_delete AFTER DELETE ON consent_records REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION consent_records_statistics();
+
+DROP TRIGGER IF EXISTS users_statistics_insert ON users;
+
+CREATE TRIGGER users_statistics_insert AFTER INSERT ON users REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION users_statistics();
+
+DROP TRIGGER IF EXISTS users_statistics_delete ON users;
+
+CREATE TRIGGER users_statistics_delete AFTER DELETE ON users REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION users_statistics();
+
 -- Grant permissions (adjust as needed for your deployment)
 GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA public TO postgres;
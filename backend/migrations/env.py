@@ -0,0 +1,60 @@
+# Alembic environment: migrations run over the sync driver, one process at a time
+import os
+import re
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool, text
+from sqlalchemy.engine import make_url
+
+from app import partitions
+from app.database import Base
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# Any fixed key works; it only has to be shared by every process that migrates
+MIGRATION_LOCK_KEY = 726_001_025
+
+
+# Monthly partitions are created at runtime by app/partitions.py
+_PARTITION = re.compile(rf"({'|'.join(partitions.PARTITIONED_TABLES)})_p\d{{4}}_\d{{2}}")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Leave the monthly partitions and their indexes out of autogenerate"""
+    table = object if type_ == "table" else getattr(object, "table", None)
+    return table is None or not _PARTITION.fullmatch(table.name)
+
+
+def database_url() -> str:
+    """DATABASE_URL, else alembic.ini, with an async driver swapped for psycopg2"""
+    url = make_url(os.getenv("DATABASE_URL") or config.get_main_option("sqlalchemy.url"))
+    if url.drivername in ("postgres", "postgresql+asyncpg"):
+        url = url.set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+def run_migrations_online():
+    engine = create_engine(database_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        # Workers and replicas started together migrate once: the others wait
+        # here and then find the database at head
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        connection.commit()
+        try:
+            context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            connection.commit()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    raise SystemExit("Offline (--sql) migrations are not supported: the baseline revision needs a connection")
+run_migrations_online()
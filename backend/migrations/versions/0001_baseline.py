@@ -0,0 +1,185 @@
+"""Baseline: the schema of the first release
+
+The tables and indexes the API's create_all startup made before any later
+change, written out so the revision does not follow the models. A database
+that startup created already has them; tables that exist are left alone and
+the later revisions bring them up to date.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+UUID = postgresql.UUID(as_uuid=True)
+
+TABLES = (
+    "users", "consent_records", "consent_audit_log", "compliance_checks", "withdrawal_records",
+    "encryption_keys", "api_logs", "consent_forms",
+)
+
+
+def _missing(table_name: str) -> bool:
+    return not sa.inspect(op.get_bind()).has_table(table_name)
+
+
+def upgrade() -> None:
+    if _missing("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", UUID, primary_key=True),
+            sa.Column("email", sa.String(255), nullable=False),
+            sa.Column("full_name", sa.String(255)),
+            sa.Column("phone_number", sa.String(20)),
+            sa.Column("date_of_birth", sa.String()),
+            sa.Column("address", sa.Text()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+            sa.Column("is_active", sa.Boolean()),
+        )
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if _missing("consent_records"):
+        op.create_table(
+            "consent_records",
+            sa.Column("id", UUID, primary_key=True),
+            sa.Column("user_id", UUID, nullable=False),
+            sa.Column("document_type", sa.String(100), nullable=False),
+            sa.Column("document_hash", sa.String(64)),
+            sa.Column("detected_emotion", sa.String(50)),
+            sa.Column("emotion_confidence", sa.DECIMAL(3, 2)),
+            sa.Column("voice_sentiment", sa.String(50)),
+            sa.Column("voice_confidence", sa.DECIMAL(3, 2)),
+            sa.Column("facial_landmarks", sa.JSON()),
+            sa.Column("user_consent", sa.Boolean(), nullable=False),
+            sa.Column("consent_timestamp", sa.DateTime(), nullable=False),
+            sa.Column("consent_duration_seconds", sa.Integer()),
+            sa.Column("data_usage_purpose", sa.Text()),
+            sa.Column("data_retention_period", sa.String(100)),
+            sa.Column("right_to_withdraw", sa.Boolean()),
+            sa.Column("jurisdiction", sa.String(50)),
+            sa.Column("ip_address", postgresql.INET()),
+            sa.Column("device_info", sa.JSON()),
+            sa.Column("browser_user_agent", sa.Text()),
+            sa.Column("encrypted_data", sa.Text()),
+            sa.Column("encryption_key_id", sa.String(36)),
+            sa.Column("digital_signature", sa.String(256)),
+            sa.Column("signature_algorithm", sa.String(50)),
+            sa.Column("verification_status", sa.String(50)),
+            sa.Column("audit_notes", sa.Text()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        )
+        op.create_index("idx_consent_records_user_id", "consent_records", ["user_id"])
+        op.create_index("idx_consent_records_created_at", "consent_records", ["created_at"])
+        op.create_index("idx_consent_records_verification_status", "consent_records", ["verification_status"])
+        op.create_index("idx_consent_records_jurisdiction", "consent_records", ["jurisdiction"])
+
+    if _missing("consent_audit_log"):
+        op.create_table(
+            "consent_audit_log",
+            sa.Column("id", UUID, primary_key=True),
+            sa.Column("consent_record_id", UUID, nullable=False),
+            sa.Column("action", sa.String(50), nullable=False),
+            sa.Column("changed_fields", sa.JSON()),
+            sa.Column("old_values", sa.JSON()),
+            sa.Column("new_values", sa.JSON()),
+            sa.Column("changed_by", sa.String(255)),
+            sa.Column("change_reason", sa.Text()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.ForeignKeyConstraint(["consent_record_id"], ["consent_records.id"]),
+        )
+        op.create_index("idx_consent_audit_log_consent_record_id", "consent_audit_log", ["consent_record_id"])
+
+    if _missing("compliance_checks"):
+        op.create_table(
+            "compliance_checks",
+            sa.Column("id", UUID, primary_key=True),
+            sa.Column("consent_record_id", UUID, nullable=False),
+            sa.Column("check_type", sa.String(100), nullable=False),
+            sa.Column("compliance_standard", sa.String(100)),
+            sa.Column("check_result", sa.Boolean()),
+            sa.Column("issues_found", sa.JSON()),
+            sa.Column("remediation_steps", sa.Text()),
+            sa.Column("check_timestamp", sa.DateTime()),
+            sa.Column("checked_by", sa.String(255)),
+            sa.ForeignKeyConstraint(["consent_record_id"], ["consent_records.id"]),
+        )
+        op.create_index("idx_compliance_checks_consent_record_id", "compliance_checks", ["consent_record_id"])
+
+    if _missing("withdrawal_records"):
+        op.create_table(
+            "withdrawal_records",
+            sa.Column("id", UUID, primary_key=True),
+            sa.Column("consent_record_id", UUID, nullable=False),
+            sa.Column("withdrawal_timestamp", sa.DateTime()),
+            sa.Column("withdrawal_reason", sa.Text()),
+            sa.Column("withdrawal_method", sa.String(50)),
+            sa.Column("data_deletion_status", sa.String(50)),
+            sa.Column("data_deletion_timestamp", sa.DateTime()),
+            sa.Column("verified_by", sa.String(255)),
+            sa.Column("created_at", sa.DateTime()),
+            sa.ForeignKeyConstraint(["consent_record_id"], ["consent_records.id"]),
+        )
+        op.create_index("idx_withdrawal_records_consent_record_id", "withdrawal_records", ["consent_record_id"])
+
+    if _missing("encryption_keys"):
+        op.create_table(
+            "encryption_keys",
+            sa.Column("id", sa.String(36), primary_key=True),
+            sa.Column("key_type", sa.String(50), nullable=False),
+            sa.Column("algorithm", sa.String(50), nullable=False),
+            sa.Column("key_data", sa.Text(), nullable=False),
+            sa.Column("key_version", sa.Integer()),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("rotated_at", sa.DateTime()),
+            sa.Column("expires_at", sa.DateTime()),
+            sa.Column("created_by", sa.String(255)),
+        )
+
+    if _missing("api_logs"):
+        op.create_table(
+            "api_logs",
+            sa.Column("id", UUID, primary_key=True),
+            sa.Column("endpoint", sa.String(255), nullable=False),
+            sa.Column("method", sa.String(10), nullable=False),
+            sa.Column("user_id", UUID),
+            sa.Column("request_data", sa.JSON()),
+            sa.Column("response_status", sa.Integer()),
+            sa.Column("response_time_ms", sa.Integer()),
+            sa.Column("ip_address", postgresql.INET()),
+            sa.Column("error_message", sa.Text()),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("idx_api_logs_created_at", "api_logs", ["created_at"])
+        op.create_index("idx_api_logs_endpoint", "api_logs", ["endpoint"])
+
+    if _missing("consent_forms"):
+        op.create_table(
+            "consent_forms",
+            sa.Column("id", UUID, primary_key=True),
+            sa.Column("form_name", sa.String(255), nullable=False),
+            sa.Column("jurisdiction", sa.String(50), nullable=False),
+            sa.Column("form_version", sa.String(20), nullable=False),
+            sa.Column("form_template", sa.JSON(), nullable=False),
+            sa.Column("required_fields", sa.JSON()),
+            sa.Column("optional_fields", sa.JSON()),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+        )
+        op.create_index("idx_consent_forms_jurisdiction", "consent_forms", ["jurisdiction"])
+
+
+def downgrade() -> None:
+    for table_name in reversed(TABLES):
+        op.drop_table(table_name)
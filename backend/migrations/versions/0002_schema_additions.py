@@ -0,0 +1,265 @@
+"""Columns and tables added since the first release, log table partitions
+and the statistics counters
+
+- consent_records gains emotion_summary, session_id, signed_data_hash and
+  signing_key_id.
+- key_rotations, compliance_watermarks and statistics_counters are created.
+- api_logs and consent_audit_log are rebuilt as tables range-partitioned by
+  month on created_at, which joins id in the primary key. Their rows and
+  indexes are carried over.
+- The statement-level triggers behind the statistics counters are installed
+  and the counters are counted from the base tables.
+
+Every step checks what is already there, so databases the old create_all
+startup left at any later release upgrade as well.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.partitions import ensure_partitions
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+UUID = postgresql.UUID(as_uuid=True)
+
+ADDED_COLUMNS = {
+    "emotion_summary": "JSON",
+    "session_id": "VARCHAR(255)",
+    "signed_data_hash": "VARCHAR(64)",
+    "signing_key_id": "VARCHAR(36)",
+}
+
+# Column lists of the log tables; created_at is NOT NULL once it is the partition key
+LOG_TABLES = {
+    "api_logs": """
+        id UUID NOT NULL,
+        endpoint VARCHAR(255) NOT NULL,
+        method VARCHAR(10) NOT NULL,
+        user_id UUID,
+        request_data JSON,
+        response_status INTEGER,
+        response_time_ms INTEGER,
+        ip_address INET,
+        error_message TEXT,
+        created_at TIMESTAMP WITHOUT TIME ZONE {created_at_null}""",
+    "consent_audit_log": """
+        id UUID NOT NULL,
+        consent_record_id UUID NOT NULL,
+        action VARCHAR(50) NOT NULL,
+        changed_fields JSON,
+        old_values JSON,
+        new_values JSON,
+        changed_by VARCHAR(255),
+        change_reason TEXT,
+        created_at TIMESTAMP WITHOUT TIME ZONE {created_at_null},
+        FOREIGN KEY (consent_record_id) REFERENCES consent_records (id)""",
+}
+
+# The statistics trigger functions as this revision installs them
+CONSENT_DIMENSIONS = ("jurisdiction", "document_type", "verification_status")
+
+_CONSENT_DELTAS = {
+    "INSERT": "SELECT {columns}, 1 AS n FROM new_rows",
+    "DELETE": "SELECT {columns}, -1 AS n FROM old_rows",
+    "UPDATE": "SELECT {columns}, 1 AS n FROM new_rows UNION ALL SELECT {columns}, -1 AS n FROM old_rows",
+}
+
+_CONSENT_APPLY = """
+        WITH delta AS ({source})
+        INSERT INTO statistics_counters AS counter (metric, dimension_value, count)
+        SELECT metric, dimension_value, SUM(n) FROM (
+            SELECT 'consent_records' AS metric, '' AS dimension_value, n FROM delta
+{expansions}
+        ) expanded
+        GROUP BY metric, dimension_value
+        HAVING SUM(n) <> 0
+        ORDER BY metric, dimension_value
+        ON CONFLICT (metric, dimension_value) DO UPDATE SET count = counter.count + EXCLUDED.count;"""
+
+USERS_TRIGGER_FUNCTION = """CREATE OR REPLACE FUNCTION users_statistics()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO statistics_counters AS counter (metric, dimension_value, count)
+        SELECT 'users', '', COUNT(*) FROM new_rows HAVING COUNT(*) > 0
+        ON CONFLICT (metric, dimension_value) DO UPDATE SET count = counter.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO statistics_counters AS counter (metric, dimension_value, count)
+        SELECT 'users', '', -COUNT(*) FROM old_rows HAVING COUNT(*) > 0
+        ON CONFLICT (metric, dimension_value) DO UPDATE SET count = counter.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql'"""
+
+TRIGGERS = {
+    "consent_records": ("consent_records_statistics", ("INSERT", "UPDATE", "DELETE")),
+    "users": ("users_statistics", ("INSERT", "DELETE")),
+}
+
+_REFERENCES = {
+    "INSERT": "REFERENCING NEW TABLE AS new_rows",
+    "DELETE": "REFERENCING OLD TABLE AS old_rows",
+    "UPDATE": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+}
+
+
+def _consent_trigger_function() -> str:
+    columns = ", ".join(CONSENT_DIMENSIONS)
+    expansions = "\n".join(
+        f"            UNION ALL SELECT 'consent_records.{column}', COALESCE({column}, ''), n FROM delta"
+        for column in CONSENT_DIMENSIONS
+    )
+    branches = "\n    ELS".join(
+        f"IF TG_OP = '{operation}' THEN"
+        + _CONSENT_APPLY.format(source=source.format(columns=columns), expansions=expansions)
+        for operation, source in _CONSENT_DELTAS.items()
+    )
+    return f"""CREATE OR REPLACE FUNCTION consent_records_statistics()
+RETURNS TRIGGER AS $$
+BEGIN
+    {branches}
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql'"""
+
+
+RECONCILE_SQL = [
+    "LOCK TABLE statistics_counters IN EXCLUSIVE MODE",
+    "DELETE FROM statistics_counters",
+    """INSERT INTO statistics_counters (metric, dimension_value, count)
+        SELECT 'users', '', COUNT(*) FROM users
+        UNION ALL SELECT 'consent_records', '', COUNT(*) FROM consent_records
+""" + "\n".join(
+        f"        UNION ALL SELECT 'consent_records.{column}', COALESCE({column}, ''), COUNT(*) "
+        f"FROM consent_records GROUP BY 2"
+        for column in CONSENT_DIMENSIONS
+    ),
+]
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _relkind(table_name: str):
+    return op.get_bind().execute(
+        sa.text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:table_name)"),
+        {"table_name": table_name},
+    ).scalar()
+
+
+def _rebuild_log_table(table_name: str, partitioned: bool):
+    """Recreate a log table with or without monthly partitions, keeping its
+    rows and its secondary indexes"""
+    bind = op.get_bind()
+    legacy = f"{table_name}_rebuild"
+    indexes = bind.execute(sa.text(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = :table_name "
+        "AND indexname <> :primary_key ORDER BY indexname"
+    ), {"table_name": table_name, "primary_key": f"{table_name}_pkey"}).all()
+    op.execute(f"ALTER TABLE {table_name} RENAME TO {legacy}")
+    # Index names are schema-wide, so move the old ones out of the way
+    for name in [f"{table_name}_pkey", *(name for name, _ in indexes)]:
+        op.execute(f'ALTER INDEX "{name}" RENAME TO "{name}_rebuild"')
+
+    columns = LOG_TABLES[table_name].format(created_at_null="NOT NULL" if partitioned else "")
+    if partitioned:
+        op.execute(f"CREATE TABLE {table_name} ({columns},\n        PRIMARY KEY (id, created_at)\n"
+                   f") PARTITION BY RANGE (created_at)")
+        first, last = bind.execute(sa.text(f"SELECT MIN(created_at), MAX(created_at) FROM {legacy}")).one()
+        ensure_partitions(bind, table_name, start=first, end=last)
+    else:
+        op.execute(f"CREATE TABLE {table_name} ({columns},\n        PRIMARY KEY (id)\n)")
+    names = [column.split()[0] for column in LOG_TABLES[table_name].split(",\n") if "FOREIGN KEY" not in column]
+    values = ["COALESCE(created_at, CURRENT_TIMESTAMP)" if name == "created_at" else name for name in names]
+    op.execute(f"INSERT INTO {table_name} ({', '.join(names)}) SELECT {', '.join(values)} FROM {legacy}")
+    op.execute(f"DROP TABLE {legacy}")
+    for _, definition in indexes:
+        # A partitioned parent's indexes read ON ONLY; on the new table they cover every partition
+        op.execute(definition.replace(" ON ONLY ", " ON "))
+
+
+def upgrade() -> None:
+    existing = {column["name"] for column in _inspector().get_columns("consent_records")}
+    for column, column_type in ADDED_COLUMNS.items():
+        if column not in existing:
+            op.execute(f"ALTER TABLE consent_records ADD COLUMN {column} {column_type}")
+
+    tables = set(_inspector().get_table_names())
+    if "key_rotations" not in tables:
+        op.create_table(
+            "key_rotations",
+            sa.Column("id", UUID, primary_key=True),
+            sa.Column("old_key_id", sa.String(36), nullable=False),
+            sa.Column("new_key_id", sa.String(36), nullable=False),
+            sa.Column("status", sa.String(20), nullable=False),
+            sa.Column("passes", sa.Integer(), nullable=False),
+            sa.Column("last_record_id", UUID),
+            sa.Column("records_total", sa.BigInteger(), nullable=False),
+            sa.Column("records_rotated", sa.BigInteger(), nullable=False),
+            sa.Column("records_failed", sa.BigInteger(), nullable=False),
+            sa.Column("records_remaining", sa.BigInteger()),
+            sa.Column("error", sa.Text()),
+            sa.Column("started_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+            sa.Column("finished_at", sa.DateTime()),
+        )
+    if "compliance_watermarks" not in tables:
+        op.create_table(
+            "compliance_watermarks",
+            sa.Column("check_type", sa.String(100), primary_key=True),
+            sa.Column("last_updated_at", sa.DateTime()),
+            sa.Column("last_record_id", UUID),
+            sa.Column("records_checked", sa.BigInteger(), nullable=False),
+            sa.Column("updated_at", sa.DateTime()),
+        )
+    if "statistics_counters" not in tables:
+        op.create_table(
+            "statistics_counters",
+            sa.Column("metric", sa.String(100), primary_key=True),
+            sa.Column("dimension_value", sa.String(255), primary_key=True),
+            sa.Column("count", sa.BigInteger(), nullable=False),
+        )
+
+    for table_name in LOG_TABLES:
+        if _relkind(table_name) == "r":
+            print(f"Migrating {table_name} to monthly partitions...")
+            _rebuild_log_table(table_name, partitioned=True)
+        else:
+            ensure_partitions(op.get_bind(), table_name)
+
+    op.execute(_consent_trigger_function())
+    op.execute(USERS_TRIGGER_FUNCTION)
+    for table_name, (function, operations) in TRIGGERS.items():
+        for operation in operations:
+            name = f"{table_name}_statistics_{operation.lower()}"
+            op.execute(f"DROP TRIGGER IF EXISTS {name} ON {table_name}")
+            op.execute(
+                f"CREATE TRIGGER {name} AFTER {operation} ON {table_name} "
+                f"{_REFERENCES[operation]} FOR EACH STATEMENT EXECUTE FUNCTION {function}()"
+            )
+    for statement in RECONCILE_SQL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for table_name, (function, operations) in TRIGGERS.items():
+        for operation in operations:
+            op.execute(f"DROP TRIGGER IF EXISTS {table_name}_statistics_{operation.lower()} ON {table_name}")
+        op.execute(f"DROP FUNCTION IF EXISTS {function}()")
+    for table_name in LOG_TABLES:
+        _rebuild_log_table(table_name, partitioned=False)
+    for table_name in ("statistics_counters", "compliance_watermarks", "key_rotations"):
+        op.drop_table(table_name)
+    for column in reversed(ADDED_COLUMNS):
+        op.drop_column("consent_records", column)
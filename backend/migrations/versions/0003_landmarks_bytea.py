@@ -0,0 +1,80 @@
+"""Store facial landmarks as packed blobs
+
+Converts consent_records.facial_landmarks from JSON to BYTEA in the format
+of app/landmarks.py: the JSON column is renamed to facial_landmarks_json, a
+BYTEA facial_landmarks takes its place, rows are encoded in keyset batches
+and the JSON column is dropped. A row whose JSON is not a landmark array
+stops the upgrade with its id, so no landmarks are lost; fix or clear those
+rows and run it again. Databases that already store blobs are left alone.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.landmarks import decode_landmarks, encode_landmarks
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _column_type(column_name: str):
+    return op.get_bind().execute(sa.text(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_name = 'consent_records' AND column_name = :column_name"
+    ), {"column_name": column_name}).scalar()
+
+
+def _convert(source: str, target: str, convert):
+    """Fill target from source for every row, BATCH_SIZE rows at a time"""
+    bind = op.get_bind()
+    select = sa.text(
+        f"SELECT id, {source} FROM consent_records WHERE {source} IS NOT NULL AND id > :last_id "
+        f"ORDER BY id LIMIT :batch_size"
+    )
+    update = sa.text(f"UPDATE consent_records SET {target} = :value WHERE id = :record_id")
+    last_id = "00000000-0000-0000-0000-000000000000"
+    converted = 0
+    failed = []
+    while True:
+        rows = bind.execute(select, {"last_id": last_id, "batch_size": BATCH_SIZE}).all()
+        if not rows:
+            break
+        updates = []
+        for record_id, value in rows:
+            try:
+                updates.append({"record_id": record_id, "value": convert(value)})
+            except (KeyError, TypeError, ValueError) as e:
+                failed.append(f"{record_id}: {e}")
+        if updates:
+            bind.execute(update, updates)
+        converted += len(updates)
+        last_id = rows[-1][0]
+    if failed:
+        raise RuntimeError(f"{len(failed)} facial_landmarks values could not be converted:\n" + "\n".join(failed[:20]))
+    print(f"Converted facial_landmarks of {converted} consent records")
+
+
+def upgrade() -> None:
+    if _column_type("facial_landmarks") != "json":
+        return
+    op.alter_column("consent_records", "facial_landmarks", new_column_name="facial_landmarks_json")
+    op.add_column("consent_records", sa.Column("facial_landmarks", sa.LargeBinary()))
+    _convert("facial_landmarks_json", "facial_landmarks", encode_landmarks)
+    op.drop_column("consent_records", "facial_landmarks_json")
+
+
+def downgrade() -> None:
+    op.alter_column("consent_records", "facial_landmarks", new_column_name="facial_landmarks_blob")
+    op.add_column("consent_records", sa.Column("facial_landmarks", sa.JSON()))
+    _convert("facial_landmarks_blob", "facial_landmarks",
+             lambda blob: json.dumps(decode_landmarks(blob).tolist()))
+    op.drop_column("consent_records", "facial_landmarks_blob")
@@ -0,0 +1,130 @@
+"""Indexes shaped by the listing queries
+
+Replaces the first release's single-column indexes with the composite ones
+in app/queries.py order, each ending in (created_at, id) for keyset
+pagination, plus the partial and covering indexes added since. Indexes on
+plain tables are built CONCURRENTLY outside the migration transaction, so
+writes continue while a large consent_records is indexed; the partitioned
+log tables do not support that and lock each partition while it is built.
+An index left invalid by an interrupted build is dropped and rebuilt.
+
+users.email gets the UNIQUE constraint the models declare, built on a
+concurrently created index, before the ix_users_email index that used to
+enforce uniqueness is dropped.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# name -> (table, columns and options)
+INDEXES = {
+    "idx_consent_records_created_at_id": ("consent_records", "(created_at, id)"),
+    "idx_consent_records_user_id_created_at_id": ("consent_records", "(user_id, created_at, id)"),
+    "idx_consent_records_jurisdiction_created_at_id": ("consent_records", "(jurisdiction, created_at, id)"),
+    "idx_consent_records_status_created_at_id": ("consent_records", "(verification_status, created_at, id)"),
+    "idx_consent_records_updated_at_id": ("consent_records", "(updated_at, id)"),
+    "idx_consent_records_encryption_key_id_id": ("consent_records", "(encryption_key_id, id)"),
+    "idx_consent_records_jurisdiction_status_created_at_id": (
+        "consent_records",
+        "(jurisdiction, verification_status, created_at, id) INCLUDE (user_id, document_type, user_consent)",
+    ),
+    "idx_withdrawal_records_pending": (
+        "withdrawal_records", "(withdrawal_timestamp) WHERE data_deletion_status = 'pending'",
+    ),
+    "idx_api_logs_created_at_id": ("api_logs", "(created_at, id)"),
+    "idx_api_logs_endpoint_created_at_id": ("api_logs", "(endpoint, created_at, id)"),
+    "idx_api_logs_errors_created_at_id": ("api_logs", "(created_at, id) WHERE response_status >= 400"),
+}
+
+UNIQUE_INDEXES = {
+    # One record per capture session, so retried submissions are idempotent
+    "idx_consent_records_session_id_user_id": ("consent_records", "(session_id, user_id)"),
+}
+
+# Unique constraint -> (table, column); built on its index before the
+# index that used to enforce it is dropped
+UNIQUE_CONSTRAINTS = {"users_email_key": ("users", "email")}
+
+# The first release's indexes the ones above replace
+OBSOLETE_INDEXES = {
+    "ix_users_email": ("users", "(email)", True),
+    "idx_consent_records_user_id": ("consent_records", "(user_id)", False),
+    "idx_consent_records_created_at": ("consent_records", "(created_at)", False),
+    "idx_consent_records_verification_status": ("consent_records", "(verification_status)", False),
+    "idx_consent_records_jurisdiction": ("consent_records", "(jurisdiction)", False),
+    "idx_api_logs_created_at": ("api_logs", "(created_at)", False),
+    "idx_api_logs_endpoint": ("api_logs", "(endpoint)", False),
+}
+
+
+def _index_state(name: str):
+    """None if the index does not exist, else whether it is valid"""
+    return op.get_bind().execute(
+        sa.text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+    ).scalar()
+
+
+def _relkind(name: str):
+    return op.get_bind().execute(
+        sa.text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:name)"), {"name": name}
+    ).scalar()
+
+
+def _create_index(name: str, table_name: str, definition: str, unique: bool = False):
+    state = _index_state(name)
+    if state:
+        return
+    if state is False:
+        op.execute(f"DROP INDEX {name}")
+    concurrently = "" if _relkind(table_name) == "p" else "CONCURRENTLY "
+    unique = "UNIQUE " if unique else ""
+    op.execute(f"CREATE {unique}INDEX {concurrently}{name} ON {table_name} {definition}")
+
+
+def _drop_index(name: str):
+    kind = _relkind(name)
+    if kind is None:
+        return
+    # An index on a partitioned table cannot be dropped concurrently
+    concurrently = "" if kind == "I" else "CONCURRENTLY "
+    op.execute(f"DROP INDEX {concurrently}{name}")
+
+
+def _constraint_exists(name: str) -> bool:
+    return bool(op.get_bind().execute(
+        sa.text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": name}
+    ).scalar())
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, (table_name, definition) in INDEXES.items():
+            _create_index(name, table_name, definition)
+        for name, (table_name, definition) in UNIQUE_INDEXES.items():
+            _create_index(name, table_name, definition, unique=True)
+        for name, (table_name, column) in UNIQUE_CONSTRAINTS.items():
+            if _constraint_exists(name):
+                continue
+            _create_index(name, table_name, f"({column})", unique=True)
+            op.execute(f"ALTER TABLE {table_name} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}")
+        for name in OBSOLETE_INDEXES:
+            _drop_index(name)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, (table_name, definition, unique) in OBSOLETE_INDEXES.items():
+            _create_index(name, table_name, definition, unique=unique)
+        for name, (table_name, _) in UNIQUE_CONSTRAINTS.items():
+            op.execute(f"ALTER TABLE {table_name} DROP CONSTRAINT IF EXISTS {name}")
+        for name in [*UNIQUE_INDEXES, *INDEXES]:
+            _drop_index(name)
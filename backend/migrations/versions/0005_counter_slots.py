@@ -0,0 +1,108 @@
+"""Split each statistics counter over slot rows
+
+Every consent_records or users write used to upsert the same total row, so
+concurrent writers queued on its row lock. Counters gain a slot column in
+the primary key and the triggers add to slot mod(txid_current(), 16), so
+concurrent transactions mostly touch different rows; GET /stats sums the
+slots. Existing totals stay in slot 0. The downgrade folds the slots back
+into one row per counter.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from typing import Optional
+
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+SLOTS = 16
+CONSENT_DIMENSIONS = ("jurisdiction", "document_type", "verification_status")
+
+_CONSENT_DELTAS = {
+    "INSERT": "SELECT {columns}, 1 AS n FROM new_rows",
+    "DELETE": "SELECT {columns}, -1 AS n FROM old_rows",
+    "UPDATE": "SELECT {columns}, 1 AS n FROM new_rows UNION ALL SELECT {columns}, -1 AS n FROM old_rows",
+}
+
+
+def _trigger_functions(slot: Optional[str]) -> list:
+    """consent_records_statistics() and users_statistics(), adding to the
+    given slot expression, or to the single row per counter without one"""
+    key = "metric, dimension_value, slot" if slot else "metric, dimension_value"
+    target = f"INSERT INTO statistics_counters AS counter ({key}, count)"
+    conflict = f"ON CONFLICT ({key}) DO UPDATE SET count = counter.count + EXCLUDED.count;"
+    slot_value = f"{slot}, " if slot else ""
+
+    columns = ", ".join(CONSENT_DIMENSIONS)
+    expansions = "\n".join(
+        f"            UNION ALL SELECT 'consent_records.{column}', COALESCE({column}, ''), n FROM delta"
+        for column in CONSENT_DIMENSIONS
+    )
+    branches = "\n    ELS".join(
+        f"""IF TG_OP = '{operation}' THEN
+        WITH delta AS ({source.format(columns=columns)})
+        {target}
+        SELECT metric, dimension_value, {slot_value}SUM(n) FROM (
+            SELECT 'consent_records' AS metric, '' AS dimension_value, n FROM delta
+{expansions}
+        ) expanded
+        GROUP BY metric, dimension_value
+        HAVING SUM(n) <> 0
+        ORDER BY metric, dimension_value
+        {conflict}"""
+        for operation, source in _CONSENT_DELTAS.items()
+    )
+    return [
+        f"""CREATE OR REPLACE FUNCTION consent_records_statistics()
+RETURNS TRIGGER AS $$
+BEGIN
+    {branches}
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql'""",
+        f"""CREATE OR REPLACE FUNCTION users_statistics()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {target}
+        SELECT 'users', '', {slot_value}COUNT(*) FROM new_rows HAVING COUNT(*) > 0
+        {conflict}
+    ELSIF TG_OP = 'DELETE' THEN
+        {target}
+        SELECT 'users', '', {slot_value}-COUNT(*) FROM old_rows HAVING COUNT(*) > 0
+        {conflict}
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql'""",
+    ]
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE statistics_counters ADD COLUMN slot SMALLINT NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE statistics_counters DROP CONSTRAINT statistics_counters_pkey")
+    op.execute("ALTER TABLE statistics_counters ADD PRIMARY KEY (metric, dimension_value, slot)")
+    for statement in _trigger_functions(f"mod(txid_current(), {SLOTS})"):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    # Writers wait until the single-row triggers are back
+    op.execute("LOCK TABLE statistics_counters IN EXCLUSIVE MODE")
+    op.execute("""
+        INSERT INTO statistics_counters AS counter (metric, dimension_value, slot, count)
+        SELECT metric, dimension_value, 0, SUM(count) FROM statistics_counters WHERE slot <> 0
+        GROUP BY metric, dimension_value
+        ON CONFLICT (metric, dimension_value, slot) DO UPDATE SET count = counter.count + EXCLUDED.count""")
+    op.execute("DELETE FROM statistics_counters WHERE slot <> 0")
+    op.execute("ALTER TABLE statistics_counters DROP CONSTRAINT statistics_counters_pkey")
+    op.execute("ALTER TABLE statistics_counters ADD PRIMARY KEY (metric, dimension_value)")
+    op.execute("ALTER TABLE statistics_counters DROP COLUMN slot")
+    for statement in _trigger_functions(None):
+        op.execute(statement)
@@ -0,0 +1,55 @@
+"""Time-ordered server-side primary keys
+
+Installs uuid_generate_v7() from database/schema.sql and makes it the
+default of every UUID primary key, so rows inserted by raw SQL get the same
+time-ordered keys as app.database.uuid7 gives the application. Existing
+keys are left alone; app/migrate_uuid7.py can rewrite the log tables' keys
+and rebuild their indexes.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+UUID_KEY_TABLES = (
+    "users",
+    "consent_records",
+    "consent_audit_log",
+    "compliance_checks",
+    "withdrawal_records",
+    "key_rotations",
+    "api_logs",
+    "consent_forms",
+)
+
+# 48 bits of Unix milliseconds followed by random bits; pass a timestamp to
+# key historical rows by when they were created
+UUID_GENERATE_V7 = """CREATE OR REPLACE FUNCTION uuid_generate_v7(ts TIMESTAMP WITH TIME ZONE DEFAULT clock_timestamp())
+RETURNS UUID AS $$
+DECLARE
+    bytes BYTEA := uuid_send(gen_random_uuid());
+BEGIN
+    bytes := overlay(bytes PLACING substring(int8send(floor(extract(epoch FROM ts) * 1000)::BIGINT) FROM 3) FROM 1 FOR 6);
+    bytes := set_byte(bytes, 6, (get_byte(bytes, 6) & 15) | 112);
+    RETURN encode(bytes, 'hex')::UUID;
+END;
+$$ language 'plpgsql' VOLATILE"""
+
+
+def upgrade() -> None:
+    op.execute(UUID_GENERATE_V7)
+    for table_name in UUID_KEY_TABLES:
+        # Partitioned tables pass the default on to their partitions
+        op.execute(f"ALTER TABLE {table_name} ALTER COLUMN id SET DEFAULT uuid_generate_v7()")
+
+
+def downgrade() -> None:
+    for table_name in UUID_KEY_TABLES:
+        op.execute(f"ALTER TABLE {table_name} ALTER COLUMN id DROP DEFAULT")
+    op.execute("DROP FUNCTION IF EXISTS uuid_generate_v7(TIMESTAMP WITH TIME ZONE)")
@@ -0,0 +1,175 @@
+"""Micro-batching scheduler for NLP inference
+
+Texts are routed by detected language to a per-model queue. A worker thread
+per model drains its queue into batches, flushing when a batch is full or
+when the oldest queued text has waited max_wait_ms, and runs the whole batch
+through the resident pipeline in one call. Each caller gets its own result
+back through a future, from sync or async code alike. Each NLP worker
+process (app/nlp_jobs.py) runs its inference through one MicroBatcher.
+
+Environment Variables:
+    NLP_BATCH_MAX_SIZE: Largest batch sent to a model in one call
+    NLP_BATCH_MAX_WAIT_MS: Longest a queued text waits for batch-mates
+"""
+
+import asyncio
+import bisect
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Sequence
+
+from nlp_pipeline import detect_language, model_for_language, model_registry
+
+NLP_BATCH_MAX_SIZE = int(os.getenv('NLP_BATCH_MAX_SIZE', '16'))
+NLP_BATCH_MAX_WAIT_MS = float(os.getenv('NLP_BATCH_MAX_WAIT_MS', '10'))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_WAIT_MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_STOP = object()
+
+
+class Histogram:
+    """Bucketed counts of observed values with a running count and sum"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            labels = [f'<={bound}' for bound in self.bounds] + [f'>{self.bounds[-1]}']
+            return {
+                'buckets': dict(zip(labels, self.counts)),
+                'count': self.count,
+                'mean': self.total / self.count if self.count else 0.0,
+            }
+
+
+class _Request:
+    __slots__ = ('text', 'future', 'enqueued_at')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """Language-grouped micro-batching front end for nlp_pipeline"""
+
+    def __init__(self, max_batch_size: int = NLP_BATCH_MAX_SIZE,
+                 max_wait_ms: float = NLP_BATCH_MAX_WAIT_MS,
+                 registry=model_registry,
+                 detect: Callable[[str], str] = detect_language):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.registry = registry
+        self.detect = detect
+        self._queues: Dict[str, queue.Queue] = {}
+        self._workers: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+
+    def submit(self, text: str, language: Optional[str] = None) -> Future:
+        """Queue a text for its language's model and return its future"""
+        if self._closed:
+            raise RuntimeError('MicroBatcher is closed')
+        model_name = model_for_language(language or self.detect(text))
+        request = _Request(text)
+        self._queue_for(model_name).put(request)
+        return request.future
+
+    def analyze(self, text: str, language: Optional[str] = None, timeout: Optional[float] = None):
+        """Blocking call with the same result shape as nlp_pipeline(text)"""
+        return self.submit(text, language).result(timeout)
+
+    async def analyze_async(self, text: str, language: Optional[str] = None):
+        """Awaitable call with the same result shape as nlp_pipeline(text)"""
+        return await asyncio.wrap_future(self.submit(text, language))
+
+    def _queue_for(self, model_name: str) -> queue.Queue:
+        with self._lock:
+            model_queue = self._queues.get(model_name)
+            if model_queue is None:
+                model_queue = self._queues[model_name] = queue.Queue()
+                worker = threading.Thread(
+                    target=self._run, args=(model_name, model_queue),
+                    name=f'nlp-batcher-{model_name}', daemon=True
+                )
+                self._workers[model_name] = worker
+                worker.start()
+            return model_queue
+
+    def _collect(self, model_queue: queue.Queue, first: _Request) -> List[_Request]:
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = model_queue.get(timeout=remaining) if remaining > 0 else model_queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is _STOP:
+                model_queue.put(_STOP)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self, model_name: str, model_queue: queue.Queue):
+        while True:
+            first = model_queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(model_queue, first)
+            started = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+            for request in batch:
+                self.queue_wait_ms.observe((started - request.enqueued_at) * 1000.0)
+            live = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            try:
+                nlp_model = self.registry.get_model(model_name)
+                outputs = nlp_model([request.text for request in live], batch_size=len(live), truncation=True)
+            except Exception as e:
+                for request in live:
+                    request.future.set_exception(e)
+                continue
+            for request, output in zip(live, outputs):
+                request.future.set_result([output])
+
+    def close(self, timeout: Optional[float] = None):
+        """Finish queued work and stop the worker threads"""
+        with self._lock:
+            self._closed = True
+            for model_queue in self._queues.values():
+                model_queue.put(_STOP)
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker.join(timeout)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            depths = {model_name: model_queue.qsize() for model_name, model_queue in self._queues.items()}
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queue_depth': depths,
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_wait_ms': self.queue_wait_ms.snapshot(),
+        }
@@ -0,0 +1,182 @@
+"""ReadThroughCache on both backends: TTL, LRU eviction, invalidation and counters
+
+    python -m pytest backend/tests/test_cache.py
+"""
+
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from app.cache import LocalBackend, ReadThroughCache, SharedBackend
+
+
+@pytest.fixture(params=["local", "shared"])
+def make_cache(request, tmp_path):
+    def make(ttl=60.0, max_entries=100):
+        if request.param == "shared":
+            backend = SharedBackend(str(tmp_path / "cache.sqlite3"), max_entries)
+        else:
+            backend = LocalBackend(max_entries)
+        return ReadThroughCache(backend=backend, ttl=ttl, enabled=True)
+    return make
+
+
+class Loader:
+    """Counts loads; returns {"key": key} or None for missing rows"""
+
+    def __init__(self):
+        self.loads = []
+
+    def __call__(self, key, found=True):
+        async def load():
+            self.loads.append(key)
+            return {"key": key} if found else None
+        return load
+
+
+def _get(cache, loader, key, namespace="users", found=True):
+    return asyncio.run(cache.get_or_load(namespace, key, loader(key, found)))
+
+
+def test_hits_and_misses_are_counted(make_cache):
+    cache, loader = make_cache(), Loader()
+    assert _get(cache, loader, "a") == {"key": "a"}
+    assert _get(cache, loader, "a") == {"key": "a"}
+    assert _get(cache, loader, "a") == {"key": "a"}
+    assert loader.loads == ["a"]
+
+    counters = cache.stats()["namespaces"]["users"]
+    assert counters["hits"] == 2
+    assert counters["misses"] == 1
+    assert counters["hit_ratio"] == pytest.approx(2 / 3, abs=1e-4)
+
+
+def test_namespaces_are_counted_and_keyed_apart(make_cache):
+    cache, loader = make_cache(), Loader()
+    _get(cache, loader, "a", namespace="users")
+    _get(cache, loader, "a", namespace="consent_records")
+    assert loader.loads == ["a", "a"]
+    namespaces = cache.stats()["namespaces"]
+    assert namespaces["users"]["misses"] == namespaces["consent_records"]["misses"] == 1
+
+
+def test_missing_rows_are_not_cached(make_cache):
+    cache, loader = make_cache(), Loader()
+    assert _get(cache, loader, "gone", found=False) is None
+    assert _get(cache, loader, "gone", found=False) is None
+    assert loader.loads == ["gone", "gone"]
+    assert cache.stats()["size"] == 0
+
+
+def test_entries_expire_after_the_ttl(make_cache):
+    cache, loader = make_cache(ttl=0.05), Loader()
+    _get(cache, loader, "a")
+    _get(cache, loader, "a")
+    time.sleep(0.1)
+    _get(cache, loader, "a")
+    assert loader.loads == ["a", "a"]
+    counters = cache.stats()["namespaces"]["users"]
+    assert counters["expired"] == 1
+    assert counters["misses"] == 2
+    assert counters["hits"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(make_cache):
+    cache, loader = make_cache(max_entries=2), Loader()
+    _get(cache, loader, "a")
+    time.sleep(0.01)
+    _get(cache, loader, "b")
+    time.sleep(0.01)
+    _get(cache, loader, "c")
+    assert cache.stats()["size"] == 2
+    assert cache.stats()["namespaces"]["users"]["evictions"] == 1
+
+    # b and c are still cached, a was evicted
+    _get(cache, loader, "b")
+    _get(cache, loader, "c")
+    _get(cache, loader, "a")
+    assert loader.loads == ["a", "b", "c", "a"]
+
+
+def test_a_hit_refreshes_the_lru_position():
+    # The shared backend only refreshes positions every TOUCH_INTERVAL_SECONDS
+    cache, loader = ReadThroughCache(backend=LocalBackend(2), enabled=True), Loader()
+    _get(cache, loader, "a")
+    _get(cache, loader, "b")
+    _get(cache, loader, "a")
+    _get(cache, loader, "c")
+    # b was the least recently used
+    _get(cache, loader, "a")
+    _get(cache, loader, "b")
+    assert loader.loads == ["a", "b", "c", "b"]
+
+
+def test_invalidation_drops_the_entry(make_cache):
+    cache, loader = make_cache(), Loader()
+    _get(cache, loader, "a")
+    _get(cache, loader, "b")
+    asyncio.run(cache.invalidate("users", "a"))
+    _get(cache, loader, "a")
+    _get(cache, loader, "b")
+    assert loader.loads == ["a", "b", "a"]
+    counters = cache.stats()["namespaces"]["users"]
+    assert counters["invalidations"] == 1
+    assert counters["hits"] == 1
+
+
+def test_disabled_cache_always_loads(make_cache):
+    cache, loader = make_cache(), Loader()
+    cache.enabled = False
+    _get(cache, loader, "a")
+    _get(cache, loader, "a")
+    asyncio.run(cache.invalidate("users", "a"))
+    assert loader.loads == ["a", "a"]
+    assert cache.stats()["namespaces"] == {}
+
+
+def test_shared_backend_is_seen_by_every_instance(tmp_path):
+    # Two workers on one host share entries and invalidations
+    path = str(tmp_path / "cache.sqlite3")
+    first = ReadThroughCache(backend=SharedBackend(path, 100), enabled=True)
+    second = ReadThroughCache(backend=SharedBackend(path, 100), enabled=True)
+    loader = Loader()
+    _get(first, loader, "a")
+    _get(second, loader, "a")
+    asyncio.run(second.invalidate("users", "a"))
+    _get(first, loader, "a")
+    assert loader.loads == ["a", "a"]
+
+
+def test_shared_backend_lock_does_not_stall_the_event_loop(tmp_path):
+    # Another worker holds the SQLite write lock; the lookup waits out the
+    # busy timeout in a thread, falls through to the loader, and requests
+    # served from the loop meanwhile are not held up
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ReadThroughCache(backend=SharedBackend(path, 100), ttl=0.01, enabled=True)
+    loader = Loader()
+    _get(cache, loader, "a")
+    time.sleep(0.02)
+
+    other_worker = sqlite3.connect(path, isolation_level=None)
+    other_worker.execute("BEGIN IMMEDIATE")
+    try:
+        async def requests():
+            # Reading the expired entry deletes it, which needs the write lock
+            lookup = asyncio.create_task(cache.get_or_load("users", "a", loader("a")))
+            started = time.perf_counter()
+            await asyncio.sleep(0.05)
+            loop_delay = time.perf_counter() - started
+            await cache.invalidate("users", "b")
+            return loop_delay, await lookup
+
+        loop_delay, value = asyncio.run(requests())
+    finally:
+        other_worker.rollback()
+        other_worker.close()
+
+    assert loop_delay < 0.5
+    assert value == {"key": "a"}
+    assert loader.loads == ["a", "a"]
+    assert cache.stats()["namespaces"]["users"]["errors"] >= 1
@@ -0,0 +1,139 @@
+"""aggregate_emotions on fixed frame series
+
+    python -m pytest backend/tests/test_emotion_aggregation.py
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.emotion_aggregation import aggregate_emotions
+from app.models import EmotionAnalysis
+
+
+def _frames(samples, start=0.0):
+    """(offset seconds, emotion, confidence[, face_detected]) -> frames with epoch-second stamps"""
+    return [
+        EmotionAnalysis(timestamp=str(start + offset), emotion=emotion, confidence=confidence,
+                        face_detected=rest[0] if rest else True)
+        for offset, emotion, confidence, *rest in samples
+    ]
+
+
+def test_empty_series():
+    assert aggregate_emotions([]) is None
+
+
+def test_dominant_emotion_is_confidence_weighted():
+    # neutral has more frames, happy the larger confidence sum
+    summary = aggregate_emotions(_frames([
+        (0.0, "happy", 0.95),
+        (0.1, "neutral", 0.3),
+        (0.2, "neutral", 0.3),
+        (0.3, "neutral", 0.3),
+        (0.4, "happy", 0.85),
+    ]))
+    assert summary["dominant_emotion"] == "happy"
+    assert summary["dominant_confidence"] == pytest.approx(0.9)
+
+
+def test_frames_without_a_face_do_not_count():
+    summary = aggregate_emotions(_frames([
+        (0.0, "neutral", 0.6),
+        (0.1, "sad", 1.0, False),
+        (0.2, "sad", 1.0, False),
+        (0.3, "neutral", 0.6),
+    ]))
+    assert summary["dominant_emotion"] == "neutral"
+    assert summary["face_detected_ratio"] == 0.5
+    assert summary["dwell_seconds"]["sad"] == 0.0
+
+
+def test_all_frames_count_when_no_face_was_detected():
+    summary = aggregate_emotions(_frames([(0.0, "sad", 0.7, False), (0.1, "sad", 0.7, False)]))
+    assert summary["dominant_emotion"] == "sad"
+    assert summary["face_detected_ratio"] == 0.0
+
+
+def test_dwell_time_caps_gaps():
+    # The 4.5 s pause and the last frame (median gap 2.5 s) are capped at 1 s
+    summary = aggregate_emotions(_frames([
+        (0.0, "happy", 0.9),
+        (0.5, "sad", 0.9),
+        (5.0, "happy", 0.9),
+    ]))
+    assert summary["dwell_seconds"] == {"happy": 1.5, "sad": 1.0}
+    assert summary["frame_count"] == 3
+
+
+def test_unordered_frames_are_sorted_by_time():
+    ordered = aggregate_emotions(_frames([(0.0, "happy", 0.9), (0.5, "sad", 0.9), (1.0, "happy", 0.9)]))
+    shuffled = aggregate_emotions(_frames([(1.0, "happy", 0.9), (0.0, "happy", 0.9), (0.5, "sad", 0.9)]))
+    assert shuffled == ordered
+
+
+def test_spike_window_covers_the_distress_run():
+    # 3 s at 10 fps with one second of fear in the middle; the 1 s rolling
+    # mean reaches 0.5 from frame 10 through frame 20
+    samples = [(index / 10, "fearful" if 10 <= index < 20 else "neutral", 1.0 if 10 <= index < 20 else 0.8)
+               for index in range(30)]
+    summary = aggregate_emotions(_frames(samples))
+    assert summary["distress_ratio"] == pytest.approx(1 / 3, abs=1e-4)
+    assert len(summary["distress_windows"]) == 1
+    window = summary["distress_windows"][0]
+    assert window["start_seconds"] == pytest.approx(1.0)
+    assert window["end_seconds"] == pytest.approx(2.1)
+    assert window["peak_score"] == pytest.approx(1.0)
+
+
+def test_no_spike_below_threshold():
+    samples = [(index / 10, "sad", 0.4) for index in range(30)]
+    summary = aggregate_emotions(_frames(samples))
+    assert summary["distress_windows"] == []
+    assert summary["distress_ratio"] == 1.0
+
+
+def test_epoch_milliseconds_and_iso_timestamps_agree():
+    samples = [(0.0, "happy", 0.9), (0.1, "happy", 0.8), (0.25, "sad", 0.7), (2.0, "neutral", 0.6)]
+    seconds = aggregate_emotions(_frames(samples, start=1_700_000_000.0))
+    milliseconds = aggregate_emotions([
+        EmotionAnalysis(timestamp=str(int(1_700_000_000_000 + offset * 1000)), emotion=emotion,
+                        confidence=confidence, face_detected=True)
+        for offset, emotion, confidence in samples
+    ])
+    started = datetime(2026, 1, 1)
+    iso = aggregate_emotions([
+        EmotionAnalysis(timestamp=(started + timedelta(seconds=offset)).isoformat() + "Z", emotion=emotion,
+                        confidence=confidence, face_detected=True)
+        for offset, emotion, confidence in samples
+    ])
+    assert milliseconds == seconds
+    assert iso == seconds
+    assert seconds["dwell_seconds"] == {"happy": 0.25, "sad": 1.0, "neutral": 0.15}
+    assert seconds["duration_seconds"] == 2.15
+
+
+@pytest.mark.parametrize("count", [1, 2, 16, 28, 29])
+def test_capture_shorter_than_the_spike_window(count):
+    # Under a second at 30 fps: the rolling window is the whole capture
+    summary = aggregate_emotions(_frames([(index / 30, "fear", 1.0) for index in range(count)]))
+    assert summary["frame_count"] == count
+    assert len(summary["distress_windows"]) == 1
+    window = summary["distress_windows"][0]
+    # The zero-padded edges of an even window can drop the first frame
+    assert 0.0 <= window["start_seconds"] < window["end_seconds"]
+    assert window["end_seconds"] == pytest.approx(count / 30, abs=1e-3)
+
+
+def test_iso_timestamps_with_offsets():
+    samples = [(0.0, "happy", 0.9), (0.1, "happy", 0.8), (0.25, "sad", 0.7), (2.0, "neutral", 0.6)]
+    seconds = aggregate_emotions(_frames(samples, start=1_700_000_000.0))
+    started = datetime(2026, 1, 1, 5, 30, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+    # The same instants written in IST, and in UTC from the second frame on
+    stamps = [(started + timedelta(seconds=offset)) for offset, _, _ in samples]
+    stamps = [stamps[0].isoformat()] + [stamp.astimezone(timezone.utc).isoformat() for stamp in stamps[1:]]
+    summary = aggregate_emotions([
+        EmotionAnalysis(timestamp=stamp, emotion=emotion, confidence=confidence, face_detected=True)
+        for stamp, (_, emotion, confidence) in zip(stamps, samples)
+    ])
+    assert summary == seconds
@@ -0,0 +1,90 @@
+"""Landmark blobs: float16/float32 round trips and rejection of malformed blobs
+
+    python -m pytest backend/tests/test_landmarks.py
+"""
+
+import numpy as np
+import pytest
+
+from app.landmarks import (
+    LANDMARK_HEADER,
+    LANDMARK_MAGIC,
+    LandmarkArray,
+    decode_landmarks,
+    encode_landmarks,
+    landmarks_array,
+)
+
+FRAMES = np.random.default_rng(7).random((3, 468, 3), dtype=np.float32)
+
+
+@pytest.mark.parametrize("dtype, tolerance", [
+    (np.dtype("<f2"), 1e-3),
+    (np.dtype("<f4"), 0),
+])
+def test_round_trip(dtype, tolerance):
+    blob = encode_landmarks(FRAMES, dtype=dtype)
+    assert len(blob) == LANDMARK_HEADER.size + FRAMES.size * dtype.itemsize
+
+    decoded = decode_landmarks(blob)
+    assert decoded.shape == (3, 468, 3)
+    assert decoded.dtype == dtype
+    assert not decoded.flags.writeable
+    np.testing.assert_allclose(decoded, FRAMES, rtol=0, atol=tolerance)
+
+
+def test_single_frame_of_point_dicts():
+    frame = [{"x": 0.25, "y": 0.5, "z": -0.125}, {"x": 0.75, "y": 1.0}]
+    with pytest.raises(ValueError):
+        # Points of one frame need the same number of coordinates
+        encode_landmarks(frame)
+
+    frame[1]["z"] = 0.0
+    decoded = decode_landmarks(encode_landmarks(frame))
+    assert decoded.shape == (1, 2, 3)
+    assert decoded.tolist() == [[[0.25, 0.5, -0.125], [0.75, 1.0, 0.0]]]
+
+
+def test_two_dimensional_points():
+    decoded = decode_landmarks(encode_landmarks([[[0.5, 0.25]]], dtype=np.dtype("<f4")))
+    assert decoded.shape == (1, 1, 2)
+
+
+@pytest.mark.parametrize("value", [
+    [1.0, 2.0],
+    [[[1.0, 2.0, 3.0, 4.0]]],
+    [{"x": 1.0}],
+])
+def test_landmarks_array_rejects_bad_shapes(value):
+    with pytest.raises(ValueError):
+        landmarks_array(value)
+
+
+def _header(magic=LANDMARK_MAGIC, dtype_code=2, coordinates=3, points=2, frames=1):
+    return LANDMARK_HEADER.pack(magic, dtype_code, coordinates, 0, points, frames)
+
+
+@pytest.mark.parametrize("blob", [
+    b"",
+    LANDMARK_MAGIC + b"\x02\x03",
+    _header(magic=b"JSON") + bytes(24),
+    _header(dtype_code=9) + bytes(24),
+    _header(coordinates=5) + bytes(40),
+    _header() + bytes(20),
+    _header() + bytes(28),
+    _header(points=2**31, frames=2**31),
+    b'[[{"x": 0.5, "y": 0.5}]]',
+], ids=["empty", "short-header", "magic", "dtype", "coordinates", "short-payload", "long-payload",
+        "huge-counts", "json"])
+def test_malformed_blobs_are_rejected(blob):
+    with pytest.raises(ValueError):
+        decode_landmarks(blob)
+
+
+def test_column_type_round_trip():
+    column = LandmarkArray()
+    blob = column.process_bind_param(FRAMES.tolist(), None)
+    assert column.process_bind_param(blob, None) is blob
+    np.testing.assert_allclose(column.process_result_value(blob, None), FRAMES, atol=1e-3)
+    assert column.process_bind_param(None, None) is None
+    assert column.process_result_value(None, None) is None
@@ -0,0 +1,78 @@
+"""Script-dominance language detection in nlp_pipeline.LanguageDetector
+
+    python -m pytest backend/tests/test_language_detection.py
+"""
+
+import pytest
+
+from nlp_pipeline import LanguageDetector
+
+LATIN = "I agree to take part in this study and to the recording of my session."
+DEVANAGARI = "मैं इस अध्ययन में भाग लेने के लिए सहमत हूँ"
+TAMIL = "நான் இந்த ஆய்வில் பங்கேற்க ஒப்புக்கொள்கிறேன்"
+
+
+@pytest.mark.parametrize("sample, language", [
+    (LATIN, "en"),
+    (DEVANAGARI, "hi"),
+    (TAMIL, "ta"),
+    # Punctuation and digits count for no script
+    (f"{DEVANAGARI} 2026! (1/2)", "hi"),
+    (f"«{TAMIL}» — 100%", "ta"),
+])
+def test_dominant_script_decides_without_fallback(sample, language):
+    detector = LanguageDetector()
+    assert detector.classify(sample) == language
+    assert detector.fallbacks == 0
+
+
+def test_devanagari_without_a_model_of_its_own_keeps_the_hindi_model():
+    # Marathi is written in Devanagari
+    detector = LanguageDetector()
+    assert detector.classify("मी या अभ्यासात सहभागी होण्यास संमती देतो") == "hi"
+    assert detector.fallbacks == 0
+
+
+def test_dominance_threshold():
+    # Twelve Devanagari code points (vowel signs and virama included) and
+    # four Latin letters: 12/16 is under 0.8, over 0.7
+    sample = "नमस्ते नमस्ते abcd"
+    strict = LanguageDetector(dominance=0.8)
+    strict.classify(sample)
+    assert strict.fallbacks == 1
+
+    lenient = LanguageDetector(dominance=0.7)
+    assert lenient.classify(sample) == "hi"
+    assert lenient.fallbacks == 0
+
+
+def test_mixed_script_falls_back_to_langdetect():
+    detector = LanguageDetector()
+    assert detector.classify("मैं agree करता हूँ consent form पर sign") in ("hi", "en")
+    assert detector.fallbacks == 1
+
+
+def test_script_less_text_defaults_to_english():
+    detector = LanguageDetector()
+    assert detector.classify("12345 !!!") == "en"
+
+
+def test_only_the_sample_prefix_is_examined():
+    detector = LanguageDetector(sample_chars=len(TAMIL))
+    assert detector(TAMIL + " " + LATIN * 50) == "ta"
+
+
+def test_results_are_cached_by_sample():
+    detector = LanguageDetector(sample_chars=len(DEVANAGARI), cache_size=2)
+    assert detector(DEVANAGARI) == "hi"
+    # Same prefix, different tail: a cache hit
+    assert detector(DEVANAGARI + LATIN) == "hi"
+    assert detector.stats()["hits"] == 1
+    assert detector.stats()["misses"] == 1
+
+    detector(TAMIL)
+    detector(LATIN)
+    # Least recently used sample was evicted
+    assert detector.stats()["cached"] == 2
+    detector(DEVANAGARI)
+    assert detector.stats()["misses"] == 4
@@ -0,0 +1,272 @@
+"""Alembic migrations against PostgreSQL
+
+Upgrades a database to head, empty, as the first release's create_all
+startup left it and as a later release's did, and checks with alembic check
+that the result matches the models. Like tests/test_query_plans.py this drops all tables, so it only
+runs against TEST_DATABASE_URL:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/consent_plans python -m pytest backend/tests
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, inspect, text
+
+from app import statistics  # noqa: F401  imported for its after_create hook: create_all installs the counter triggers
+from app.database import Base
+from app.landmarks import decode_landmarks
+from app.startup import alembic_config, head_revision
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+def _drop_everything(engine):
+    Base.metadata.drop_all(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE IF EXISTS alembic_version")
+
+
+@pytest.fixture
+def migration_db(monkeypatch):
+    engine = create_engine(TEST_DATABASE_URL)
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"Cannot connect to TEST_DATABASE_URL: {e}")
+    # migrations/env.py reads the database from DATABASE_URL
+    monkeypatch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+    _drop_everything(engine)
+    yield engine
+    _drop_everything(engine)
+    engine.dispose()
+
+
+def _revision(engine):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+def test_upgrade_empty_database(migration_db):
+    config = alembic_config()
+    command.upgrade(config, "head")
+    assert _revision(migration_db) == head_revision()
+    command.check(config)
+
+    # Raw SQL inserts get time-ordered keys, partitions included
+    with migration_db.begin() as connection:
+        user_id = connection.execute(text(
+            "INSERT INTO users (email) VALUES ('raw@example.com') RETURNING id"
+        )).scalar()
+        log_id = connection.execute(text(
+            "INSERT INTO api_logs (endpoint, method, created_at) VALUES ('/health', 'GET', CURRENT_TIMESTAMP) RETURNING id"
+        )).scalar()
+    assert user_id.version == 7
+    assert log_id.version == 7
+
+    # Already at head: nothing to do
+    command.upgrade(config, "head")
+    command.downgrade(config, "base")
+    assert "consent_records" not in inspect(migration_db).get_table_names()
+    with migration_db.connect() as connection:
+        assert connection.execute(text("SELECT to_regproc('uuid_generate_v7')")).scalar() is None
+
+
+# What the first release's create_all startup made (backend/app/database.py of
+# the baseline commit): JSON facial_landmarks, unpartitioned log tables and
+# single-column indexes
+FIRST_RELEASE_DDL = """
+CREATE TABLE users (
+    id UUID NOT NULL, email VARCHAR(255) NOT NULL, full_name VARCHAR(255), phone_number VARCHAR(20),
+    date_of_birth VARCHAR, address TEXT, created_at TIMESTAMP WITHOUT TIME ZONE,
+    updated_at TIMESTAMP WITHOUT TIME ZONE, is_active BOOLEAN, PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE TABLE consent_records (
+    id UUID NOT NULL, user_id UUID NOT NULL, document_type VARCHAR(100) NOT NULL, document_hash VARCHAR(64),
+    detected_emotion VARCHAR(50), emotion_confidence DECIMAL(3, 2), voice_sentiment VARCHAR(50),
+    voice_confidence DECIMAL(3, 2), facial_landmarks JSON, user_consent BOOLEAN NOT NULL,
+    consent_timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL, consent_duration_seconds INTEGER,
+    data_usage_purpose TEXT, data_retention_period VARCHAR(100), right_to_withdraw BOOLEAN,
+    jurisdiction VARCHAR(50), ip_address INET, device_info JSON, browser_user_agent TEXT, encrypted_data TEXT,
+    encryption_key_id VARCHAR(36), digital_signature VARCHAR(256), signature_algorithm VARCHAR(50),
+    verification_status VARCHAR(50), audit_notes TEXT, created_at TIMESTAMP WITHOUT TIME ZONE,
+    updated_at TIMESTAMP WITHOUT TIME ZONE, PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX idx_consent_records_created_at ON consent_records (created_at);
+CREATE INDEX idx_consent_records_jurisdiction ON consent_records (jurisdiction);
+CREATE INDEX idx_consent_records_user_id ON consent_records (user_id);
+CREATE INDEX idx_consent_records_verification_status ON consent_records (verification_status);
+CREATE TABLE compliance_checks (
+    id UUID NOT NULL, consent_record_id UUID NOT NULL, check_type VARCHAR(100) NOT NULL,
+    compliance_standard VARCHAR(100), check_result BOOLEAN, issues_found JSON, remediation_steps TEXT,
+    check_timestamp TIMESTAMP WITHOUT TIME ZONE, checked_by VARCHAR(255), PRIMARY KEY (id),
+    FOREIGN KEY(consent_record_id) REFERENCES consent_records (id)
+);
+CREATE INDEX idx_compliance_checks_consent_record_id ON compliance_checks (consent_record_id);
+CREATE TABLE consent_audit_log (
+    id UUID NOT NULL, consent_record_id UUID NOT NULL, action VARCHAR(50) NOT NULL, changed_fields JSON,
+    old_values JSON, new_values JSON, changed_by VARCHAR(255), change_reason TEXT,
+    created_at TIMESTAMP WITHOUT TIME ZONE, PRIMARY KEY (id),
+    FOREIGN KEY(consent_record_id) REFERENCES consent_records (id)
+);
+CREATE INDEX idx_consent_audit_log_consent_record_id ON consent_audit_log (consent_record_id);
+CREATE TABLE withdrawal_records (
+    id UUID NOT NULL, consent_record_id UUID NOT NULL, withdrawal_timestamp TIMESTAMP WITHOUT TIME ZONE,
+    withdrawal_reason TEXT, withdrawal_method VARCHAR(50), data_deletion_status VARCHAR(50),
+    data_deletion_timestamp TIMESTAMP WITHOUT TIME ZONE, verified_by VARCHAR(255),
+    created_at TIMESTAMP WITHOUT TIME ZONE, PRIMARY KEY (id),
+    FOREIGN KEY(consent_record_id) REFERENCES consent_records (id)
+);
+CREATE INDEX idx_withdrawal_records_consent_record_id ON withdrawal_records (consent_record_id);
+CREATE TABLE encryption_keys (
+    id VARCHAR(36) NOT NULL, key_type VARCHAR(50) NOT NULL, algorithm VARCHAR(50) NOT NULL,
+    key_data TEXT NOT NULL, key_version INTEGER, is_active BOOLEAN, created_at TIMESTAMP WITHOUT TIME ZONE,
+    rotated_at TIMESTAMP WITHOUT TIME ZONE, expires_at TIMESTAMP WITHOUT TIME ZONE, created_by VARCHAR(255),
+    PRIMARY KEY (id)
+);
+CREATE TABLE api_logs (
+    id UUID NOT NULL, endpoint VARCHAR(255) NOT NULL, method VARCHAR(10) NOT NULL, user_id UUID,
+    request_data JSON, response_status INTEGER, response_time_ms INTEGER, ip_address INET, error_message TEXT,
+    created_at TIMESTAMP WITHOUT TIME ZONE, PRIMARY KEY (id)
+);
+CREATE INDEX idx_api_logs_created_at ON api_logs (created_at);
+CREATE INDEX idx_api_logs_endpoint ON api_logs (endpoint);
+CREATE TABLE consent_forms (
+    id UUID NOT NULL, form_name VARCHAR(255) NOT NULL, jurisdiction VARCHAR(50) NOT NULL,
+    form_version VARCHAR(20) NOT NULL, form_template JSON NOT NULL, required_fields JSON, optional_fields JSON,
+    is_active BOOLEAN, created_at TIMESTAMP WITHOUT TIME ZONE, updated_at TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id)
+);
+CREATE INDEX idx_consent_forms_jurisdiction ON consent_forms (jurisdiction);
+"""
+
+LANDMARKS = [[{"x": 0.25, "y": 0.5, "z": -0.125}, {"x": 0.75, "y": 0.5, "z": 0.0}]]
+
+
+def _seed_first_release(engine, landmarks=LANDMARKS):
+    with engine.begin() as connection:
+        connection.exec_driver_sql(FIRST_RELEASE_DDL)
+        connection.execute(text(
+            "INSERT INTO users (id, email, created_at) VALUES "
+            "('00000000-0000-4000-8000-000000000001', 'a@example.com', '2025-01-05'), "
+            "('00000000-0000-4000-8000-000000000002', 'b@example.com', '2025-02-05')"
+        ))
+        connection.execute(text(
+            "INSERT INTO consent_records (id, user_id, document_type, user_consent, consent_timestamp, "
+            "jurisdiction, verification_status, facial_landmarks, created_at) VALUES "
+            "('00000000-0000-4000-8000-000000000011', '00000000-0000-4000-8000-000000000001', 'research', "
+            "true, '2025-01-05', 'IN', 'verified', CAST(:landmarks AS JSON), '2025-01-05'), "
+            "('00000000-0000-4000-8000-000000000012', '00000000-0000-4000-8000-000000000002', 'research', "
+            "true, '2025-02-05', 'IN', 'pending', NULL, '2025-02-05')"
+        ), {"landmarks": json.dumps(landmarks)})
+        connection.execute(text(
+            "INSERT INTO consent_audit_log (id, consent_record_id, action, created_at) VALUES "
+            "('00000000-0000-4000-8000-000000000021', '00000000-0000-4000-8000-000000000011', 'create', "
+            "'2025-01-05')"
+        ))
+        connection.execute(text(
+            "INSERT INTO api_logs (id, endpoint, method, response_status, created_at) VALUES "
+            "('00000000-0000-4000-8000-000000000031', '/consent', 'GET', 200, '2025-01-05'), "
+            "('00000000-0000-4000-8000-000000000032', '/consent', 'POST', 500, '2025-03-05'), "
+            "('00000000-0000-4000-8000-000000000033', '/health', 'GET', 200, NULL)"
+        ))
+
+
+def _relkind(engine, name):
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:name)"), {"name": name}
+        ).scalar()
+
+
+def test_upgrade_first_release_database(migration_db):
+    _seed_first_release(migration_db)
+
+    config = alembic_config()
+    command.upgrade(config, "head")
+    assert _revision(migration_db) == head_revision()
+    command.check(config)
+
+    with migration_db.connect() as connection:
+        blob = connection.execute(text(
+            "SELECT facial_landmarks FROM consent_records WHERE id = '00000000-0000-4000-8000-000000000011'"
+        )).scalar()
+        log_rows = connection.execute(text(
+            "SELECT tableoid::regclass::text, response_status FROM api_logs ORDER BY id"
+        )).all()
+        audit_rows = connection.execute(text("SELECT COUNT(*) FROM consent_audit_log")).scalar()
+        counters = dict(connection.execute(text(
+            "SELECT metric || ':' || dimension_value, SUM(count) FROM statistics_counters GROUP BY 1"
+        )).all())
+        email_constraint = connection.execute(text(
+            "SELECT contype FROM pg_constraint WHERE conname = 'users_email_key'"
+        )).scalar()
+
+    np.testing.assert_allclose(decode_landmarks(bytes(blob)), [[[0.25, 0.5, -0.125], [0.75, 0.5, 0.0]]])
+    assert _relkind(migration_db, "api_logs") == "p"
+    assert _relkind(migration_db, "consent_audit_log") == "p"
+    # Rows land in their month's partition; a missing created_at becomes the migration time
+    assert log_rows[0] == ("api_logs_p2025_01", 200)
+    assert log_rows[1] == ("api_logs_p2025_03", 500)
+    assert audit_rows == 1
+    assert counters["users:"] == 2
+    assert counters["consent_records:"] == 2
+    assert counters["consent_records.verification_status:verified"] == 1
+    assert email_constraint == "u"
+    for index in ("ix_users_email", "idx_consent_records_user_id", "idx_api_logs_endpoint"):
+        assert _relkind(migration_db, index) is None
+    assert _relkind(migration_db, "idx_api_logs_errors_created_at_id") == "I"
+
+    command.downgrade(config, "base")
+    assert "consent_records" not in inspect(migration_db).get_table_names()
+
+
+def test_downgrade_restores_the_first_release_schema(migration_db):
+    _seed_first_release(migration_db)
+    config = alembic_config()
+    command.upgrade(config, "head")
+    command.downgrade(config, "0001")
+
+    with migration_db.connect() as connection:
+        landmarks = connection.execute(text(
+            "SELECT facial_landmarks FROM consent_records WHERE id = '00000000-0000-4000-8000-000000000011'"
+        )).scalar()
+        log_count = connection.execute(text("SELECT COUNT(*) FROM api_logs")).scalar()
+    np.testing.assert_allclose(landmarks, [[[0.25, 0.5, -0.125], [0.75, 0.5, 0.0]]])
+    assert log_count == 3
+    assert _relkind(migration_db, "api_logs") == "r"
+    assert _relkind(migration_db, "idx_api_logs_endpoint") == "i"
+    assert _relkind(migration_db, "ix_users_email") == "i"
+    assert "statistics_counters" not in inspect(migration_db).get_table_names()
+
+
+def test_unconvertible_landmarks_stop_the_upgrade(migration_db):
+    _seed_first_release(migration_db, landmarks={"not": "landmarks"})
+
+    with pytest.raises(RuntimeError, match="00000000-0000-4000-8000-000000000011"):
+        command.upgrade(alembic_config(), "head")
+    # Nothing was committed: the database is still as the first release left it
+    assert "alembic_version" not in inspect(migration_db).get_table_names()
+    assert _relkind(migration_db, "api_logs") == "r"
+
+
+def test_upgrade_database_created_on_startup(migration_db):
+    # A later release's create_all: BYTEA landmarks, partitioned logs, query
+    # indexes and counters, but no session_id and one row per counter yet
+    Base.metadata.create_all(migration_db)
+    with migration_db.begin() as connection:
+        connection.exec_driver_sql("ALTER TABLE consent_records DROP COLUMN session_id")
+        connection.exec_driver_sql("ALTER TABLE statistics_counters DROP COLUMN slot")
+        connection.exec_driver_sql("ALTER TABLE statistics_counters ADD PRIMARY KEY (metric, dimension_value)")
+
+    config = alembic_config()
+    command.upgrade(config, "head")
+    assert _revision(migration_db) == head_revision()
+    command.check(config)
@@ -0,0 +1,202 @@
+"""MicroBatcher scheduling and the NLP worker path, with a fake model registry
+
+    python -m pytest backend/tests/test_nlp_batching.py
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import nlp_batching
+from app import nlp_jobs
+from nlp_batching import MicroBatcher
+from nlp_pipeline import DEFAULT_MODEL, LANGUAGE_MODELS
+
+
+class FakeRegistry:
+    """Models that label each text with itself and record every batch"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def get_model(self, model_name):
+        def run(texts, batch_size, truncation):
+            with self._lock:
+                self.batches.append((model_name, list(texts)))
+            time.sleep(self.delay)
+            return [{"label": f"{model_name}:{text}", "score": 1.0} for text in texts]
+        return run
+
+    def sizes(self):
+        with self._lock:
+            return [len(texts) for _, texts in self.batches]
+
+
+def _batcher(registry, **kwargs):
+    return MicroBatcher(registry=registry, detect=lambda text: "en", **kwargs)
+
+
+def test_flushes_when_the_batch_is_full():
+    registry = FakeRegistry()
+    batcher = _batcher(registry, max_batch_size=4, max_wait_ms=10_000)
+    try:
+        started = time.perf_counter()
+        futures = [batcher.submit(f"text {index}") for index in range(8)]
+        results = [future.result(timeout=5) for future in futures]
+        # Full batches go out without waiting for max_wait_ms
+        assert time.perf_counter() - started < 5
+        assert registry.sizes() == [4, 4]
+        assert len(results) == 8
+    finally:
+        batcher.close(timeout=5)
+
+
+def test_flushes_a_partial_batch_after_max_wait():
+    registry = FakeRegistry()
+    batcher = _batcher(registry, max_batch_size=100, max_wait_ms=50)
+    try:
+        started = time.perf_counter()
+        futures = [batcher.submit("one"), batcher.submit("two")]
+        for future in futures:
+            future.result(timeout=5)
+        elapsed = time.perf_counter() - started
+        assert 0.04 <= elapsed < 2
+        assert registry.sizes() == [2]
+    finally:
+        batcher.close(timeout=5)
+
+
+def test_each_future_gets_its_own_result():
+    registry = FakeRegistry()
+    batcher = _batcher(registry, max_batch_size=8, max_wait_ms=20)
+    texts = [f"text {index}" for index in range(30)]
+    try:
+        futures = [batcher.submit(text, language="hi" if index % 3 == 0 else None)
+                   for index, text in enumerate(texts)]
+        for index, (text, future) in enumerate(zip(texts, futures)):
+            model_name = LANGUAGE_MODELS["hi"] if index % 3 == 0 else DEFAULT_MODEL
+            assert future.result(timeout=5) == [{"label": f"{model_name}:{text}", "score": 1.0}]
+        # Batches never mix models
+        hindi = {text for index, text in enumerate(texts) if index % 3 == 0}
+        for model_name, batch in registry.batches:
+            assert all((text in hindi) == (model_name == LANGUAGE_MODELS["hi"]) for text in batch)
+        assert {model_name for model_name, _ in registry.batches} == {LANGUAGE_MODELS["hi"], DEFAULT_MODEL}
+    finally:
+        batcher.close(timeout=5)
+
+
+def test_analyze_passes_the_language_through():
+    registry = FakeRegistry()
+    batcher = _batcher(registry, max_batch_size=1)
+    try:
+        assert batcher.analyze("vanakkam", language="ta", timeout=5)[0]["label"].startswith(LANGUAGE_MODELS["ta"])
+        result = asyncio.run(batcher.analyze_async("namaste", language="hi"))
+        assert result[0]["label"] == f"{LANGUAGE_MODELS['hi']}:namaste"
+    finally:
+        batcher.close(timeout=5)
+
+
+def test_model_errors_reach_every_caller_of_the_batch():
+    class Failing:
+        def get_model(self, model_name):
+            def run(texts, batch_size, truncation):
+                raise RuntimeError("model failed")
+            return run
+
+    batcher = _batcher(Failing(), max_batch_size=2, max_wait_ms=10_000)
+    try:
+        futures = [batcher.submit("a"), batcher.submit("b")]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="model failed"):
+                future.result(timeout=5)
+    finally:
+        batcher.close(timeout=5)
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    """nlp_jobs with a thread standing in for one worker process"""
+    registry = FakeRegistry(delay=0.05)
+    batcher = MicroBatcher(registry=registry, max_batch_size=16, max_wait_ms=5)
+    monkeypatch.setattr(nlp_jobs, "_batcher", batcher)
+    manager = nlp_jobs.NLPJobManager(pool_size=1)
+    manager._pool = ThreadPoolExecutor(max_workers=1)
+    yield manager, registry
+    manager._pool.shutdown(wait=True)
+    batcher.close(timeout=5)
+
+
+def test_texts_arriving_while_the_worker_is_busy_share_a_batch(worker):
+    manager, registry = worker
+
+    async def run():
+        return await asyncio.gather(*(manager.analyze(f"text {index}", "en") for index in range(5)))
+
+    results = asyncio.run(run())
+    assert [result["result"][0]["label"] for result in results] == [
+        f"{DEFAULT_MODEL}:text {index}" for index in range(5)
+    ]
+    assert all(result["language"] == "en" for result in results)
+    # The first text goes out alone; the other four wait for the worker together
+    assert registry.sizes() == [1, 4]
+    assert manager.stats()["sync_in_flight"] == 0
+
+
+def test_worker_drops_texts_past_their_deadline(monkeypatch):
+    registry = FakeRegistry()
+    batcher = _batcher(registry, max_batch_size=1)
+    monkeypatch.setattr(nlp_jobs, "_batcher", batcher)
+    try:
+        expired, live = nlp_jobs._run_texts([("late", "en", time.time() - 1), ("on time", "en", time.time() + 5)])
+        assert isinstance(expired, TimeoutError)
+        assert live["result"][0]["label"] == f"{DEFAULT_MODEL}:on time"
+        assert registry.batches == [(DEFAULT_MODEL, ["on time"])]
+    finally:
+        batcher.close(timeout=5)
+
+
+def test_worker_withdraws_queued_texts_at_their_deadline(monkeypatch):
+    release = threading.Event()
+    registry = FakeRegistry()
+    recorded = registry.get_model
+
+    class Blocking:
+        def get_model(self, model_name):
+            run = recorded(model_name)
+
+            def blocked(texts, batch_size, truncation):
+                release.wait(5)
+                return run(texts, batch_size, truncation)
+            return blocked
+
+    batcher = _batcher(Blocking(), max_batch_size=1)
+    monkeypatch.setattr(nlp_jobs, "_batcher", batcher)
+    try:
+        started = time.perf_counter()
+        deadline = time.time() + 0.1
+        results = nlp_jobs._run_texts([("first", "en", deadline), ("second", "en", deadline)])
+        # The worker returns at the deadline instead of waiting for the model
+        assert time.perf_counter() - started < 1
+        assert all(isinstance(result, TimeoutError) for result in results)
+    finally:
+        release.set()
+        batcher.close(timeout=5)
+    # "second" was still queued behind the running batch and never reached the model
+    assert registry.batches == [(DEFAULT_MODEL, ["first"])]
+
+
+def test_sync_analysis_rejects_long_texts():
+    manager = nlp_jobs.NLPJobManager(pool_size=1)
+    with pytest.raises(ValueError):
+        asyncio.run(manager.analyze("x" * (nlp_jobs.NLP_SYNC_MAX_CHARS + 1)))
+    assert manager._pool is None
+
+
+def test_batcher_module_has_no_process_wide_instance():
+    # Each worker process builds its own in nlp_jobs._init_worker
+    assert not any(isinstance(value, MicroBatcher) for value in vars(nlp_batching).values())
@@ -0,0 +1,284 @@
+"""Query-plan regression suite
+
+Seeds a throwaway PostgreSQL database and asserts that EXPLAIN of every
+lookup and listing query the API runs (built by app/queries.py, paged the
+way fetch_page pages them) reads its table through the intended index.
+A dropped index or a rewritten query that falls back to a sequential scan
+fails here instead of in production.
+
+Plans are checked with the parameters inlined, as the planner sees a custom
+plan, and on PostgreSQL 16+ also as the generic plan of a prepared
+statement, which is what asyncpg ends up executing for hot queries.
+
+The suite creates and drops all tables, so it only runs against a database
+named by TEST_DATABASE_URL and is skipped when that is unset:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/consent_plans python -m pytest backend/tests
+"""
+
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from uuid import UUID
+
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from app import partitions
+from app.compliance import _batch_query
+from app.database import APILog, Base, ComplianceWatermark, ConsentRecord, User, uuid7
+from app.ingestion import _submission_query
+from app.pagination import DEFAULT_PAGE_SIZE, encode_cursor
+from app.queries import api_log_entries, consent_export, consent_records, consent_summaries, user_by_email, user_consents
+from app.rotation import _chunk_query
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+USERS = 500
+CONSENT_RECORDS = 40000
+API_LOGS = 40000
+DAYS = 90
+JURISDICTIONS = ["India", "Kerala", "Karnataka", "Tamil Nadu", "Telangana",
+                 "Maharashtra", "Delhi", "Gujarat", "West Bengal", "Punjab"]
+STATUSES = ["verified"] * 90 + ["pending"] * 8 + ["rejected"] * 2
+ENDPOINTS = ["/users", "/users/{user_id}", "/consent/submit", "/consent/batch", "/consent/{consent_id}",
+             "/consent/user/{user_id}", "/consent", "/api/logs", "/stats", "/nlp/analyze"]
+NOW = datetime.utcnow()
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+def _seed(connection):
+    rng = random.Random(0)
+    started = NOW - timedelta(days=DAYS)
+
+    def created_at():
+        return started + timedelta(seconds=rng.uniform(0, DAYS * 86400))
+
+    user_ids = [uuid7() for _ in range(USERS)]
+    connection.execute(User.__table__.insert(), [
+        {"id": user_id, "email": f"user{index}@example.com", "created_at": NOW} for index, user_id in enumerate(user_ids)
+    ])
+    consent_created_at = [created_at() for _ in range(CONSENT_RECORDS)]
+    connection.execute(ConsentRecord.__table__.insert(), [
+        {
+            "id": uuid7(),
+            "user_id": rng.choice(user_ids),
+            "document_type": rng.choice(["Sale Deed", "Gift Deed", "Lease Agreement"]),
+            "user_consent": True,
+            "consent_timestamp": NOW,
+            "jurisdiction": rng.choice(JURISDICTIONS),
+            "verification_status": rng.choice(STATUSES),
+            "created_at": timestamp,
+            "updated_at": timestamp,
+        }
+        for timestamp in consent_created_at
+    ])
+    connection.execute(APILog.__table__.insert(), [
+        {
+            "id": uuid7(),
+            "endpoint": rng.choice(ENDPOINTS),
+            "method": "GET",
+            "response_status": 500 if rng.random() < 0.03 else 200,
+            "response_time_ms": rng.randint(1, 200),
+            "created_at": created_at(),
+        }
+        for _ in range(API_LOGS)
+    ])
+    return user_ids
+
+
+@pytest.fixture(scope="module")
+def plan_db():
+    engine = create_engine(TEST_DATABASE_URL)
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"Cannot connect to TEST_DATABASE_URL: {e}")
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for table_name in partitions.PARTITIONED_TABLES:
+            partitions.ensure_partitions(connection, table_name, start=NOW - timedelta(days=DAYS))
+        user_ids = _seed(connection)
+    # Index-only scans need an up-to-date visibility map
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("VACUUM ANALYZE")
+        server_version = connection.dialect.server_version_info
+
+    yield engine, user_ids, server_version
+
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+INDEX_SCANS = ("Index Scan", "Index Only Scan", "Bitmap Heap Scan")
+
+
+def _nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def _root_index(connection, index_name):
+    # Indexes on partitions inherit from the index declared on the parent
+    parent = connection.execute(text(
+        "SELECT parent.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "WHERE pg_inherits.inhrelid = to_regclass(:index_name)"
+    ), {"index_name": index_name}).scalar()
+    return parent or index_name
+
+
+def _is_empty(connection, relation_name):
+    # Empty future partitions can be read through any index at no cost
+    return connection.execute(text(
+        "SELECT reltuples = 0 FROM pg_class WHERE oid = to_regclass(:relation_name)"
+    ), {"relation_name": relation_name}).scalar()
+
+
+def _index_names(node):
+    if "Index Name" in node:
+        yield node["Index Name"]
+    for child in node.get("Plans", []):
+        yield from _index_names(child)
+
+
+def _explain(connection, stmt, generic):
+    if generic:
+        sql = str(stmt.compile(dialect=asyncpg.dialect()))
+        options = "GENERIC_PLAN, FORMAT JSON"
+    else:
+        sql = str(stmt.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+        options = "FORMAT JSON"
+    result = connection.exec_driver_sql(f"EXPLAIN ({options}) {sql}").scalar()
+    plan = result if isinstance(result, list) else json.loads(result)
+    return plan[0]["Plan"]
+
+
+def _page(stmt):
+    return stmt.limit(DEFAULT_PAGE_SIZE + 1)
+
+
+def _cursor():
+    return encode_cursor(NOW - timedelta(days=DAYS // 2), UUID(int=0))
+
+
+QUERIES = {
+    "user by id": (
+        lambda ids: select(User).where(User.id == ids[0]),
+        "users_pkey", False,
+    ),
+    "user by email": (
+        lambda ids: user_by_email("user7@example.com"),
+        "users_email_key", False,
+    ),
+    "consent record by id": (
+        lambda ids: select(ConsentRecord).where(ConsentRecord.id == ids[0]),
+        "consent_records_pkey", False,
+    ),
+    "consents of a user": (
+        lambda ids: _page(user_consents(ids[1])),
+        "idx_consent_records_user_id_created_at_id", False,
+    ),
+    "consents of a user, next page": (
+        lambda ids: _page(user_consents(ids[1], _cursor())),
+        "idx_consent_records_user_id_created_at_id", False,
+    ),
+    "consents by jurisdiction and status": (
+        lambda ids: _page(consent_summaries("Kerala", "pending")),
+        "idx_consent_records_jurisdiction_status_created_at_id", True,
+    ),
+    "consents by jurisdiction, status and time range": (
+        lambda ids: _page(consent_summaries("Kerala", "verified", NOW - timedelta(days=30), NOW - timedelta(days=7))),
+        "idx_consent_records_jurisdiction_status_created_at_id", True,
+    ),
+    "consents by jurisdiction and status, next page": (
+        lambda ids: _page(consent_summaries("Kerala", "pending", cursor=_cursor())),
+        "idx_consent_records_jurisdiction_status_created_at_id", True,
+    ),
+    "consents by jurisdiction": (
+        lambda ids: _page(consent_summaries("Kerala")),
+        "idx_consent_records_jurisdiction_created_at_id", False,
+    ),
+    "consents by status": (
+        lambda ids: _page(consent_summaries(verification_status="pending")),
+        "idx_consent_records_status_created_at_id", False,
+    ),
+    "all consents": (
+        lambda ids: _page(consent_summaries()),
+        "idx_consent_records_created_at_id", False,
+    ),
+    "consent export": (
+        lambda ids: consent_export("Kerala", created_after=NOW - timedelta(days=30), cursor=_cursor()),
+        "idx_consent_records_jurisdiction_created_at_id", False,
+    ),
+    "consent export chunk boundary": (
+        lambda ids: consent_export("Kerala", cursor=_cursor())
+        .with_only_columns(consent_records.c.created_at, consent_records.c.id).offset(999).limit(2),
+        "idx_consent_records_jurisdiction_created_at_id", True,
+    ),
+    "compliance batch": (
+        lambda ids: _batch_query(
+            ComplianceWatermark(last_updated_at=NOW - timedelta(days=DAYS // 2), last_record_id=UUID(int=0)),
+            NOW, 5000,
+        ),
+        "idx_consent_records_updated_at_id", False,
+    ),
+    "key rotation chunk": (
+        lambda ids: _chunk_query("key-1", UUID(int=0), 500),
+        "idx_consent_records_encryption_key_id_id", False,
+    ),
+    "submission replay": (
+        lambda ids: _submission_query(ids[0], "capture-session"),
+        "idx_consent_records_session_id_user_id", False,
+    ),
+    "api logs": (
+        lambda ids: _page(api_log_entries()),
+        "idx_api_logs_created_at_id", False,
+    ),
+    "api logs, next page": (
+        lambda ids: _page(api_log_entries(cursor=_cursor())),
+        "idx_api_logs_created_at_id", False,
+    ),
+    "api logs of a route": (
+        lambda ids: _page(api_log_entries(endpoint="/consent/submit")),
+        "idx_api_logs_endpoint_created_at_id", False,
+    ),
+    "api log errors": (
+        lambda ids: _page(api_log_entries(errors_only=True)),
+        "idx_api_logs_errors_created_at_id", False,
+    ),
+}
+
+
+@pytest.mark.parametrize("generic", [False, True], ids=["custom", "generic"])
+@pytest.mark.parametrize("name", list(QUERIES))
+def test_query_uses_index(plan_db, name, generic):
+    engine, user_ids, server_version = plan_db
+    if generic and server_version < (16,):
+        pytest.skip("EXPLAIN (GENERIC_PLAN) needs PostgreSQL 16")
+    build, expected_index, index_only = QUERIES[name]
+
+    with engine.connect() as connection:
+        plan = _explain(connection, build(user_ids), generic)
+        nodes = list(_nodes(plan))
+        scans = [node for node in nodes if "Relation Name" in node]
+        assert scans, plan
+        for scan in scans:
+            assert scan["Node Type"] in INDEX_SCANS, (
+                f"{name}: {scan['Node Type']} on {scan['Relation Name']}\n{json.dumps(plan, indent=2)}"
+            )
+        used = {
+            _root_index(connection, index_name)
+            for scan in scans if not _is_empty(connection, scan["Relation Name"])
+            for index_name in _index_names(scan)
+        }
+        assert used == {expected_index}, f"{name}: used {used}\n{json.dumps(plan, indent=2)}"
+        if index_only:
+            assert {scan["Node Type"] for scan in scans} == {"Index Only Scan"}, json.dumps(plan, indent=2)
@@ -0,0 +1,75 @@
+"""verify_record against signatures made by the frontend
+
+The vectors come from running generateHash and signConsent in
+frontend/src/utils/crypto.ts under Node the way ConsentScreen.tsx calls
+them: the client signs the hex SHA-256 of the encrypted payload.
+
+    python -m pytest backend/tests/test_signatures.py
+"""
+
+import pytest
+
+from app.signatures import REJECTED, UNVERIFIED, VERIFIED, signed_message, verify_record
+
+ENCRYPTED_DATA = "q7f3Vb9kR2xT0mN8pL4wZg==:Yx2c9Hf1uK7sQ0aJ3eWm5tRb8nVd6oPz"
+KEY_DATA = "PRIVATE_KEY_1a2b3c4d"
+# await generateHash(ENCRYPTED_DATA)
+DATA_HASH = "b0a36ed924d06928b82cd6d720bc5491076b6befea48f3325d9a5fa874f35559"
+# await signConsent(DATA_HASH, KEY_DATA)
+FRONTEND_SIGNATURE = "SIGNATURE_40e518f89d66ed0942ea97a0f2d5f370"
+# createHmac('sha256', KEY_DATA).update(DATA_HASH).digest('hex')
+HMAC_SIGNATURE = "a93023eb64a00c905ad2f3be4cccee34e15572b2f8345b10affeeed83924f49c"
+
+KEYS = {"key-1": {"key_data": KEY_DATA}}
+
+
+def _record(**overrides):
+    record = {
+        "encrypted_data": ENCRYPTED_DATA,
+        "digital_signature": FRONTEND_SIGNATURE,
+        "encryption_key_id": "key-1",
+    }
+    record.update(overrides)
+    return record
+
+
+def test_signed_message_is_the_frontend_hash():
+    assert signed_message(ENCRYPTED_DATA) == DATA_HASH.encode()
+
+
+def test_frontend_signature_verifies():
+    assert verify_record(_record(), KEYS) == VERIFIED
+    assert verify_record(_record(signature_algorithm="SHA-256"), KEYS) == VERIFIED
+
+
+def test_hmac_signature_verifies():
+    assert verify_record(_record(signature_algorithm="HMAC-SHA256", digital_signature=HMAC_SIGNATURE), KEYS) == VERIFIED
+    assert verify_record(_record(signature_algorithm="HMAC-SHA256"), KEYS) == REJECTED
+
+
+def test_rotated_record_verifies_against_the_signed_digest():
+    # After a rotation the payload is re-encrypted under a new key, and the
+    # digest and key the client signed are kept alongside it
+    record = _record(encrypted_data="re-encrypted payload", encryption_key_id="key-2",
+                     signed_data_hash=DATA_HASH, signing_key_id="key-1")
+    keys = {**KEYS, "key-2": {"key_data": "ROTATED_KEY"}}
+    assert verify_record(record, keys) == VERIFIED
+
+
+@pytest.mark.parametrize("overrides", [
+    {"encrypted_data": ENCRYPTED_DATA + "x"},
+    {"digital_signature": FRONTEND_SIGNATURE[:-1] + "1"},
+    {"digital_signature": HMAC_SIGNATURE},
+])
+def test_tampered_records_are_rejected(overrides):
+    assert verify_record(_record(**overrides), KEYS) == REJECTED
+
+
+@pytest.mark.parametrize("overrides", [
+    {"digital_signature": None},
+    {"encrypted_data": ""},
+    {"encryption_key_id": "unknown"},
+    {"signature_algorithm": "RSA"},
+])
+def test_records_without_what_to_check_stay_pending(overrides):
+    assert verify_record(_record(**overrides), KEYS) == UNVERIFIED
@@ -0,0 +1,85 @@
+"""Statement fingerprints: literals, bind parameters and IN lists collapse
+
+    python -m pytest backend/tests/test_sql_fingerprints.py
+"""
+
+import pytest
+
+from app.metrics import _fingerprint, normalize_sql
+
+
+def _same_fingerprint(statements):
+    fingerprints = {_fingerprint(statement) for statement in statements}
+    assert len(fingerprints) == 1, fingerprints
+    return fingerprints.pop()
+
+
+def test_literals_collapse():
+    query_id, sql, operation = _same_fingerprint([
+        "SELECT * FROM users WHERE email = 'a@example.com' AND age > 18",
+        "SELECT * FROM users WHERE email = 'O''Brien@example.com' AND age > -2.5",
+        "SELECT *  FROM users\n  WHERE email = ''   AND age > 0",
+    ])
+    assert sql == "SELECT * FROM users WHERE email = ? AND age > ?"
+    assert operation == "SELECT"
+    assert len(query_id) == 12
+
+
+def test_bind_parameters_collapse():
+    # asyncpg numbered parameters with casts, psycopg2 named and positional ones
+    _, sql, _ = _same_fingerprint([
+        "SELECT id FROM consent_records WHERE user_id = $1::UUID AND created_at > $2::TIMESTAMP WITHOUT TIME ZONE",
+        "SELECT id FROM consent_records WHERE user_id = %(user_id_1)s AND created_at > %(created_at_1)s",
+        "SELECT id FROM consent_records WHERE user_id = %s AND created_at > %s",
+        "SELECT id FROM consent_records WHERE user_id = 'f47ac10b-58cc-4372-a567-0e02b2c3d479' AND created_at > '2026-01-01'",
+    ])
+    assert sql == "SELECT id FROM consent_records WHERE user_id = ? AND created_at > ?"
+
+
+def test_in_lists_of_any_length_collapse():
+    _, sql, _ = _same_fingerprint([
+        "SELECT id FROM users WHERE id IN ($1::UUID)",
+        "SELECT id FROM users WHERE id IN ($1::UUID, $2::UUID, $3::UUID)",
+        "SELECT id FROM users WHERE id IN (%(id_1_1)s, %(id_1_2)s)",
+        "SELECT id FROM users WHERE id IN (1, 2, 3, 4, 5, 6, 7, 8)",
+        "SELECT id FROM users WHERE id IN ( 'a' )",
+    ])
+    assert sql == "SELECT id FROM users WHERE id IN (?, ...)"
+    assert normalize_sql("SELECT id FROM users WHERE id in ($1)") == "SELECT id FROM users WHERE id in (?, ...)"
+
+
+def test_multi_row_values_collapse():
+    # Batched inserts of any size share one entry, apart from single-row ones
+    _, sql, operation = _same_fingerprint([
+        "INSERT INTO api_logs (endpoint, response_status) VALUES ($1, $2), ($3, $4)",
+        "INSERT INTO api_logs (endpoint, response_status) VALUES ($1, $2), ($3, $4), ($5, $6)",
+        "INSERT INTO api_logs (endpoint, response_status) VALUES ('/stats', 200), ('/health', 500)",
+    ])
+    assert sql == "INSERT INTO api_logs (endpoint, response_status) VALUES (?, ...), ..."
+    assert operation == "INSERT"
+    assert _fingerprint("INSERT INTO api_logs (endpoint, response_status) VALUES ($1, $2)")[1] == \
+        "INSERT INTO api_logs (endpoint, response_status) VALUES (?, ...)"
+
+
+@pytest.mark.parametrize("first, second", [
+    ("SELECT id FROM users WHERE id = $1", "SELECT id FROM consent_records WHERE id = $1"),
+    ("SELECT id FROM users WHERE id = $1", "SELECT email FROM users WHERE id = $1"),
+    ("SELECT id FROM users ORDER BY created_at LIMIT 10", "SELECT id FROM users ORDER BY updated_at LIMIT 10"),
+])
+def test_different_shapes_keep_different_fingerprints(first, second):
+    assert _fingerprint(first)[0] != _fingerprint(second)[0]
+
+
+def test_identifiers_with_digits_are_kept():
+    assert normalize_sql("SELECT t1.c2 FROM api_logs_p2026_01 t1 WHERE t1.c2 = 3") == \
+        "SELECT t1.c2 FROM api_logs_p2026_01 t1 WHERE t1.c2 = ?"
+
+
+@pytest.mark.parametrize("statement, operation", [
+    ("WITH recent AS (SELECT 1) SELECT * FROM recent", "SELECT"),
+    ("update users SET email = $1", "UPDATE"),
+    ("DELETE FROM users WHERE id = $1", "DELETE"),
+    ("BEGIN", "OTHER"),
+])
+def test_operation(statement, operation):
+    assert _fingerprint(statement)[2] == operation
@@ -0,0 +1,122 @@
+"""Slotted statistics counters against PostgreSQL
+
+Migrates TEST_DATABASE_URL to head, writes users and consent records and
+checks that concurrent writers add to different counter rows and that
+GET /stats reads the summed slots. Drops all tables like
+tests/test_migrations.py:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/consent_plans python -m pytest backend/tests
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.database import Base
+from app.session import to_async_url
+from app.startup import alembic_config
+from app.statistics import reconcile_statistics, read_statistics
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+def _drop_everything(engine):
+    Base.metadata.drop_all(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE IF EXISTS alembic_version")
+
+
+@pytest.fixture
+def counters_db(monkeypatch):
+    engine = create_engine(TEST_DATABASE_URL)
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"Cannot connect to TEST_DATABASE_URL: {e}")
+    monkeypatch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+    _drop_everything(engine)
+    command.upgrade(alembic_config(), "head")
+    yield engine
+    _drop_everything(engine)
+    engine.dispose()
+
+
+def _add_user(connection, jurisdiction="IN"):
+    user_id = uuid.uuid4()
+    connection.execute(text("INSERT INTO users (id, email) VALUES (:id, :email)"),
+                       {"id": user_id, "email": f"{user_id}@example.com"})
+    connection.execute(text(
+        "INSERT INTO consent_records (id, user_id, document_type, user_consent, consent_timestamp, "
+        "jurisdiction, verification_status) VALUES (:id, :user_id, 'research', true, :now, :jurisdiction, 'pending')"
+    ), {"id": uuid.uuid4(), "user_id": user_id, "now": datetime.utcnow(), "jurisdiction": jurisdiction})
+
+
+def _stats(engine_url):
+    async def read(reconcile=False):
+        engine = create_async_engine(to_async_url(engine_url))
+        try:
+            async with AsyncSession(engine) as db:
+                if reconcile:
+                    await reconcile_statistics(db)
+                return await read_statistics(db)
+        finally:
+            await engine.dispose()
+    return read
+
+
+def test_concurrent_writers_do_not_wait_on_one_counter_row(counters_db):
+    first = counters_db.connect()
+    second = counters_db.connect()
+    try:
+        first.begin()
+        _add_user(first)
+        second.begin()
+        # With one row per counter this insert would wait for the first transaction
+        second.exec_driver_sql("SET LOCAL lock_timeout = '2s'")
+        _add_user(second)
+        second.commit()
+        first.commit()
+    finally:
+        first.close()
+        second.close()
+
+    with counters_db.connect() as connection:
+        slots = connection.execute(text(
+            "SELECT COUNT(DISTINCT slot) FROM statistics_counters WHERE metric = 'users' AND count > 0"
+        )).scalar()
+    assert slots == 2
+
+
+def test_stats_sum_the_slots(counters_db):
+    for index in range(6):
+        with counters_db.begin() as connection:
+            _add_user(connection, jurisdiction="IN" if index % 2 else "EU")
+    with counters_db.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM consent_records WHERE jurisdiction = 'EU'")
+
+    with counters_db.connect() as connection:
+        slots = connection.execute(text(
+            "SELECT COUNT(*) FROM statistics_counters WHERE metric = 'users'"
+        )).scalar()
+    assert slots > 1
+
+    read = _stats(TEST_DATABASE_URL)
+    stats = asyncio.run(read())
+    assert stats["total_users"] == 6
+    assert stats["total_consent_records"] == 3
+    assert stats["by_jurisdiction"] == {"IN": 3}
+    assert stats["by_verification_status"] == {"pending": 3}
+
+    # A recount folds everything into slot 0 and agrees with the triggers
+    assert asyncio.run(read(reconcile=True)) == stats
+    with counters_db.connect() as connection:
+        assert connection.execute(text("SELECT MAX(slot) FROM statistics_counters")).scalar() == 0
@@ -0,0 +1,72 @@
+"""uuid7 primary keys: version and variant bits, timestamp and counter order
+
+    python -m pytest backend/tests/test_uuid7.py
+"""
+
+import uuid
+
+import pytest
+
+from app import database
+from app.database import uuid7
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Pins time.time_ns to now[0] milliseconds and resets the counter"""
+    now = [1_760_000_000_000]
+    monkeypatch.setattr(database.time, "time_ns", lambda: now[0] * 1_000_000)
+    monkeypatch.setattr(database, "_uuid7_last", (0, 0))
+    return now
+
+
+def _millis(value: uuid.UUID) -> int:
+    return value.int >> 80
+
+
+def _counter(value: uuid.UUID) -> int:
+    return value.int >> 64 & 0xFFF
+
+
+def test_version_and_variant_bits():
+    for _ in range(100):
+        value = uuid7()
+        assert value.version == 7
+        assert value.variant == uuid.RFC_4122
+        assert value.int >> 76 & 0xF == 0x7
+        assert value.int >> 62 & 0x3 == 0x2
+
+
+def test_timestamp_is_unix_milliseconds(clock):
+    assert _millis(uuid7()) == clock[0]
+
+
+def test_ids_sort_by_millisecond(clock):
+    earlier = uuid7()
+    clock[0] += 1
+    later = uuid7()
+    assert earlier < later
+    assert str(earlier) < str(later)
+    assert _counter(later) == 0
+
+
+def test_counter_orders_ids_within_one_millisecond(clock):
+    ids = [uuid7() for _ in range(1000)]
+    assert {_millis(value) for value in ids} == {clock[0]}
+    assert [_counter(value) for value in ids] == list(range(1000))
+    assert ids == sorted(ids)
+
+
+def test_counter_overflow_borrows_the_next_millisecond(clock):
+    ids = [uuid7() for _ in range(0x1001)]
+    assert _millis(ids[-2]) == clock[0] and _counter(ids[-2]) == 0xFFF
+    assert _millis(ids[-1]) == clock[0] + 1 and _counter(ids[-1]) == 0
+    assert ids == sorted(ids)
+
+
+def test_clock_stepping_back_keeps_ids_increasing(clock):
+    first = uuid7()
+    clock[0] -= 5
+    second = uuid7()
+    assert second > first
+    assert _millis(second) == _millis(first)